@@ -0,0 +1,192 @@
+import asyncio
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_CONCURRENCY = 2
+
+# キューの終端を示す優先度（全ての作業単位より後に取り出される）
+_END_PRIORITY = float('inf')
+
+
+def _take(iterator, count: int) -> list:
+    return list(itertools.islice(iterator, count))
+
+
+class StageStats:
+    """ステージごとの処理件数・稼働時間"""
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+
+
+class QueueStats:
+    """キューの滞留数（取り出し時にサンプリング）"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+
+    def sample(self, queue: asyncio.Queue):
+        depth = queue.qsize()
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+
+class PipelineStats:
+    """パイプライン全体の稼働状況"""
+
+    def __init__(self):
+        self.stages = {}
+        self.queues = {}
+        self.wall_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        """現在の状態（外部から参照する用）"""
+        return {
+            'stages': {name: {'items': s.items, 'busy_seconds': s.busy_seconds}
+                       for name, s in self.stages.items()},
+            'queues': {name: {'max_depth': q.max_depth, 'maxsize': q.maxsize}
+                       for name, q in self.queues.items()},
+        }
+
+    def log_report(self):
+        """ステージ稼働率・キュー滞留数のレポートを出力"""
+        if not self.stages:
+            return
+        wall = self.wall_seconds or 1e-9
+
+        logger.info("=== パイプラインレポート ===")
+        for stage in self.stages.values():
+            utilization = stage.busy_seconds / (wall * stage.workers)
+            logger.info("  %-9s: %s件, 稼働 %.1f秒 (稼働率: %.0f%%, ワーカー数 %s)",
+                        stage.name, stage.items, stage.busy_seconds,
+                        utilization * 100, stage.workers)
+        for queue in self.queues.values():
+            average = queue.total_depth / queue.samples if queue.samples else 0
+            logger.info("  キュー %-9s: 平均 %.1f / 最大 %s (上限 %s)",
+                        queue.name, average, queue.max_depth, queue.maxsize)
+        logger.info("  経過時間: %.1f秒", self.wall_seconds)
+
+
+async def run_pipeline(source, priority, translate, finalize, write,
+                       concurrency: int = DEFAULT_CONCURRENCY,
+                       queue_size: int = DEFAULT_QUEUE_SIZE) -> PipelineStats:
+    """prepare → translate → finalize → write の非同期パイプラインを実行
+
+    source:    作業単位を生成する反復可能オブジェクト（prepare ステージ、スレッドで実行）
+    priority:  作業単位の優先度（小さいほど先に翻訳）を返す関数
+    translate: 作業単位を翻訳するコルーチン関数（LLM I/O）
+    finalize:  (作業単位, 翻訳結果) を後処理する同期関数（スレッドで実行）
+    write:     finalize の結果を書き出す同期関数
+
+    source の反復と write は別のスレッドで並行に実行されるため、
+    両方から更新する状態（書き出し先など）はスレッドセーフにすること。
+    """
+    stats = PipelineStats()
+    concurrency = max(concurrency, 1)
+    translate_queue = asyncio.PriorityQueue(maxsize=queue_size)
+    finalize_queue = asyncio.Queue(maxsize=queue_size)
+    write_queue = asyncio.Queue(maxsize=queue_size)
+    for name, queue in [('translate', translate_queue),
+                        ('finalize', finalize_queue),
+                        ('write', write_queue)]:
+        stats.queues[name] = QueueStats(name, queue_size)
+    for name, workers in [('prepare', 1), ('translate', concurrency),
+                          ('finalize', 1), ('write', 1)]:
+        stats.stages[name] = StageStats(name, workers)
+
+    sequence = itertools.count()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    prepare_executor = ThreadPoolExecutor(max_workers=1)
+
+    async def prepare_stage():
+        stage = stats.stages['prepare']
+        iterator = iter(source)
+        while True:
+            start_time = time.perf_counter()
+            # 前処理・重複除去などもスレッドで実行してイベントループを止めない
+            # （キューの上限分ずつ取り出し、キュー内で優先度順に並べる）
+            units = await loop.run_in_executor(prepare_executor, _take,
+                                               iterator, queue_size)
+            stage.busy_seconds += time.perf_counter() - start_time
+            for unit in units:
+                stage.items += 1
+                await translate_queue.put(
+                    (priority(unit), next(sequence), unit))
+            if len(units) < queue_size:
+                break
+        for _ in range(concurrency):
+            await translate_queue.put((_END_PRIORITY, next(sequence), None))
+
+    async def translate_stage():
+        stage = stats.stages['translate']
+        while True:
+            stats.queues['translate'].sample(translate_queue)
+            _, _, unit = await translate_queue.get()
+            if unit is None:
+                break
+            start_time = time.perf_counter()
+            result = await translate(unit)
+            stage.busy_seconds += time.perf_counter() - start_time
+            stage.items += 1
+            await finalize_queue.put((unit, result))
+
+    async def finalize_stage():
+        stage = stats.stages['finalize']
+        while True:
+            stats.queues['finalize'].sample(finalize_queue)
+            item = await finalize_queue.get()
+            if item is None:
+                break
+            start_time = time.perf_counter()
+            # 正規表現による品質チェックはスレッドで実行してイベントループを止めない
+            output = await loop.run_in_executor(executor, finalize, *item)
+            stage.busy_seconds += time.perf_counter() - start_time
+            stage.items += 1
+            await write_queue.put(output)
+        await write_queue.put(None)
+
+    async def write_stage():
+        stage = stats.stages['write']
+        while True:
+            stats.queues['write'].sample(write_queue)
+            output = await write_queue.get()
+            if output is None:
+                break
+            start_time = time.perf_counter()
+            write(output)
+            stage.busy_seconds += time.perf_counter() - start_time
+            stage.items += 1
+
+    async def translate_workers():
+        await asyncio.gather(*(translate_stage() for _ in range(concurrency)))
+        await finalize_queue.put(None)
+
+    start_time = time.perf_counter()
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in [
+        prepare_stage(), translate_workers(), finalize_stage(), write_stage()]]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=False)
+        prepare_executor.shutdown(wait=False)
+        stats.wall_seconds = time.perf_counter() - start_time
+
+    return stats
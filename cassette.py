@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 照合に使わないオプション（マシンのVRAMによって変わるもの）
+IGNORED_OPTIONS = ('num_gpu',)
+
+# 記録する応答のフィールド（本文・推論・トークン数・所要時間）
+RESPONSE_FIELDS = ('model', 'done_reason', 'total_duration', 'load_duration',
+                   'prompt_eval_count', 'prompt_eval_duration', 'eval_count',
+                   'eval_duration')
+
+
+class CassetteMiss(LookupError):
+    """再生モードで記録にないリクエストが送られた"""
+
+
+def request_key(request: dict) -> str:
+    """リクエスト内容（モデル・メッセージ・オプション・推論レベル）のハッシュ"""
+    options = {key: value for key, value in (request.get('options') or {}).items()
+               if key not in IGNORED_OPTIONS}
+    canonical = json.dumps({
+        'model': request['model'],
+        'messages': request['messages'],
+        'options': options,
+        'think': request.get('think'),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+def _open(path: str, mode: str):
+    """.gz で終わる場合は gzip 圧縮して読み書き"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def to_plain_response(response) -> dict:
+    """ollama の応答を記録用の辞書に変換"""
+    message = response['message']
+    plain = {
+        'message': {
+            'role': message.get('role') or 'assistant',
+            'content': message['content'],
+            'thinking': message.get('thinking'),
+        },
+    }
+    for field in RESPONSE_FIELDS:
+        value = response.get(field)
+        if value is not None:
+            plain[field] = value
+    return plain
+
+
+class Cassette:
+    """ollama.chat のリクエストと応答を記録・再生する
+
+    record: 応答を1行1件のJSONとして追記する。
+    replay: 記録した応答を、記録時の所要時間 / speed だけ待ってから返す
+            （speed=0 なら待たない）。同じリクエストが複数回記録されている場合は
+            記録順に返し、使い切ったら最後の応答を返し続ける。
+    """
+
+    def __init__(self, path: str, mode: str, speed: float = 1.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"不明なカセットモード: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.entries = {}
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+        if mode == 'record':
+            self._file = _open(path, 'w')
+        else:
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def _load(self):
+        with _open(self.path, 'r') as f:
+            for row in f:
+                if row.strip():
+                    entry = json.loads(row)
+                    self.entries.setdefault(entry['key'], deque()).append(entry)
+        logger.info("カセットを読み込みました: %s (%s件)",
+                    self.path, sum(len(e) for e in self.entries.values()))
+
+    def record(self, request: dict, response, elapsed: float):
+        entry = {
+            'key': request_key(request),
+            'model': request['model'],
+            'elapsed': round(elapsed, 4),
+            'response': to_plain_response(response),
+        }
+        row = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(row + '\n')
+            self._file.flush()
+            self.count += 1
+
+    def lookup(self, request: dict) -> tuple[dict, float]:
+        """記録済みの (応答, 待ち時間) を返す（記録にない場合は CassetteMiss）"""
+        key = request_key(request)
+        with self._lock:
+            recorded = self.entries.get(key)
+            if not recorded:
+                raise CassetteMiss(
+                    f"カセットに記録されていないリクエストです (model={request['model']}, "
+                    f"key={key})。プロンプトを変更した場合は --record で記録し直してください")
+            entry = recorded.popleft() if len(recorded) > 1 else recorded[0]
+            self.count += 1
+
+        delay = entry['elapsed'] / self.speed if self.speed > 0 else 0
+        # 本文は呼び出し側で加工されるため、記録のコピーを返す
+        return json.loads(json.dumps(entry['response'])), delay
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        action = '記録' if self.mode == 'record' else '再生'
+        logger.info("カセット: %s件の応答を%sしました (%s)", self.count, action, self.path)
@@ -29,7 +29,8 @@ def fix_color_tags(text: str, line_no: int = None) -> str:
         fixed_text = re.sub(incorrect_end_pattern, '[-][/c]', text)
 
         line_info = f"行{line_no}: " if line_no else ""
-        logger.info(f"カラータグ修正: {line_info}[/c] → [-][/c] を {incorrect_ends}箇所修正")
+        logger.info("カラータグ修正: %s[/c] → [-][/c] を %s箇所修正",
+                    line_info, incorrect_ends)
 
         return fixed_text
 
@@ -2,48 +2,113 @@ import re
 import logging
 from typing import Optional
 
+try:
+    from re import _parser as sre_parse  # Python 3.11以降
+except ImportError:
+    import sre_parse
+
 logger = logging.getLogger(__name__)
 
+# 語句の間に許す文字数（長い行でのバックトラックを抑えるため上限を付ける）
+MAX_GAP = 40
+
+# コンテンツフィルタのパターン（カテゴリ → 正規表現）
+FILTER_PATTERNS = {
+    # ブロックの通知
+    'blocked': (r"the generated text has been blocked by our content filters"
+                rf"|blocked.{{0,{MAX_GAP}}}?content.{{0,{MAX_GAP}}}?filter"),
+    # 英語の拒否応答
+    'refusal': r"i cannot provide|i['’]m not able to|i can['’]t assist with",
+    # ポリシー・ガイドラインへの言及
+    'policy': (r"content policy|safety guidelines|inappropriate content"
+               rf"|violates.{{0,{MAX_GAP}}}?policy"),
+    # 日本語の拒否応答（謝罪と「翻訳・AIとしてできない」の組み合わせ）
+    # 謝罪だけ・「対応できません」だけのゲーム内のセリフは対象外
+    'refusal_ja': (r"申し訳(?:ありません|ございません)(?:が|。)"
+                   rf".{{0,{MAX_GAP}}}?(?:翻訳|AI|言語モデル)"
+                   rf".{{0,{MAX_GAP}}}?(?:できません|いたしかねます)"
+                   r"|(?:AI|言語モデル)として.{0,20}?(?:できません|いたしかねます)"),
+    # 日本語のポリシー・ガイドラインへの言及
+    'policy_ja': (r"コンテンツ(?:ポリシー|フィルター?)"
+                  r"|(?:ガイドライン|ポリシー)に(?:違反|反する)"
+                  r"|不適切な(?:内容|コンテンツ|表現)が含まれ"),
+}
+
+
+def first_chars(pattern: str) -> Optional[set]:
+    """正規表現の一致の先頭になりうる文字の集合（求められない場合はNone）"""
+    def walk(parsed) -> Optional[set]:
+        if not len(parsed):
+            return None
+        op, av = parsed[0]
+        if op is sre_parse.LITERAL:
+            return {chr(av)}
+        if op is sre_parse.IN:
+            if any(item_op is not sre_parse.LITERAL for item_op, _ in av):
+                return None
+            return {chr(item) for _, item in av}
+        if op is sre_parse.SUBPATTERN:
+            return walk(av[-1])
+        if op is sre_parse.BRANCH:
+            chars = set()
+            for branch in av[1]:
+                branch_chars = walk(branch)
+                if branch_chars is None:
+                    return None
+                chars |= branch_chars
+            return chars
+        return None
+
+    return walk(sre_parse.parse(pattern, re.IGNORECASE | re.DOTALL))
 
-def detect_content_filter(text: str, line_no: Optional[int] = None) -> bool:
-    """コンテンツフィルタに引っかかった出力を検出"""
-
-    # コンテンツフィルタのパターン
-    filter_patterns = [
-        r"The generated text has been blocked by our content filters",
-        r"I cannot provide",
-        r"I'm not able to",
-        r"I can't assist with",
-        r"content policy",
-        r"safety guidelines",
-        r"inappropriate content",
-        r"blocked.*content.*filter",
-        r"violates.*policy"
-    ]
 
-    text_lower = text.lower()
+# 各パターンの先頭になりうる文字（大文字小文字は無視、求められなければNone）
+FIRST_CHARS = first_chars('|'.join(FILTER_PATTERNS.values()))
 
-    for pattern in filter_patterns:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            line_info = f"行{line_no}: " if line_no else ""
-            logger.warning(
-                f"コンテンツフィルタ検出: {line_info}翻訳がブロックされました"
-            )
-            logger.warning(f"検出パターン: {pattern}")
-            logger.warning(f"対象テキスト: {text.strip()}")
-            return True
+# 全カテゴリを1つの名前付きグループの選択に結合してコンパイル
+# 先読みで先頭文字を絞り込み、各位置で全パターンを試さないようにする
+FILTER_PATTERN = re.compile(
+    (f"(?=[{''.join(re.escape(char) for char in sorted(FIRST_CHARS))}])"
+     if FIRST_CHARS else "")
+    + "(?:"
+    + '|'.join(f"(?P<{category}>{pattern})"
+               for category, pattern in FILTER_PATTERNS.items())
+    + ")",
+    re.IGNORECASE | re.DOTALL)
 
-    return False
+
+def match_content_filter(text: str) -> Optional[re.Match]:
+    return FILTER_PATTERN.search(text)
+
+
+def detect_content_filter(text: str,
+                          line_no: Optional[int] = None) -> Optional[str]:
+    """コンテンツフィルタに引っかかった出力を検出し、カテゴリ名を返す（なければNone）"""
+    match = match_content_filter(text)
+    if match is None:
+        return None
+
+    line_info = f"行{line_no}: " if line_no else ""
+    logger.warning("コンテンツフィルタ検出: %s翻訳がブロックされました", line_info)
+    logger.warning("検出パターン: %s (%s)", match.lastgroup, match.group())
+    logger.warning("対象テキスト: %s", text.strip())
+    return match.lastgroup
 
 
 if __name__ == "__main__":
     # テスト用
+    import timeit
+
     test_cases = [
         "This is normal text",  # 正常
         "The generated text has been blocked by our content filters.",  # フィルタ
         "I cannot provide that information",  # フィルタ
         "Hello world",  # 正常
         "This violates our policy",  # フィルタ
+        "申し訳ありませんが、その文章は翻訳できません。",  # フィルタ
+        "申し訳ありませんが、ここは通せない。",  # 正常（セリフ）
+        "申し訳ありませんが、そのご注文には対応できません。",  # 正常（セリフ）
+        "このリクエストはコンテンツポリシーに違反しています。",  # フィルタ
     ]
 
     logging.basicConfig(level=logging.WARNING,
@@ -51,4 +116,14 @@ if __name__ == "__main__":
 
     for i, test in enumerate(test_cases, 1):
         print(f"\nテスト{i}: {test}")
-        detect_content_filter(test, i)
+        print(f"結果: {detect_content_filter(test, i)}")
+
+    # PDA長文（約5000文字）での処理時間
+    logging.disable(logging.WARNING)
+    long_texts = {
+        '通常の長文': "ブリッジのログを探す必要がある。 " * 250,
+        'blocked の繰り返し': "blocked content " * 300,
+    }
+    for name, text in long_texts.items():
+        seconds = timeit.timeit(lambda: detect_content_filter(text), number=200)
+        print(f"\n{name} ({len(text)}文字): {seconds / 200 * 1e6:.1f}µs/行")
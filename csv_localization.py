@@ -0,0 +1,438 @@
+import argparse
+import asyncio
+import csv
+import itertools
+import logging
+import os
+import time
+from datetime import datetime as dt
+from incremental import line_hash
+from quality_gate import NLINE_TOKEN, DEFAULT_MAX_REPAIR_ATTEMPTS, RepairItem
+from fast_path import build_glossary_index, resolve_locally, FastPathStats
+from scheduler import (iter_schedule, class_priority, ScheduleStats,
+                       DEFAULT_BATCH_SIZE)
+from async_pipeline import (run_pipeline, DEFAULT_CONCURRENCY,
+                            DEFAULT_QUEUE_SIZE)
+from ollama_client import (async_warm_up_model, runtime_settings,
+                           request_counter, set_model_concurrency,
+                           parse_reasoning_levels, log_usage_report,
+                           DEFAULT_KEEP_ALIVE, DEFAULT_REASONING)
+from ollama_translate import (translate_unit, finalize_translation,
+                              repair_failed_lines, can_batch_line,
+                              load_glossary, read_processor_words,
+                              processor_words, check_ollama_connection,
+                              MODEL_NAME)
+from log_config import setup_logging, LOG_LEVELS, DEFAULT_LOG_LEVEL
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMN = 'KEY'
+SOURCE_COLUMN = 'English'
+TARGET_COLUMN = 'Japanese'
+
+# 一度に読み込んで翻訳する行数（メモリ使用量の上限）
+DEFAULT_CHUNK_SIZE = 500
+
+# 入出力のバッファサイズ
+IO_BUFFER_SIZE = 1 << 20
+
+
+def split_record(record: str) -> tuple[list[str], str]:
+    """1レコードの文字列を、引用符を含む元のセル文字列のリストと改行コードに分割"""
+    body = record.rstrip('\r\n')
+    terminator = record[len(body):]
+    fields = []
+    start = 0
+    in_quotes = False
+    for position, char in enumerate(body):
+        if char == '"':
+            # 連続する "" は2回切り替わるため、エスケープされた引用符も扱える
+            in_quotes = not in_quotes
+        elif char == ',' and not in_quotes:
+            fields.append(body[start:position])
+            start = position + 1
+    fields.append(body[start:])
+    return fields, terminator
+
+
+def unquote_field(field: str) -> str:
+    if field.startswith('"') and field.endswith('"') and len(field) >= 2:
+        return field[1:-1].replace('""', '"')
+    return field
+
+
+def quote_field(value: str, quoted: bool) -> str:
+    """セルを書き出す文字列（元が引用符付きか、引用符が必要な場合は囲む）"""
+    if quoted or any(char in value for char in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def iter_records(f):
+    """CSVファイルから1レコード（セル内改行を含む）ずつ元の文字列を読み込む"""
+    record = ''
+    for physical_line in f:
+        record += physical_line
+        # 引用符が閉じていなければセル内の改行なので次の行と連結
+        if record.count('"') % 2 == 0:
+            yield record
+            record = ''
+    if record:
+        yield record
+
+
+class CsvRecord:
+    """CSVの1レコード（変更したセルのみ書き直し、他は元の文字列のまま書き出す）"""
+
+    def __init__(self, record: str):
+        self.fields, self.terminator = split_record(record)
+        self.values = [unquote_field(field) for field in self.fields]
+        self.original_values = list(self.values)
+
+    def is_blank(self) -> bool:
+        return self.values == ['']
+
+    def pad(self, column_count: int):
+        """列数が足りないレコードを空セルで補う（全セル引用符付きなら合わせる）"""
+        missing = column_count - len(self.values)
+        if missing <= 0:
+            return
+        all_quoted = all(field.startswith('"') for field in self.fields)
+        self.fields.extend([quote_field('', all_quoted)] * missing)
+        self.values.extend([''] * missing)
+        self.original_values.extend([''] * missing)
+
+    def to_text(self) -> str:
+        fields = [
+            field if value == original else
+            quote_field(value, field.startswith('"'))
+            for field, value, original in zip(self.fields, self.values,
+                                              self.original_values)
+        ]
+        return ','.join(fields) + self.terminator
+
+
+def find_column(header: list[str], name: str):
+    """列名から列番号を取得（BOM・大文字小文字は無視、見つからなければNone）"""
+    for index, column in enumerate(header):
+        if column.lstrip('\ufeff').strip().lower() == name.lower():
+            return index
+    return None
+
+
+def load_source_hashes(filename: str, key_column: str = KEY_COLUMN,
+                       source_column: str = SOURCE_COLUMN) -> dict:
+    """前回のCSVから KEY→英語のハッシュ を作成（古い翻訳の判定用）"""
+    hashes = {}
+    with open(filename, 'r', encoding='utf-8', newline='',
+              buffering=IO_BUFFER_SIZE) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        key_index = find_column(header, key_column)
+        source_index = find_column(header, source_column)
+        if key_index is None or source_index is None:
+            raise ValueError(f"{filename}: {key_column}列または"
+                             f"{source_column}列がありません")
+        for row in reader:
+            if len(row) > max(key_index, source_index):
+                hashes[row[key_index]] = line_hash(row[source_index])
+    logger.info("前回のCSVを読み込みました: %s (%s行)", filename, len(hashes))
+    return hashes
+
+
+def to_line(cell: str) -> str:
+    """セル内の改行を一時コードに置換（1行のテキストとして翻訳する）"""
+    return cell.replace('\r\n', '\n').replace('\n', NLINE_TOKEN)
+
+
+def to_cell(line: str) -> str:
+    return line.replace(NLINE_TOKEN, '\n')
+
+
+class RowResults:
+    """チャンク内の翻訳結果（repair_failed_lines の書き出し先）"""
+
+    def __init__(self):
+        self.results = {}
+
+    def put(self, index: int, text: str):
+        self.results[index] = text
+
+
+class CsvTranslator:
+    """ローカライズCSVの日本語列を、未翻訳・古い行のみ翻訳して書き出す"""
+
+    def __init__(self, args, glossary: dict, preprocessor_words: list[str],
+                 postprocessor_words: list[str], previous_hashes: dict = None):
+        self.args = args
+        self.glossary = glossary
+        self.glossary_index = build_glossary_index(glossary)
+        self.preprocessor_words = preprocessor_words
+        self.postprocessor_words = postprocessor_words
+        self.previous_hashes = previous_hashes or {}
+        self.stats = ScheduleStats()
+        self.fast_path_stats = FastPathStats()
+        self.row_count = 0
+        self.missing_count = 0
+        self.stale_count = 0
+        self.model_ready = False
+
+    async def ensure_model_ready(self):
+        """Ollama接続確認とモデルの事前ロード（LLMで翻訳する最初のチャンクの前に1回）
+
+        全行が翻訳済み・ローカル確定の場合はOllamaに接続しない。
+        """
+        if self.model_ready:
+            return
+        self.model_ready = True
+        if not self.args.no_connection_check:
+            await asyncio.to_thread(check_ollama_connection)
+        if self.args.no_warmup:
+            runtime_settings['keep_alive'] = self.args.keep_alive
+        else:
+            await async_warm_up_model(MODEL_NAME, self.args.keep_alive)
+
+    def needs_translation(self, row: list[str], key_index, source_index: int,
+                          target_index: int) -> bool:
+        """日本語セルが空、または前回から英語が変わっている行か"""
+        if not row[source_index].strip():
+            return False
+        if not row[target_index].strip():
+            self.missing_count += 1
+            return True
+        if key_index is not None and self.previous_hashes:
+            previous_hash = self.previous_hashes.get(row[key_index])
+            if (previous_hash is not None and
+                    previous_hash != line_hash(row[source_index])):
+                self.stale_count += 1
+                return True
+        return False
+
+    async def translate_chunk(self, jobs: list) -> dict:
+        """チャンク内の (行番号, テキスト) を翻訳して 行番号-1→翻訳 を返す"""
+        results = RowResults()
+        repair_queue = []
+        args = self.args
+
+        async def translate(unit):
+            line_numbers = ', '.join(str(line_no) for line_no, _ in unit.jobs)
+            logger.info("翻訳中: %s行目", line_numbers)
+            start_time = time.perf_counter()
+            counter = [0]
+            request_counter.set(counter)
+            translations = await translate_unit(
+                unit, self.glossary, args.casual, not args.no_tag_masking,
+                args.split_long)
+            self.stats.record(unit, time.perf_counter() - start_time,
+                              counter[0])
+            return translations
+
+        def finalize(unit, translations):
+            return [
+                (unit, line_no, line) + finalize_translation(
+                    line, translated_line, line_no, self.postprocessor_words)
+                for (line_no, line), translated_line in zip(unit.jobs,
+                                                            translations)
+            ]
+
+        def write(outputs):
+            for unit, line_no, line, final_line, failures in outputs:
+                if failures:
+                    self.stats.record_failure(unit)
+                if failures and args.max_repair_attempts > 0:
+                    repair_queue.append(RepairItem(
+                        line_no, line, final_line, failures))
+                else:
+                    results.put(line_no - 1, final_line)
+
+        await run_pipeline(
+            iter_schedule(jobs, args.batch_size, can_batch_line),
+            lambda unit: class_priority(unit.class_name),
+            translate, finalize, write, args.concurrency, args.queue_size)
+
+        if repair_queue:
+            await repair_failed_lines(
+                repair_queue, self.glossary, args.casual,
+                self.postprocessor_words, results, args.max_repair_attempts,
+                not args.no_tag_masking)
+
+        return results.results
+
+    async def translate_rows(self, rows: list, indexes: tuple):
+        """チャンク内の翻訳が必要な行の日本語セルを埋める"""
+        key_index, source_index, target_index = indexes
+        jobs = []
+        for line_no, record in rows:
+            row = record.values
+            if not self.needs_translation(row, key_index, source_index,
+                                          target_index):
+                continue
+            line = processor_words(to_line(row[source_index]),
+                                   self.preprocessor_words)
+
+            resolved_line, reason = resolve_locally(line, self.glossary_index)
+            if resolved_line is not None:
+                final_line, _ = finalize_translation(
+                    line, resolved_line, line_no, self.postprocessor_words)
+                row[target_index] = to_cell(final_line)
+                self.fast_path_stats.record(reason)
+                continue
+            jobs.append((line_no, line, row))
+
+        if jobs:
+            await self.ensure_model_ready()
+            results = await self.translate_chunk(
+                [(line_no, line) for line_no, line, _ in jobs])
+            for line_no, _, row in jobs:
+                row[target_index] = to_cell(results[line_no - 1])
+
+    async def run(self, input_file: str, output_file: str):
+        """入力CSVを1回走査して、チャンクごとに翻訳・書き出し
+
+        翻訳したセル以外は引用符・改行コードを含めて元の文字列のまま書き出す。
+        """
+        with open(input_file, 'r', encoding='utf-8', newline='',
+                  buffering=IO_BUFFER_SIZE) as inputfile, \
+                open(output_file, 'w', encoding='utf-8', newline='',
+                     buffering=IO_BUFFER_SIZE) as outputfile:
+            records = iter_records(inputfile)
+
+            first_record = next(records, None)
+            if first_record is None:
+                raise ValueError("ヘッダー行がありません")
+            header = CsvRecord(first_record)
+            key_index = find_column(header.values, self.args.key_column)
+            source_index = find_column(header.values, self.args.source_column)
+            if source_index is None:
+                raise ValueError(f"{self.args.source_column}列がありません")
+            target_index = find_column(header.values, self.args.target_column)
+            if target_index is None:
+                # 日本語列がなければ末尾に追加
+                header.pad(len(header.values) + 1)
+                target_index = len(header.values) - 1
+                header.values[target_index] = self.args.target_column
+                if not header.terminator:
+                    header.terminator = '\n'
+                logger.info("%s列を追加します", self.args.target_column)
+            column_count = len(header.values)
+            outputfile.write(header.to_text())
+
+            # 行番号はヘッダーを除いたデータ行の通し番号
+            numbered_records = enumerate(records, 1)
+            while True:
+                rows = list(itertools.islice(numbered_records,
+                                             self.args.chunk_size))
+                if not rows:
+                    break
+                # 空行はそのまま書き出す
+                data_rows = [(line_no, record) for line_no, record in
+                             ((line_no, CsvRecord(text)) for line_no, text in rows)
+                             if not record.is_blank()]
+                for _, record in data_rows:
+                    # 列数が足りない行は空セルで補う
+                    record.pad(column_count)
+                await self.translate_rows(
+                    data_rows, (key_index, source_index, target_index))
+                translated = dict(data_rows)
+                for line_no, text in rows:
+                    record = translated.get(line_no)
+                    outputfile.write(text if record is None
+                                     else record.to_text())
+                outputfile.flush()
+                self.row_count += len(data_rows)
+
+    def log_report(self):
+        logger.info("CSV: %s行中 未翻訳 %s行, 英語が変更された行 %s行を翻訳",
+                    self.row_count, self.missing_count, self.stale_count)
+        self.fast_path_stats.log_report(self.missing_count + self.stale_count)
+        self.stats.log_report()
+
+
+def main(args):
+    """メイン処理"""
+    setup_logging(args.log_level, args.qa_log)
+
+    # 長文の分割翻訳のセグメントも含め、同時リクエスト数を --concurrency までに抑える
+    set_model_concurrency(MODEL_NAME, args.concurrency)
+
+    if args.reasoning:
+        runtime_settings['reasoning'] = args.reasoning
+    elif MODEL_NAME.startswith('gpt-oss'):
+        runtime_settings['reasoning'] = dict(DEFAULT_REASONING)
+
+    previous_hashes = None
+    if args.prev_csv:
+        previous_hashes = load_source_hashes(
+            args.prev_csv, args.key_column, args.source_column)
+
+    translator = CsvTranslator(
+        args, load_glossary("deepl_glossary_empyrion.json"),
+        read_processor_words("preprocessor_words.tsv"),
+        read_processor_words("postprocessor_words.tsv"), previous_hashes)
+
+    try:
+        asyncio.run(translator.run(args.input, args.output))
+    except ValueError as e:
+        logger.error("CSVの形式が不正です: %s", e)
+        exit(1)
+
+    translator.log_report()
+    log_usage_report()
+    logger.info("翻訳完了: %s", args.output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Empyrion の Localization.csv / Dialogues.csv の日本語列を翻訳")
+    parser.add_argument('-i', '--input', required=True, help='入力CSVファイル')
+    parser.add_argument('-o', '--output', help='出力CSVファイル')
+    parser.add_argument('-c', '--casual', action='store_true',
+                        help='口語体モード（Dialogues.csv 用）')
+    parser.add_argument('--prev-csv',
+                        help='前回リリースのCSV（英語が変わった行の日本語を翻訳し直す）')
+    parser.add_argument('--key-column', default=KEY_COLUMN, help='キー列名')
+    parser.add_argument('--source-column', default=SOURCE_COLUMN, help='英語列名')
+    parser.add_argument('--target-column', default=TARGET_COLUMN, help='日本語列名')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='一度に読み込んで翻訳する行数')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='同時に送る翻訳リクエスト数')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='パイプラインの各キューの上限')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='短い行をまとめて翻訳する行数（1でまとめない）')
+    parser.add_argument('--max-repair-attempts', type=int,
+                        default=DEFAULT_MAX_REPAIR_ATTEMPTS,
+                        help='品質チェック失敗行の再翻訳回数（0で無効）')
+    parser.add_argument('--no-tag-masking', action='store_true',
+                        help='タグをプレースホルダーに置換せずにそのまま送る')
+    parser.add_argument('--split-long', action='store_true',
+                        help='長い行を段落・文単位に分割して並行に翻訳')
+    parser.add_argument('--log-level', default=DEFAULT_LOG_LEVEL,
+                        choices=LOG_LEVELS, help='ログの出力レベル')
+    parser.add_argument('--qa-log', metavar='FILE',
+                        help='品質チェックの警告（WARNING以上）も記録するファイル')
+    parser.add_argument('--reasoning',
+                        help='推論レベル off/low/medium/high '
+                             '（長さクラス別指定: short=off,long=medium）')
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE,
+                        help='モデルをメモリに保持する時間（例: 30m, -1で無期限）')
+    parser.add_argument('--no-warmup', action='store_true',
+                        help='最初のリクエスト前のモデル事前ロードを行わない')
+    parser.add_argument('--no-connection-check', action='store_true',
+                        help='最初のリクエスト前のOllama接続確認（モデル一覧の取得）を行わない')
+
+    args = parser.parse_args()
+
+    if args.reasoning:
+        try:
+            args.reasoning = parse_reasoning_levels(args.reasoning)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.output is None:
+        date_time_str = dt.now().strftime('%Y%m%d_%H%M%S')
+        base_name, extension = os.path.splitext(args.input)
+        args.output = f"{base_name}_ollama_{date_time_str}{extension}"
+
+    main(args)
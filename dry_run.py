@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from scheduler import classify_length, LENGTH_CLASSES
+from progress import format_duration
+
+logger = logging.getLogger(__name__)
+
+# 前回の実行で計測した処理速度の記録（モデルごと、出力ファイルと同じディレクトリ）
+THROUGHPUT_FILE = 'throughput.json'
+
+# トークン数の概算（英数字は約4文字で1トークン、日本語などは1文字1トークン）
+ASCII_CHARS_PER_TOKEN = 4
+
+# 実測がない場合の、原文1文字あたりの出力トークン数（推論を含む）
+DEFAULT_OUTPUT_TOKENS_PER_CHAR = 0.6
+
+
+def estimate_tokens(text: str) -> int:
+    """文字種からトークン数を概算"""
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return round(ascii_chars / ASCII_CHARS_PER_TOKEN
+                 + (len(text) - ascii_chars))
+
+
+def throughput_path(output_file: str) -> str:
+    """出力ファイルと同じディレクトリの処理速度の記録ファイル"""
+    return os.path.join(os.path.dirname(output_file), THROUGHPUT_FILE)
+
+
+def save_throughput(model: str, throughput: dict, settings: dict = None,
+                    filename: str = THROUGHPUT_FILE):
+    """実行時に計測した処理速度をモデルごとに記録"""
+    if not throughput:
+        return
+    records = {}
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    records[model] = dict(throughput, **(settings or {}),
+                          recorded_at=datetime.now().isoformat(
+                              timespec='seconds'))
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=1)
+    logger.debug("処理速度を記録しました: %s (%s)", filename, model)
+
+
+def load_throughput(model: str,
+                    filename: str = THROUGHPUT_FILE) -> Optional[dict]:
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f).get(model)
+
+
+class DryRunPlan:
+    """--dry-run で、LLMを呼び出さずにリクエスト数・トークン数・所要時間を見積もる"""
+
+    def __init__(self):
+        self.lines = Counter()  # 分類 → 行数
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.source_chars = 0
+        self.chars_by_class = Counter()
+
+    def classify(self, kind: str, count: int = 1):
+        """LLMを使わない行・翻訳方法などの分類を記録"""
+        if count:
+            self.lines[kind] += count
+
+    def add_line(self, text: str):
+        """LLMで翻訳する行（所要時間は行の長さクラスで見積もる）"""
+        self.chars_by_class[classify_length(text)] += len(text)
+
+    def add_request(self, prompt: str, source_text: str):
+        self.requests += 1
+        self.prompt_tokens += estimate_tokens(prompt)
+        self.source_chars += len(source_text)
+
+    def estimate(self, throughput: Optional[dict]) -> dict:
+        tokens_per_char = ((throughput or {}).get('output_tokens_per_char')
+                           or DEFAULT_OUTPUT_TOKENS_PER_CHAR)
+        estimate = {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'output_tokens': round(self.source_chars * tokens_per_char),
+            'seconds': None,
+        }
+        if throughput:
+            seconds_per_char = throughput['seconds_per_char']
+            average = (sum(seconds_per_char.values()) / len(seconds_per_char))
+            estimate['seconds'] = sum(
+                chars * seconds_per_char.get(class_name, average)
+                for class_name, chars in self.chars_by_class.items()
+            ) / max(throughput['parallelism'], 1e-9)
+        return estimate
+
+    def log_report(self, model: str, throughput: Optional[dict],
+                   concurrency: int = None):
+        estimate = self.estimate(throughput)
+        logger.info("=== ドライラン見積もり (%s) ===", model)
+        for kind, count in self.lines.most_common():
+            logger.info("  %s: %s行", kind, count)
+        for class_name, _, _ in LENGTH_CLASSES:
+            if self.chars_by_class[class_name]:
+                logger.info("  翻訳する文字数 %-6s: %s文字",
+                            class_name, self.chars_by_class[class_name])
+        logger.info("  LLMリクエスト: %s件 (リトライを除く)", estimate['requests'])
+        logger.info("  推定トークン数: 入力 %s / 出力 %s%s",
+                    estimate['prompt_tokens'], estimate['output_tokens'],
+                    '' if throughput and throughput.get('output_tokens_per_char')
+                    else ' (出力は既定の比率で概算)')
+        if estimate['seconds'] is None:
+            logger.info("  推定所要時間: 処理速度の記録がありません"
+                        "（一度翻訳を実行すると %s に記録されます）", THROUGHPUT_FILE)
+            return
+        logger.info("  推定所要時間: 約%s (%s の記録: 並行数 %s, 並行度 %.1f)",
+                    format_duration(estimate['seconds']),
+                    throughput['recorded_at'], throughput.get('concurrency'),
+                    throughput['parallelism'])
+        if concurrency and throughput.get('concurrency') not in (None, concurrency):
+            logger.info("  ※並行数が記録時と異なるため、所要時間は目安です")
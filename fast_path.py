@@ -0,0 +1,177 @@
+import re
+import logging
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate
+from typing import Optional
+from tag_masking import mask_tags, PLACEHOLDER_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# ひらがな・カタカナ・漢字
+JAPANESE_CHAR_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]')
+ENGLISH_WORD_PATTERN = re.compile(r'\b[A-Za-z]{2,}\b')
+LETTER_PATTERN = re.compile(r'[A-Za-z\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]')
+
+# 照合用データを保持する用語集の数（翻訳中の用語集と、用語集変更時の追加分など）
+MAX_GLOSSARY_MATCHERS = 8
+
+# 判定理由の表示名
+REASON_LABELS = {
+    'empty': '空行',
+    'markup': 'タグ・数値のみ',
+    'japanese': '翻訳済み',
+    'glossary': '用語集一致',
+}
+
+
+def build_glossary_index(glossary: dict) -> dict:
+    """用語集の完全一致検索用インデックス（大文字小文字を区別しない）"""
+    index = {}
+    for en_term, ja_term in glossary.items():
+        index.setdefault(en_term.strip().lower(), ja_term)
+    return index
+
+
+class GlossaryMatcher:
+    """テキストの単語を含む用語の抽出用に、小文字化した全用語を改行で連結したもの
+
+    用語ごとに全単語を調べる代わりに、単語ごとに連結文字列を str.find で探し、
+    見つかった位置の用語を用語集の順に返す。単語ごとの結果は記憶して再利用する。
+    """
+
+    def __init__(self, glossary: dict):
+        self.glossary = glossary
+        self.terms = list(glossary.items())
+        lowered = [en_term.lower() for en_term, _ in self.terms]
+        self.joined = '\n'.join(lowered)
+        self.starts = list(accumulate(
+            (len(term) + 1 for term in lowered[:-1]), initial=0))
+        self.word_hits = {}  # 単語 → 単語を含む用語の番号
+
+    def find_word(self, word: str) -> tuple:
+        hits = self.word_hits.get(word)
+        if hits is not None:
+            return hits
+        hits = []
+        position = self.joined.find(word)
+        while position != -1:
+            index = bisect_right(self.starts, position) - 1
+            hits.append(index)
+            # 同じ用語内の2つ目以降の出現は飛ばす
+            next_start = (self.starts[index + 1]
+                          if index + 1 < len(self.starts) else len(self.joined))
+            position = self.joined.find(word, next_start)
+        hits = self.word_hits[word] = tuple(hits)
+        return hits
+
+    def filter(self, words) -> dict:
+        """いずれかの単語を含む用語（単語と一致する用語も含む）"""
+        hits = set()
+        for word in words:
+            hits.update(self.find_word(word))
+        return {self.terms[index][0]: self.terms[index][1]
+                for index in sorted(hits)}
+
+
+_glossary_matchers = {}  # 用語集の内容（項目のタプル）→ GlossaryMatcher
+# 直近に照合した (用語集, 作成時の内容のコピー, GlossaryMatcher)。用語集への参照を
+# 保持するため、同じ辞書かどうかを id ではなく is で判定できる
+_recent_glossaries = []
+
+
+def compile_glossary(glossary: dict) -> GlossaryMatcher:
+    """用語集の照合用データ（同じ内容の用語集には作成済みのものを返す）
+
+    直近に使った辞書はコピーとの比較だけで再利用する（その場で書き換えられていれば作り直す）。
+    """
+    for recent_glossary, snapshot, matcher in _recent_glossaries:
+        if recent_glossary is glossary and snapshot == glossary:
+            return matcher
+
+    key = tuple(glossary.items())
+    matcher = _glossary_matchers.get(key)
+    if matcher is None:
+        if len(_glossary_matchers) >= MAX_GLOSSARY_MATCHERS:
+            del _glossary_matchers[next(iter(_glossary_matchers))]
+        matcher = _glossary_matchers[key] = GlossaryMatcher(glossary)
+    _recent_glossaries[:] = [(glossary, dict(glossary), matcher)] + [
+        recent for recent in _recent_glossaries
+        if recent[0] is not glossary][:MAX_GLOSSARY_MATCHERS - 1]
+    return matcher
+
+
+def is_already_japanese(text: str) -> bool:
+    """日本語に翻訳済みのテキストかどうか"""
+    japanese_chars = len(JAPANESE_CHAR_PATTERN.findall(text))
+    english_words = len(ENGLISH_WORD_PATTERN.findall(text))
+    return japanese_chars > 0 and english_words * 2 <= japanese_chars
+
+
+def resolve_locally(text: str, glossary_index: dict) -> tuple[Optional[str], str]:
+    """LLMを使わずに確定できる行を判定して (翻訳, 理由) を返す
+
+    確定できない場合は (None, '') を返す。
+    """
+    if not text.strip():
+        return text.strip(), 'empty'
+
+    tag_mask = mask_tags(text)
+    body = text if tag_mask is None else tag_mask.text
+    plain_text = PLACEHOLDER_PATTERN.sub('', body).strip()
+
+    # タグ・数値・記号のみ
+    if not LETTER_PATTERN.search(plain_text):
+        return text.strip(), 'markup'
+
+    if is_already_japanese(plain_text):
+        return text.strip(), 'japanese'
+
+    # 用語集の完全一致（タグで囲まれている場合も含む）
+    ja_term = glossary_index.get(plain_text.lower())
+    if ja_term is not None:
+        translated = body.strip().replace(plain_text, ja_term, 1)
+        if tag_mask is not None:
+            translated = tag_mask.restore(translated)
+        if translated is not None:
+            return translated, 'glossary'
+
+    return None, ''
+
+
+class FastPathStats:
+    """LLM呼び出しを回避した行数を集計"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def record(self, reason: str):
+        self.counts[reason] += 1
+
+    def log_report(self, total: int):
+        skipped = sum(self.counts.values())
+        if not skipped:
+            return
+        details = ', '.join(f"{REASON_LABELS[reason]} {count}"
+                            for reason, count in self.counts.items())
+        logger.info("ローカル確定: %s行中 %s行のLLM呼び出しを回避 (%s)",
+                    total, skipped, details)
+
+
+if __name__ == "__main__":
+    # テスト用
+    glossary_index = build_glossary_index({'Equipped:': '装備:'})
+    test_cases = [
+        "",
+        "[c][ff0000]1,000[-][/c]",
+        "装備を確認してください",
+        "Equipped:",
+        "[b]Equipped:[/b]",
+        "Locate bridge",
+    ]
+
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s]: %(message)s')
+
+    for i, test in enumerate(test_cases, 1):
+        print(f"\nテスト{i}: {test!r}")
+        print(f"結果: {resolve_locally(test, glossary_index)}")
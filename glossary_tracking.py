@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+from typing import Optional
+from incremental import line_hash
+
+logger = logging.getLogger(__name__)
+
+# 翻訳結果と一緒に書き出す用語記録ファイルの拡張子
+TERMS_SUFFIX = '.terms.json'
+
+
+def terms_path(output_file: str) -> str:
+    return output_file + TERMS_SUFFIX
+
+
+class TermRecord:
+    """翻訳時の用語集と、行ごとに適用された用語（行ハッシュ→英語の用語リスト）"""
+
+    def __init__(self, glossary: dict, lines: dict = None):
+        self.glossary = glossary
+        self.lines = lines if lines is not None else {}
+
+    def record(self, source_line: str, terms):
+        self.lines[line_hash(source_line)] = sorted(terms)
+
+    def get(self, source_line: str) -> Optional[list[str]]:
+        return self.lines.get(line_hash(source_line))
+
+    def save(self, output_file: str):
+        with open(terms_path(output_file), 'w', encoding='utf-8') as f:
+            json.dump({'glossary': self.glossary, 'lines': self.lines}, f,
+                      ensure_ascii=False)
+        logger.debug("用語記録を出力しました: %s (%s行)",
+                     terms_path(output_file), len(self.lines))
+
+    @classmethod
+    def load(cls, output_file: str):
+        """用語記録を読み込み（記録がない場合はNone）"""
+        if not os.path.exists(terms_path(output_file)):
+            return None
+        with open(terms_path(output_file), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['glossary'], data['lines'])
+
+
+def diff_glossary(old_glossary: dict, new_glossary: dict) -> tuple[set, dict]:
+    """用語集の差分を (訳語が変更・削除された用語, 追加された用語集) で返す"""
+    changed = {en_term for en_term, ja_term in old_glossary.items()
+               if new_glossary.get(en_term) != ja_term}
+    added = {en_term: ja_term for en_term, ja_term in new_glossary.items()
+             if en_term not in old_glossary}
+    return changed, added
+
+
+class GlossaryInvalidator:
+    """前回の翻訳のうち、用語集の変更の影響を受ける行を判定
+
+    match_terms は (テキスト, 用語集) から該当する用語集を返す関数
+    （翻訳時の用語抽出と同じもの）。
+    """
+
+    def __init__(self, record: Optional[TermRecord], glossary: dict,
+                 match_terms):
+        self.record = record
+        self.match_terms = match_terms
+        self.changed, self.added = (diff_glossary(record.glossary, glossary)
+                                    if record else (set(), {}))
+        self.affected_count = 0
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.changed or self.added)
+
+    def is_affected(self, source_line: str, text: str) -> bool:
+        """text（前処理後の行）の翻訳に変更された用語が関係するか"""
+        if not self.has_changes:
+            return False
+
+        terms = self.record.get(source_line)
+        affected = (terms is None  # 記録がない行は安全側で再翻訳
+                    or not self.changed.isdisjoint(terms)
+                    or bool(self.added and self.match_terms(text, self.added)))
+        if affected:
+            self.affected_count += 1
+        return affected
+
+    def log_report(self):
+        if not self.has_changes:
+            return
+        logger.info("用語集の変更: 変更・削除 %s語, 追加 %s語 → %s行を再翻訳",
+                    len(self.changed), len(self.added), self.affected_count)
+
+
+def merge_term_records(shard_files: list[str], output_file: str) -> bool:
+    """シャードごとの用語記録を結合（全シャードに記録がある場合のみ）"""
+    records = [TermRecord.load(shard_file) for shard_file in shard_files]
+    if not records or any(record is None for record in records):
+        return False
+
+    merged = TermRecord(records[0].glossary)
+    for record in records:
+        merged.lines.update(record.lines)
+    merged.save(output_file)
+    return True
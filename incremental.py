@@ -0,0 +1,117 @@
+import argparse
+import difflib
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+DIFF_TSV_HEADER = "English_PDA_old\tEnglish\tJapanese_PDA_old"
+
+
+def line_hash(text: str) -> str:
+    """行内容のハッシュ（前後の空白・改行は無視）"""
+    return hashlib.sha1(text.strip().encode('utf-8')).hexdigest()
+
+
+def read_lines(filename: str) -> list[str]:
+    """ファイルを改行なしの行リストとして読み込み"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\r\n') for line in f]
+
+
+def load_previous_translations(old_source: str, old_output: str) -> dict:
+    """前回リリースの英語/日本語ファイルから ハッシュ→日本語 の対応表を作成"""
+    old_english = read_lines(old_source)
+    old_japanese = read_lines(old_output)
+
+    if len(old_english) != len(old_japanese):
+        logger.warning("前回ファイルの行数が一致しません - 英語:%s, 日本語:%s",
+                       len(old_english), len(old_japanese))
+
+    translations = {}
+    for english, japanese in zip(old_english, old_japanese):
+        # 同じ英語が複数ある場合は最初の訳を採用
+        translations.setdefault(line_hash(english), japanese)
+
+    logger.info("前回翻訳を読み込みました: %s件", len(translations))
+    return translations
+
+
+def align_lines(old_lines: list[str], new_lines: list[str]) -> list:
+    """新旧の英語行をハッシュで対応付け
+
+    新しい行ごとに (状態, 旧行インデックス) を返す。
+    状態は 'equal'（変更なし）, 'replace'（変更あり）, 'insert'（新規）。
+    """
+    old_hashes = [line_hash(line) for line in old_lines]
+    new_hashes = [line_hash(line) for line in new_lines]
+
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes,
+                                      autojunk=False)
+    alignment = [None] * len(new_lines)
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        for offset, j in enumerate(range(j1, j2)):
+            if tag == 'equal':
+                alignment[j] = ('equal', i1 + offset)
+            elif tag == 'replace' and i1 + offset < i2:
+                alignment[j] = ('replace', i1 + offset)
+            else:
+                alignment[j] = ('insert', None)
+
+    return alignment
+
+
+def build_diff_rows(old_source: str, old_output: str,
+                    new_source: str) -> list[tuple]:
+    """変更・追加された行を (旧英語, 新英語, 旧日本語) として抽出"""
+    old_english = read_lines(old_source)
+    old_japanese = read_lines(old_output)
+    new_english = read_lines(new_source)
+    translations = load_previous_translations(old_source, old_output)
+
+    rows = []
+    for j, (status, i) in enumerate(align_lines(old_english, new_english)):
+        if status == 'equal':
+            continue
+        # 位置がずれていても同じ英語が以前にあれば変更なし扱い
+        if line_hash(new_english[j]) in translations:
+            continue
+        if status == 'replace' and i < len(old_japanese):
+            rows.append((old_english[i], new_english[j], old_japanese[i]))
+        else:
+            rows.append(('', new_english[j], ''))
+
+    return rows
+
+
+def write_diff_tsv(rows: list[tuple], output_file: str):
+    """ollama_diff_translate.py の入力形式でTSVを出力"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(DIFF_TSV_HEADER + '\n')
+        for row in rows:
+            f.write('\t'.join(row) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="前回リリースとの差分から差分翻訳用TSVを生成")
+    parser.add_argument('--old-source', required=True, help='前回の英語ファイル')
+    parser.add_argument('--old-output', required=True, help='前回の日本語ファイル')
+    parser.add_argument('-i', '--input', required=True, help='今回の英語ファイル')
+    parser.add_argument('-o', '--output', required=True, help='出力TSVファイル')
+
+    args = parser.parse_args()
+
+    rows = build_diff_rows(args.old_source, args.old_output, args.input)
+    write_diff_tsv(rows, args.output)
+
+    changed = sum(1 for row in rows if row[0])
+    logger.info("差分TSVを出力しました: %s (変更:%s行, 新規:%s行)",
+                args.output, changed, len(rows) - changed)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s]: %(message)s')
+    main()
@@ -0,0 +1,68 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '[%(levelname)s]: %(message)s'
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+DEFAULT_LOG_LEVEL = 'INFO'
+
+# 品質チェックの警告（WARNING以上）を残すファイルの書式（--qa-log 指定時のみ）
+QA_LOG_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+QA_LOG_MAX_BYTES = 5 * 1024 * 1024
+QA_LOG_BACKUP_COUNT = 3
+
+_listener = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """メッセージの整形をリスナースレッドに任せる QueueHandler
+
+    同一プロセス内のキューのため、ログレコードをそのまま渡す。
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level: str = DEFAULT_LOG_LEVEL, qa_log_file: str = None):
+    """ログ出力をキュー経由にして、コンソール・QAログへの書き出しを別スレッドで行う
+
+    qa_log_file を指定した場合のみ、WARNING以上をそのファイルにも記録する。
+    """
+    global _listener
+    stop_logging()
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [console_handler]
+
+    if qa_log_file:
+        qa_handler = RotatingFileHandler(
+            qa_log_file, maxBytes=QA_LOG_MAX_BYTES,
+            backupCount=QA_LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+        qa_handler.setLevel(logging.WARNING)
+        qa_handler.setFormatter(logging.Formatter(QA_LOG_FORMAT))
+        handlers.append(qa_handler)
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(DeferredQueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers,
+                              respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """キューに残っているログを書き出してリスナーを停止"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,401 @@
+import re
+import asyncio
+import contextlib
+import contextvars
+import logging
+import subprocess
+import threading
+import time
+from scheduler import LENGTH_CLASSES
+
+logger = logging.getLogger(__name__)
+
+# モデルをメモリに保持する時間（ジョブ間でのアンロード防止）
+DEFAULT_KEEP_ALIVE = '30m'
+
+# モデルサイズに対して必要とみなすVRAMの倍率（KVキャッシュ等の余裕）
+VRAM_MARGIN = 1.2
+
+# 推論モデル（gpt-oss）の推論レベル
+REASONING_LEVELS = ('off', 'low', 'medium', 'high')
+
+# 長さクラスごとの既定の推論レベル（短い行ほど推論を減らす）
+DEFAULT_REASONING = {'short': 'low', 'medium': 'low', 'long': 'medium'}
+
+# 応答本文に混入した推論テキストの検出
+THINK_BLOCK_PATTERN = re.compile(r'<think>.*?</think>', re.DOTALL)
+FINAL_ANSWER_MARKERS = ['<|channel|>final<|message|>', 'assistantfinal']
+
+# ollama.chat に共通で渡す設定（ウォームアップ時に決定）
+runtime_settings = {
+    'keep_alive': DEFAULT_KEEP_ALIVE,
+    'model_options': {},  # モデル名→GPUオプション
+    'reasoning': {},  # 長さクラス→推論レベル（空なら指定しない）
+    'cassette': None,  # 応答の記録・再生（cassette.Cassette）
+}
+
+# モデルごとの同時リクエスト数の上限
+model_limits = {}
+model_semaphores = {}
+async_model_semaphores = {}
+
+_stats_lock = threading.Lock()
+
+# 非同期パイプラインで共有するクライアント
+# （ollama は httpx 等の読み込みに時間がかかるため、Ollamaを呼び出す関数内で読み込む。
+# 全行を再利用・再生する実行やドライランでは読み込まない）
+_async_client = None
+
+# 呼び出し元ごとのリクエスト数カウンター（[件数] のリストを設定する）
+request_counter = contextvars.ContextVar('request_counter', default=None)
+
+# 実行中のリクエスト数などの集計
+usage_stats = {
+    'requests': 0,
+    'by_reasoning': {},
+}
+
+
+def get_model_size_gb(model_name):
+    """モデルのサイズをGB単位で取得（取得できない場合はNone）"""
+    import ollama
+    try:
+        models = ollama.list()
+        logger.debug("モデル情報: %s", models)
+
+        for model in models['models']:
+            logger.debug("モデル詳細: %s", model)
+            # 様々なキーを試す
+            name = model.get('name') or model.get('model') or model.get('id', '')
+            if name == model_name:
+                size_bytes = model.get('size', 0)
+                size_gb = size_bytes / (1024**3)
+                logger.info("モデルサイズ: %.1fGB", size_gb)
+                return size_gb
+        logger.error("モデル %s が見つかりません", model_name)
+        return None
+    except Exception as e:
+        # 取得できなくても翻訳は続ける（GPU割り当てはOllamaの自動設定）
+        logger.warning("モデルサイズ取得エラー: %s", e)
+        logger.debug("モデル情報の構造: %s", models if 'models' in locals() else 'N/A')
+        return None
+
+
+def get_available_vram_gb():
+    """利用可能なVRAMをGB単位で取得（取得できない場合は0.0）"""
+    try:
+        result = subprocess.run(
+            ['nvidia-smi', '--query-gpu=memory.free',
+             '--format=csv,noheader,nounits'],
+            capture_output=True, text=True)
+        if result.returncode == 0:
+            vram_mb = int(result.stdout.strip().split('\n')[0])
+            vram_gb = vram_mb / 1024
+            logger.info("利用可能VRAM: %.1fGB", vram_gb)
+            return vram_gb
+        else:
+            logger.warning("nvidia-smiコマンドが失敗しました")
+            return 0.0
+    except FileNotFoundError:
+        logger.warning("nvidia-smiが見つかりません（GPUなし環境）")
+        return 0.0
+    except Exception as e:
+        # 想定外の出力形式など。取得できなくても翻訳は続ける
+        logger.warning("VRAM取得エラー: %s", e)
+        return 0.0
+
+
+def get_model_layer_count(model_name: str):
+    """モデルのレイヤー数を取得（取得できない場合はNone）"""
+    import ollama
+    try:
+        model_info = ollama.show(model_name).get('modelinfo') or {}
+        for key, value in model_info.items():
+            if key.endswith('.block_count'):
+                return int(value)
+    except Exception as e:
+        logger.warning("モデル情報取得エラー: %s", e)
+    return None
+
+
+def select_gpu_options(model_name: str) -> dict:
+    """VRAM量からGPUフル/部分オフロードを判定してオプションを返す"""
+    model_size = get_model_size_gb(model_name)
+    available_vram = get_available_vram_gb()
+
+    if not model_size or available_vram <= 0:
+        logger.info("GPU割り当て: 判定不可のためOllamaの自動設定を使用")
+        return {}
+
+    required_vram = model_size * VRAM_MARGIN
+    logger.info("必要VRAM(推定): %.1fGB", required_vram)
+
+    if available_vram >= required_vram:
+        logger.info("GPU割り当て: フルGPU")
+        return {}
+
+    layer_count = get_model_layer_count(model_name)
+    if layer_count is None:
+        logger.info("GPU割り当て: レイヤー数不明のためOllamaの自動設定を使用")
+        return {}
+
+    gpu_layers = int(layer_count * available_vram / required_vram)
+    if gpu_layers == 0:
+        logger.warning("GPU割り当て: VRAM不足のためCPU実行")
+    else:
+        logger.info("GPU割り当て: 部分オフロード (%s/%sレイヤーをGPUに配置)",
+                    gpu_layers, layer_count)
+    return {'num_gpu': gpu_layers}
+
+
+def _load_model(model_name: str, keep_alive: str, options: dict):
+    """空プロンプトでモデルのロードのみを行う"""
+    import ollama
+    ollama.generate(model=model_name, prompt='',
+                    keep_alive=keep_alive, options=options)
+
+
+def warm_up_model(model_name: str,
+                  keep_alive: str = DEFAULT_KEEP_ALIVE) -> float:
+    """モデルを事前ロードしてkeep_aliveを設定（所要秒数を返す）"""
+    options = select_gpu_options(model_name)
+    runtime_settings['keep_alive'] = keep_alive
+    runtime_settings['model_options'][model_name] = options
+
+    logger.info("モデルをウォームアップ中: %s (keep_alive=%s, options=%s)",
+                model_name, keep_alive, options)
+    start_time = time.perf_counter()
+    _load_model(model_name, keep_alive, options)
+    elapsed = time.perf_counter() - start_time
+    logger.info("ウォームアップ完了: %.1f秒", elapsed)
+    return elapsed
+
+
+async def async_warm_up_model(model_name: str,
+                              keep_alive: str = DEFAULT_KEEP_ALIVE) -> float:
+    """warm_up_model() をスレッドで実行（GPU判定・ロード待ちの間もイベントループを止めない）"""
+    return await asyncio.to_thread(warm_up_model, model_name, keep_alive)
+
+
+def parse_reasoning_levels(spec: str) -> dict:
+    """推論レベル指定を解析（例: "low", "short=off,long=medium"）"""
+    levels = {}
+    if not spec:
+        return levels
+
+    class_names = [class_name for class_name, _, _ in LENGTH_CLASSES]
+    for part in spec.split(','):
+        part = part.strip()
+        if '=' in part:
+            class_name, level = [s.strip() for s in part.split('=', 1)]
+            if class_name not in class_names:
+                raise ValueError(f"不明な長さクラス: {class_name}")
+            targets = [class_name]
+        else:
+            level = part
+            targets = class_names
+        if level not in REASONING_LEVELS:
+            raise ValueError(f"不明な推論レベル: {level}")
+        for class_name in targets:
+            levels[class_name] = level
+    return levels
+
+
+def get_reasoning_level(class_name: str):
+    """長さクラスに対応する推論レベル（未指定ならNone）"""
+    return runtime_settings['reasoning'].get(class_name)
+
+
+def to_think_value(level):
+    """推論レベルを ollama.chat の think 引数に変換"""
+    if level is None:
+        return None
+    if level == 'off':
+        return False
+    return level
+
+
+def separate_thinking(content: str) -> tuple[str, str]:
+    """応答本文に混入した推論テキストを分離して (本文, 推論) を返す"""
+    leaked = []
+
+    for match in THINK_BLOCK_PATTERN.finditer(content):
+        leaked.append(match.group(0))
+    content = THINK_BLOCK_PATTERN.sub('', content)
+
+    # 開始タグのない閉じタグ: それより前が推論
+    if '</think>' in content:
+        reasoning, content = content.rsplit('</think>', 1)
+        leaked.append(reasoning)
+    # 閉じタグのない開始タグ（推論の途中で応答が終わった）: それより後が推論
+    if '<think>' in content:
+        content, reasoning = content.split('<think>', 1)
+        leaked.append(reasoning)
+
+    for marker in FINAL_ANSWER_MARKERS:
+        if marker in content:
+            reasoning, content = content.rsplit(marker, 1)
+            leaked.append(reasoning)
+
+    if leaked:
+        logger.warning("応答本文に推論テキストが混入していたため除去しました")
+    return content.strip(), ''.join(leaked)
+
+
+def record_usage(level, response, thinking: str, answer: str):
+    """推論トークンと回答トークンを推論レベルごとに集計"""
+    eval_count = response.get('eval_count') or 0
+    # eval_count は推論と回答の合計のため、文字数の比率で按分する
+    total_chars = len(thinking) + len(answer)
+    thinking_tokens = (round(eval_count * len(thinking) / total_chars)
+                       if total_chars else 0)
+
+    with _stats_lock:
+        entry = usage_stats['by_reasoning'].setdefault(
+            level or 'default',
+            {'requests': 0, 'prompt_tokens': 0, 'thinking_tokens': 0,
+             'answer_tokens': 0, 'eval_seconds': 0.0})
+        entry['requests'] += 1
+        entry['prompt_tokens'] += response.get('prompt_eval_count') or 0
+        entry['thinking_tokens'] += thinking_tokens
+        entry['answer_tokens'] += eval_count - thinking_tokens
+        entry['eval_seconds'] += (response.get('eval_duration') or 0) / 1e9
+
+
+def generated_token_count() -> int:
+    """これまでに生成されたトークン数（推論＋回答）"""
+    with _stats_lock:
+        return sum(entry['thinking_tokens'] + entry['answer_tokens']
+                   for entry in usage_stats['by_reasoning'].values())
+
+
+def log_usage_report():
+    """推論レベルごとのトークン数レポートを出力"""
+    if not usage_stats['by_reasoning']:
+        return
+
+    logger.info("=== 推論トークンレポート ===")
+    for level, entry in usage_stats['by_reasoning'].items():
+        generated = entry['thinking_tokens'] + entry['answer_tokens']
+        thinking_ratio = entry['thinking_tokens'] / generated if generated else 0
+        logger.info(
+            "  %-7s: %sリクエスト, 入力 %sトークン, "
+            "推論 %sトークン / 回答 %sトークン (推論率: %.0f%%), 生成時間 %.1f秒",
+            level, entry['requests'], entry['prompt_tokens'],
+            entry['thinking_tokens'], entry['answer_tokens'],
+            thinking_ratio * 100, entry['eval_seconds'])
+
+
+def set_model_concurrency(model_name: str, limit: int):
+    """モデルごとの同時リクエスト数の上限を設定"""
+    model_limits[model_name] = max(limit, 1)
+    model_semaphores[model_name] = threading.BoundedSemaphore(
+        model_limits[model_name])
+    async_model_semaphores.pop(model_name, None)
+
+
+def build_chat_request(model: str, messages: list, options: dict = None,
+                       reasoning: str = None) -> dict:
+    """共通設定（keep_alive, GPUオプション, 推論レベル）を付けたリクエスト"""
+    merged_options = dict(runtime_settings['model_options'].get(model, {}))
+    if options:
+        merged_options.update(options)
+
+    request = {
+        'model': model,
+        'messages': messages,
+        'options': merged_options or None,
+        'keep_alive': runtime_settings['keep_alive'],
+    }
+    think = to_think_value(reasoning)
+    if think is not None:
+        request['think'] = think
+
+    with _stats_lock:
+        usage_stats['requests'] += 1
+    counter = request_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return request
+
+
+def process_chat_response(response, reasoning: str = None):
+    """推論テキストを本文から分離し、トークン数を集計"""
+    message = response['message']
+    content, leaked = separate_thinking(message['content'])
+    thinking = (message.get('thinking') or '') + leaked
+    message['content'] = content
+
+    record_usage(reasoning, response, thinking, content)
+    return response
+
+
+def _exchange(request: dict):
+    """ollama.chat を呼び出す（カセット設定時は記録・再生）"""
+    cassette = runtime_settings['cassette']
+    if cassette is not None and cassette.replaying:
+        response, delay = cassette.lookup(request)
+        time.sleep(delay)
+        return response
+
+    import ollama
+    start_time = time.perf_counter()
+    response = ollama.chat(**request)
+    if cassette is not None:
+        cassette.record(request, response, time.perf_counter() - start_time)
+    return response
+
+
+def chat(model: str, messages: list, options: dict = None,
+         reasoning: str = None):
+    """共通設定（keep_alive, GPUオプション, 推論レベル）を付けて ollama.chat を呼び出す
+
+    応答の message.content には推論テキストを除いた本文のみを入れて返す。
+    """
+    request = build_chat_request(model, messages, options, reasoning)
+
+    with model_semaphores.get(model) or contextlib.nullcontext():
+        response = _exchange(request)
+
+    return process_chat_response(response, reasoning)
+
+
+def get_async_client():
+    """非同期クライアントを取得（初回呼び出し時に作成）"""
+    global _async_client
+    if _async_client is None:
+        import ollama
+        _async_client = ollama.AsyncClient()
+    return _async_client
+
+
+async def _async_exchange(request: dict):
+    """_exchange() の非同期版"""
+    cassette = runtime_settings['cassette']
+    if cassette is not None and cassette.replaying:
+        response, delay = cassette.lookup(request)
+        await asyncio.sleep(delay)
+        return response
+
+    start_time = time.perf_counter()
+    response = await get_async_client().chat(**request)
+    if cassette is not None:
+        cassette.record(request, response, time.perf_counter() - start_time)
+    return response
+
+
+async def async_chat(model: str, messages: list, options: dict = None,
+                     reasoning: str = None):
+    """chat() の非同期版（ollama.AsyncClient を使用）"""
+    request = build_chat_request(model, messages, options, reasoning)
+
+    limit = model_limits.get(model)
+    if limit is None:
+        response = await _async_exchange(request)
+    else:
+        semaphore = async_model_semaphores.setdefault(
+            model, asyncio.Semaphore(limit))
+        async with semaphore:
+            response = await _async_exchange(request)
+
+    return process_chat_response(response, reasoning)
@@ -1,4 +1,3 @@
-import ollama
 import json
 import re
 import argparse
@@ -11,30 +10,41 @@ from tag_validator import check_translation_tags
 from content_filter_detector import detect_content_filter
 from color_tag_fixer import fix_color_tags
 from punctuation_formatter import format_punctuation
+from ollama_client import (chat, warm_up_model, runtime_settings,
+                           get_reasoning_level, parse_reasoning_levels,
+                           log_usage_report, generated_token_count,
+                           DEFAULT_KEEP_ALIVE, DEFAULT_REASONING)
+from scheduler import classify_length
+from quality_gate import is_mostly_english
+from fast_path import (build_glossary_index, compile_glossary,
+                       resolve_locally, FastPathStats)
+from sharding import parse_shard_spec, shard_range, write_manifest
+from log_config import setup_logging, LOG_LEVELS, DEFAULT_LOG_LEVEL
+from progress import ProgressReporter, DEFAULT_PROGRESS_INTERVAL
+from dry_run import (DryRunPlan, save_throughput, load_throughput,
+                     throughput_path)
+from profiling import start_profiling
+from cassette import Cassette
 
-logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s]: %(message)s')
 logger = logging.getLogger(__name__)
 
 # MODEL_NAME = 'gpt-oss:120b'
 MODEL_NAME = 'gpt-oss:20b'
 
 
-def ollama_translate_line(text: str, glossary: dict,
-                          casual_mode: bool = False) -> str:
-    """Ollama を使用して翻訳（リトライ機能付き）"""
-
-    def translate_attempt(text: str, glossary: dict,
-                          casual_mode: bool) -> str:
-        if casual_mode:
-            style_instruction = """ゲームのセリフや会話として、口語的で自然な日本語に翻訳してください。
+def build_translation_prompt(text: str, glossary: dict,
+                             casual_mode: bool = False) -> str:
+    """翻訳プロンプトを作成"""
+    if casual_mode:
+        style_instruction = """ゲームのセリフや会話として、口語的で自然な日本語に翻訳してください。
 翻訳スタイル:
 - キャラクターの感情や性格が伝わるような表現を選択
 - 丁寧語よりも親しみやすい表現を優先"""
-        else:
-            style_instruction = "標準的な日本語に翻訳してください。"
+    else:
+        style_instruction = "標準的な日本語に翻訳してください。"
 
-        glossary_str = ', '.join([f"{en}→{ja}" for en, ja in glossary.items()])
-        translation_rules = f"""英語を日本語に翻訳してください。必ず日本語で回答してください。
+    glossary_str = ', '.join([f"{en}→{ja}" for en, ja in glossary.items()])
+    return f"""英語を日本語に翻訳してください。必ず日本語で回答してください。
 
 {style_instruction}
 
@@ -53,38 +63,40 @@ def ollama_translate_line(text: str, glossary: dict,
 
 日本語翻訳:"""
 
-        response = ollama.chat(
+
+def ollama_translate_line(text: str, glossary: dict,
+                          casual_mode: bool = False) -> str:
+    """Ollama を使用して翻訳（リトライ機能付き）"""
+
+    def translate_attempt(text: str, glossary: dict,
+                          casual_mode: bool) -> str:
+        translation_rules = build_translation_prompt(text, glossary,
+                                                     casual_mode)
+
+        response = chat(
             model=MODEL_NAME,
             messages=[
                 {
                     'role': 'user',
                     'content': translation_rules
                 }
-            ]
+            ],
+            reasoning=get_reasoning_level(classify_length(text))
         )
 
         return response['message']['content'].strip()
 
-    def is_mostly_english(text: str) -> bool:
-        """テキストが主に英語かどうかを判定"""
-        clean_text = re.sub(r'\[[^\]]*\]|<[^>]*>', '', text)
-        english_words = re.findall(r'\b[A-Za-z]+\b', clean_text)
-        japanese_chars = re.findall(r'[ひらがなカタカナ漢字]', clean_text)
-
-        return (len(english_words) > 3
-                and len(japanese_chars) < len(english_words))
-
     try:
         translated_text = translate_attempt(text, glossary, casual_mode)
 
         if is_mostly_english(translated_text):
-            logger.warning(f"英語のまま翻訳されました。リトライします: {translated_text[:50]}...")
+            logger.warning("英語のまま翻訳されました。リトライします: %s...", translated_text[:50])
             translated_text = translate_attempt(text, glossary, casual_mode)
 
         return translated_text
 
     except Exception as e:
-        logger.error(f"翻訳エラー: {type(e).__name__}: {str(e)}")
+        logger.error("翻訳エラー: %s: %s", type(e).__name__, str(e))
         raise e
 
 
@@ -101,21 +113,17 @@ def load_glossary(filename: str) -> dict:
                     glossary_dict[en] = ja
             return glossary_dict
     except FileNotFoundError:
-        logger.warning(f"用語集ファイル {filename} が見つかりません")
+        logger.warning("用語集ファイル %s が見つかりません", filename)
         return {}
 
 
 def filter_glossary_for_text(text: str, full_glossary: dict) -> dict:
     """翻訳対象テキストに含まれる単語のみを抽出"""
-    filtered_glossary = {}
+    # テキストを単語に分割
     words_in_text = set(re.findall(r'\b[A-Za-z]+\b', text.lower()))
 
-    for en_term, ja_term in full_glossary.items():
-        if (en_term.lower() in words_in_text or
-                any(word in en_term.lower() for word in words_in_text)):
-            filtered_glossary[en_term] = ja_term
-
-    return filtered_glossary
+    # 単語を含む用語（単語と一致する用語も含む）を用語集の順に抽出
+    return compile_glossary(full_glossary).filter(words_in_text)
 
 
 def get_diff_changes(old_text: str, new_text: str) -> list:
@@ -158,57 +166,119 @@ def apply_diff_to_translation(old_english: str, new_english: str,
 
 
 def process_tsv_file(input_file: str, output_file: str, glossary: dict,
-                     casual_mode: bool = False):
-    """TSVファイルを処理して差分翻訳を実行"""
+                     casual_mode: bool = False, shard: tuple = None,
+                     status_file: str = None,
+                     progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+                     plan: DryRunPlan = None):
+    """TSVファイルを処理して差分翻訳を実行
+
+    shard を (i, N) で指定した場合はデータ行のうち i 番目のシャードのみを処理する。
+    進捗は progress_interval 秒ごとに stderr と status_file に出力する。
+    plan を指定した場合（--dry-run）はLLMを呼び出さずに見積もりのみ行い、
+    ファイルを出力しない。それ以外は処理速度の計測に使った進捗を返す。
+    """
     with open(input_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
 
     # ヘッダー行をスキップ
     header = lines[0].strip()
     data_lines = lines[1:]
+    start, end = 0, len(data_lines)
+    if shard:
+        start, end = shard_range(len(data_lines), *shard)
+        logger.info("シャード %s/%s: データ行 %s〜%s (%s行)",
+                    shard[0], shard[1], start + 1, end, end - start)
 
     results = []
-
-    for line_no, line in enumerate(data_lines, 2):
-        parts = line.strip().split('\t')
+    glossary_index = build_glossary_index(glossary)
+    fast_path_stats = FastPathStats()
+    # 同じ新英語は1回だけ翻訳する（差分翻訳も新英語全体を翻訳するため）
+    # プロンプトは新英語のみで決まるため、新英語が完全に一致する行だけを共有する
+    translated_cells = {}
+    translated_count = 0
+
+    # 進捗の残り時間は新英語の文字数から推定する
+    new_english_cells = [(line.rstrip('\r\n').split('\t') + [''])[1]
+                         for line in data_lines[start:end]]
+    progress = ProgressReporter(new_english_cells, status_file,
+                                progress_interval, generated_token_count)
+    if plan is None:
+        progress.start()
+
+    for line_no, line in enumerate(data_lines[start:end], start + 2):
+        index = line_no - 2 - start
+        parts = line.rstrip('\r\n').split('\t')
         if len(parts) < 3:
-            logger.warning(f"行{line_no}: 列数が不足しています")
+            logger.warning("行%s: 列数が不足しています", line_no)
+            progress.skip(index)
             continue
 
         old_english = parts[0]
         new_english = parts[1]
         old_japanese = parts[2]
 
-        logger.info(f"処理中: {line_no}行目")
+        logger.debug("処理中: %s行目", line_no)
 
         # 英語テキストに変更がない場合はそのまま
         if old_english == new_english:
-            results.append(old_japanese)
+            results.append((old_english, new_english, old_japanese))
+            progress.skip(index)
+            if plan is not None:
+                plan.classify('英語の変更なし')
             continue
 
         # 差分を取得
         changes = get_diff_changes(old_english, new_english)
 
         if not changes:
-            results.append(old_japanese)
+            results.append((old_english, new_english, old_japanese))
+            progress.skip(index)
+            if plan is not None:
+                plan.classify('英語の変更なし')
+            continue
+
+        # 空行・タグのみ・翻訳済み・用語集と完全一致する行はLLMを使わない
+        resolved_japanese, reason = resolve_locally(new_english, glossary_index)
+        if resolved_japanese is not None:
+            fast_path_stats.record(reason)
+            results.append((old_english, new_english, resolved_japanese))
+            progress.skip(index)
             continue
 
+        translated_count += 1
+        if new_english in translated_cells:
+            logger.info("行%s: 同じ英語の翻訳結果を再利用", line_no)
+            results.append((old_english, new_english,
+                            translated_cells[new_english]))
+            progress.skip(index)
+            continue
+
+        start_time = time.perf_counter()
+
         # 変更が大きい場合は全体を再翻訳
         similarity = difflib.SequenceMatcher(None, old_english,
                                              new_english).ratio()
 
+        if plan is not None:
+            # ドライラン: 翻訳方法の分類とリクエストの見積もりのみ
+            plan.classify('全体を再翻訳' if similarity < 0.7 else '差分翻訳')
+            plan.add_line(new_english)
+            plan.add_request(build_translation_prompt(
+                new_english, filter_glossary_for_text(new_english, glossary),
+                casual_mode), new_english)
+            translated_cells[new_english] = old_japanese
+            continue
+
         # 70%未満の類似度の場合は全体を再翻訳
         if similarity < 0.7:
-            logger.info(f"行{line_no}: 変更が大きいため全体を再翻訳 "
-                        f"(類似度: {similarity:.2f})")
+            logger.info("行%s: 変更が大きいため全体を再翻訳 (類似度: %.2f)", line_no, similarity)
             filtered_glossary = filter_glossary_for_text(new_english,
                                                          glossary)
             new_japanese = ollama_translate_line(new_english,
                                                  filtered_glossary,
                                                  casual_mode)
         else:
-            logger.info(f"行{line_no}: 差分翻訳を適用 "
-                        f"(類似度: {similarity:.2f})")
+            logger.info("行%s: 差分翻訳を適用 (類似度: %.2f)", line_no, similarity)
             new_japanese = apply_diff_to_translation(old_english,
                                                      new_english,
                                                      old_japanese,
@@ -221,15 +291,34 @@ def process_tsv_file(input_file: str, output_file: str, glossary: dict,
         detect_content_filter(new_japanese, line_no)
         check_translation_tags(new_japanese, line_no)
 
-        results.append(new_japanese)
+        translated_cells[new_english] = new_japanese
+        results.append((old_english, new_english, new_japanese))
+        progress.record([index], time.perf_counter() - start_time)
         time.sleep(0.5)
 
+    fast_path_stats.log_report(end - start)
+    if translated_count > len(translated_cells):
+        logger.info("重複除去: %s行 → %s種類 (重複率: %.0f%%)",
+                    translated_count, len(translated_cells),
+                    (1 - len(translated_cells) / translated_count) * 100)
+
+    if plan is not None:
+        plan.classify('ローカル確定', sum(fast_path_stats.counts.values()))
+        plan.classify('重複（翻訳結果を共有）',
+                      translated_count - len(translated_cells))
+        return
+    progress.stop()
+
     # 結果を出力
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(header + '\n')
-        for i, result in enumerate(results):
-            parts = data_lines[i].strip().split('\t')
-            f.write(f"{parts[0]}\t{parts[1]}\t{result}\n")
+        for old_english, new_english, result in results:
+            f.write(f"{old_english}\t{new_english}\t{result}\n")
+
+    if shard:
+        write_manifest(output_file, input_file, *shard, start, end,
+                       len(data_lines), header=True, lines=len(results))
+    return progress
 
 
 def main():
@@ -237,23 +326,118 @@ def main():
     parser.add_argument('-i', '--input', required=True, help='入力TSVファイル')
     parser.add_argument('-o', '--output', help='出力TSVファイル')
     parser.add_argument('-c', '--casual', action='store_true', help='口語体モード')
+    parser.add_argument('--log-level', default=DEFAULT_LOG_LEVEL,
+                        choices=LOG_LEVELS, help='ログの出力レベル')
+    parser.add_argument('--qa-log', metavar='FILE',
+                        help='品質チェックの警告（WARNING以上）も記録するファイル')
+    parser.add_argument('--shard',
+                        help='担当するシャード i/N（例: 1/4）。結合は sharding.py')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='LLMを呼び出さずにリクエスト数・トークン数・所要時間を見積もる')
+    parser.add_argument('--profile', action='store_true',
+                        help='ステージ別の呼び出し回数・累積時間を終了時に出力')
+    parser.add_argument('--cprofile', metavar='FILE',
+                        help='cProfile の統計を出力するファイル')
+    parser.add_argument('--tracemalloc', metavar='FILE',
+                        help='終了時のメモリ確保のスナップショットを出力するファイル')
+    parser.add_argument('--progress-interval', type=float,
+                        default=DEFAULT_PROGRESS_INTERVAL,
+                        help='進捗を出力する間隔（秒、0で終了時のみ）')
+    parser.add_argument('--status-file',
+                        help='進捗をJSONで書き出すファイル（他のツールから参照用）')
+    parser.add_argument('--reasoning',
+                        help='推論レベル off/low/medium/high '
+                             '（長さクラス別指定: short=off,long=medium）')
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE,
+                        help='モデルをメモリに保持する時間（例: 30m, -1で無期限）')
+    parser.add_argument('--no-warmup', action='store_true',
+                        help='起動時のモデル事前ロードを行わない')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', metavar='CASSETTE',
+                                help='Ollamaの応答と所要時間をカセットファイルに記録（.gzで圧縮）')
+    cassette_group.add_argument('--replay', metavar='CASSETTE',
+                                help='記録した応答を再生（Ollama不要）')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='再生時の待ち時間の倍速（2で半分、0で待たない）')
 
     args = parser.parse_args()
+    setup_logging(args.log_level, args.qa_log)
+
+    # ステージ別の処理時間・cProfile・メモリ使用量の計測（終了時に出力）
+    start_profiling(
+        [filter_glossary_for_text, ollama_translate_line, fix_color_tags,
+         format_punctuation, detect_content_filter, check_translation_tags]
+        if args.profile else None, args.cprofile, args.tracemalloc)
+
+    if args.reasoning:
+        try:
+            args.reasoning = parse_reasoning_levels(args.reasoning)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.shard:
+        try:
+            args.shard = parse_shard_spec(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
 
     if args.output is None:
         tdatetime = dt.now()
         date_time_str = tdatetime.strftime('%Y%m%d_%H%M%S')
         base_name = os.path.splitext(args.input)[0]
         extension = os.path.splitext(args.input)[1]
-        args.output = f"{base_name}_diff_{date_time_str}{extension}"
+        shard_suffix = (f"_shard{args.shard[0]}of{args.shard[1]}"
+                        if args.shard else "")
+        args.output = f"{base_name}_diff_{date_time_str}{shard_suffix}{extension}"
 
     glossary = load_glossary("deepl_glossary_empyrion.json")
 
-    logger.info(f"入力ファイル: {args.input}")
-    logger.info(f"出力ファイル: {args.output}")
-
-    process_tsv_file(args.input, args.output, glossary, args.casual)
-
+    logger.info("入力ファイル: %s", args.input)
+    logger.info("出力ファイル: %s", args.output)
+
+    # 推論レベル（gpt-oss 系のみ既定値を適用）
+    if args.reasoning:
+        runtime_settings['reasoning'] = args.reasoning
+    elif MODEL_NAME.startswith('gpt-oss'):
+        runtime_settings['reasoning'] = dict(DEFAULT_REASONING)
+    logger.info("推論レベル: %s", runtime_settings['reasoning'] or '指定なし')
+
+    if args.dry_run:
+        plan = DryRunPlan()
+        process_tsv_file(args.input, args.output, glossary, args.casual,
+                         args.shard, plan=plan)
+        plan.log_report(MODEL_NAME, load_throughput(
+            MODEL_NAME, throughput_path(args.output)))
+        return
+
+    # 応答の記録・再生（再生時はOllamaに接続しない）
+    cassette = None
+    if args.record or args.replay:
+        cassette = Cassette(
+            args.record or args.replay, 'record' if args.record else 'replay',
+            args.replay_speed)
+    runtime_settings['cassette'] = cassette
+    try:
+        # モデルの事前ロード（初回行でのロード待ちを回避）
+        if args.no_warmup or args.replay:
+            runtime_settings['keep_alive'] = args.keep_alive
+        else:
+            warm_up_model(MODEL_NAME, args.keep_alive)
+
+        progress = process_tsv_file(args.input, args.output, glossary,
+                                    args.casual, args.shard, args.status_file,
+                                    args.progress_interval)
+        # 次回の --dry-run の所要時間の見積もりに使う（再生時の時間は記録しない）
+        if not args.replay:
+            save_throughput(MODEL_NAME, progress.throughput(),
+                            {'concurrency': 1}, throughput_path(args.output))
+
+        log_usage_report()
+    finally:
+        # 途中で失敗しても記録済みの応答を残す（.gz は閉じないと読めない）
+        if cassette is not None:
+            cassette.close()
+            runtime_settings['cassette'] = None
     logger.info("差分翻訳完了")
 
 
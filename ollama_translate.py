@@ -1,20 +1,51 @@
-import ollama
+import functools
 import json
 import re
 import argparse
 from datetime import datetime as dt
 import time
+import asyncio
 import logging
 import os
-import subprocess
-from tag_validator import check_translation_tags
-from content_filter_detector import detect_content_filter
 from color_tag_fixer import fix_color_tags
 from text_preview import generate_html_preview
 from punctuation_formatter import format_punctuation
+from tag_validator import validate_tags
+from content_filter_detector import detect_content_filter
+from ollama_client import (async_chat, async_warm_up_model, runtime_settings,
+                           request_counter, set_model_concurrency,
+                           get_reasoning_level, parse_reasoning_levels,
+                           log_usage_report, generated_token_count,
+                           DEFAULT_KEEP_ALIVE, DEFAULT_REASONING)
+from incremental import load_previous_translations, line_hash
+from segmenter import (split_segments, join_segments, build_context,
+                       should_split)
+from quality_gate import (is_mostly_english, check_newline_count,
+                          check_final_translation, check_segment_translation,
+                          format_feedback, RepairItem,
+                          DEFAULT_MAX_REPAIR_ATTEMPTS)
+from fast_path import (build_glossary_index, compile_glossary,
+                       resolve_locally, FastPathStats)
+from tag_masking import (mask_tags, mask_examples, PLACEHOLDER_PATTERN,
+                         PLACEHOLDER_RULE)
+from scheduler import (iter_schedule, classify_length, class_priority,
+                       get_class_options, OrderedWriter, ScheduleStats,
+                       DEFAULT_BATCH_SIZE)
+from glossary_tracking import TermRecord, GlossaryInvalidator
+from cassette import Cassette
+from sharding import parse_shard_spec, shard_range, write_manifest
+from async_pipeline import (run_pipeline, DEFAULT_CONCURRENCY,
+                            DEFAULT_QUEUE_SIZE)
+from log_config import setup_logging, LOG_LEVELS, DEFAULT_LOG_LEVEL
+from progress import ProgressReporter, DEFAULT_PROGRESS_INTERVAL
+from dry_run import (DryRunPlan, save_throughput, load_throughput,
+                     throughput_path)
+from profiling import start_profiling
+from translation_memory import (TranslationMemory, read_line_pairs,
+                                DEFAULT_EXAMPLE_COUNT)
+from tm_store import TmStore, TmEntry, glossary_version, style_flag
 
 
-logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s]: %(message)s')
 logger = logging.getLogger(__name__)
 
 # モデル名を一箇所で管理
@@ -24,116 +55,488 @@ logger = logging.getLogger(__name__)
 # MODEL_NAME = 'gpt-oss:120b'
 MODEL_NAME = 'gpt-oss:20b'
 
+# カスケードモードで品質チェック失敗行を再翻訳する大きいモデル
+ESCALATION_MODEL_NAME = 'gpt-oss:120b'
 
-# def get_optimal_tokens(text: str) -> dict:
-#     """入力テキストに基づいて最適なトークン数を計算"""
-#     text_length = len(text)
+# 翻訳メモリに記録する、LLM以外で確定した行の作成元
+ORIGIN_LOCAL = 'local'  # ローカル確定
+ORIGIN_PREVIOUS = 'previous'  # 前回リリースの翻訳を再利用
 
-#     if text_length < 100:
-#         return {'num_predict': -1, 'num_ctx': 2048}      # 短文
-#     elif text_length < 500:
-#         return {'num_predict': -1, 'num_ctx': 4096}     # 中文
-#     elif text_length < 1000:
-#         return {'num_predict': -1, 'num_ctx': 4096}    # 長文
-#     else:
-#         return {'num_predict': -1, 'num_ctx': 8192}   # 超長文
+# 長文を分割翻訳する際の、セグメントごとの再翻訳回数
+SEGMENT_MAX_RETRIES = 1
 
+# 翻訳ルール（1行翻訳・まとめ翻訳で共通）
+TRANSLATION_RULES = """ルール:
+1. 装飾タグ([u][/u], [i][/i], <i></i>, [b][/b], <b></b>, [sup][/sup])は元テキストにある場合のみ保持
+2. カラータグ: [c][色コード]...テキスト...[-][/c] あるいは <color=#色コード> ... テキスト ... </color> の形式です
+3. サイズタグ: <size=数字>...テキスト...</size> の形式です
+4. "\\n"は改行コードですが変更しないでください
+5. "@p9"等は読み上げ記号として前後に空白をいれてください"""
 
-def ollama_translate_line(text: str, glossary: dict, casual_mode: bool = False) -> str:
-    """Ollama を使用して翻訳（リトライ機能付き）"""
 
-    def translate_attempt(text: str, glossary: dict, casual_mode: bool) -> str:
-        # IDA検出による丁寧語モード
-        is_ida_mode = '[IDA]' in text
-        
-        # 翻訳スタイルを選択
-        if is_ida_mode:
-            style_instruction = """IDA（情報データアシスタント）として、丁寧語で翻訳してください。
+def build_style_instruction(text: str, casual_mode: bool) -> str:
+    """翻訳スタイルの指示文を作成"""
+    # IDA検出による丁寧語モード
+    if '[IDA]' in text:
+        return """IDA（情報データアシスタント）として、丁寧語で翻訳してください。
 翻訳スタイル:
 - 敬語や丁寧語を使用した礼儀正しい表現
 - 「です・ます」調で統一
 - 専門的で正確な情報提供を意識した表現"""
-        elif casual_mode:
-            style_instruction = """ゲームのセリフや会話として、口語的で自然な日本語に翻訳してください。
+    elif casual_mode:
+        return """ゲームのセリフや会話として、口語的で自然な日本語に翻訳してください。
 翻訳スタイル:
 - キャラクターの感情や性格が伝わるような表現を選択
 - 丁寧語よりも親しみやすい表現を優先"""
-        else:
-            style_instruction = "標準的な日本語に翻訳してください。"
+    else:
+        return "標準的な日本語に翻訳してください。"
 
-        # 翻訳ルールを含むプロンプト
-        translation_rules = f"""英語を日本語に翻訳してください。必ず日本語で回答してください。
+
+def format_glossary(glossary: dict) -> str:
+    """プロンプト用の用語集文字列"""
+    return ', '.join([f"{en}→{ja}" for en, ja in glossary.items()])
+
+
+def format_examples(examples: list[tuple[str, str]]) -> str:
+    """プロンプト用の翻訳例（翻訳メモリから検索した類似文）"""
+    return '\n'.join(f"英語: {source}\n日本語: {target}"
+                     for source, target in examples)
+
+
+def build_examples_section(examples: list[tuple[str, str]]) -> str:
+    """過去の類似文の翻訳（文体・用語を揃えるための例）"""
+    if not examples:
+        return ""
+    return (f"\n翻訳例（過去の類似文の翻訳。文体と用語を揃えてください）:\n"
+            f"{format_examples(examples)}\n")
+
+
+def build_line_prompt(text: str, glossary: dict, casual_mode: bool,
+                      feedback: str = None, context: str = None,
+                      examples: list[tuple[str, str]] = None) -> str:
+    """1行翻訳のプロンプト"""
+    style_instruction = build_style_instruction(text, casual_mode)
+    # 品質チェックで指摘された問題点
+    feedback_section = f"\n{feedback}\n" if feedback else ""
+    examples_section = build_examples_section(examples)
+    # 分割翻訳時の前後の文
+    context_section = (f"\n参考（前後の文。翻訳結果には含めないでください）:\n"
+                       f"{context}\n" if context else "")
+    # タグがプレースホルダーに置換されている場合の追加ルール
+    placeholder_rule = (f"\n7. {PLACEHOLDER_RULE}"
+                        if PLACEHOLDER_PATTERN.search(text) else "")
+
+    return f"""英語を日本語に翻訳してください。必ず日本語で回答してください。
 
 {style_instruction}
 
-ルール:
-1. 装飾タグ([u][/u], [i][/i], <i></i>, [b][/b], <b></b>, [sup][/sup])は元テキストにある場合のみ保持
-2. カラータグ: [c][色コード]...テキスト...[-][/c] あるいは <color=#色コード> ... テキスト ... </color> の形式です
-3. サイズタグ: <size=数字>...テキスト...</size> の形式です
-4. "\\n"は改行コードですが変更しないでください
-5. "@p9"等は読み上げ記号として前後に空白をいれてください
-6. 結果は１行で出力してください
+{TRANSLATION_RULES}
+6. 結果は１行で出力してください{placeholder_rule}
 
 用語集:
-{', '.join([f"{en}→{ja}" for en, ja in glossary.items()])}
-
+{format_glossary(glossary)}
+{examples_section}{context_section}
 テキスト: {text}
+{feedback_section}
+日本語翻訳:"""
+
+
+def build_batch_prompt(texts: list[str], glossary: dict, casual_mode: bool,
+                       examples: list[tuple[str, str]] = None) -> str:
+    """まとめ翻訳のプロンプト"""
+    style_instruction = build_style_instruction(' '.join(texts), casual_mode)
+    numbered_texts = '\n'.join(
+        f"{i}: {text}" for i, text in enumerate(texts, 1))
+    placeholder_rule = (f"\n7. {PLACEHOLDER_RULE}"
+                        if PLACEHOLDER_PATTERN.search(numbered_texts) else "")
+
+    return f"""英語の各行を日本語に翻訳してください。必ず日本語で回答してください。
+
+{style_instruction}
+
+{TRANSLATION_RULES}
+6. 各行は「番号: 翻訳」の形式で1行ずつ出力し、番号と行数は入力と同じにしてください{placeholder_rule}
+
+用語集:
+{format_glossary(glossary)}
+{build_examples_section(examples)}
+テキスト:
+{numbered_texts}
 
 日本語翻訳:"""
 
-        response = ollama.chat(
-            model=MODEL_NAME,
+
+async def ollama_translate_line(text: str, glossary: dict,
+                                casual_mode: bool = False, options: dict = None,
+                                feedback: str = None, model: str = None,
+                                context: str = None,
+                                examples: list[tuple[str, str]] = None) -> str:
+    """Ollama を使用して翻訳（リトライ機能付き）
+
+    feedback には前回の翻訳の問題点（品質チェック結果）を渡す。
+    model を省略した場合は MODEL_NAME を使用する。
+    context には長文を分割した際の前後の文を渡す（参考のみで翻訳はしない）。
+    examples には翻訳メモリから検索した類似文の (英語, 日本語) を渡す。
+    """
+    model = model or MODEL_NAME
+
+    async def translate_attempt(text: str, glossary: dict,
+                                casual_mode: bool) -> str:
+        # 翻訳ルールを含むプロンプト
+        translation_rules = build_line_prompt(text, glossary, casual_mode,
+                                              feedback, context, examples)
+
+        response = await async_chat(
+            model=model,
             messages=[
                 {
                     'role': 'user',
                     'content': translation_rules
                 }
-            ]
-            # options={
-            #     'num_predict': token_config['num_predict'],
-            #     'num_ctx': token_config['num_ctx'],
-            #     'temperature': 0.1,
-            #     'top_p': 0.9,
-            #     'repeat_penalty': 1.1
-            # }
+            ],
+            options=options,
+            reasoning=get_reasoning_level(classify_length(text))
         )
 
         return response['message']['content'].strip()
 
-    def is_mostly_english(text: str) -> bool:
-        """テキストが主に英語かどうかを判定"""
-        import re
-        # タグを除去してテキスト部分のみを抽出
-        clean_text = re.sub(r'\[[^\]]*\]|<[^>]*>', '', text)
-        # 英語の単語を検出
-        english_words = re.findall(r'\b[A-Za-z]+\b', clean_text)
-        # 日本語文字を検出
-        japanese_chars = re.findall(r'[ひらがなカタカナ漢字]', clean_text)
-
-        # 英語の単語が多く、日本語文字が少ない場合は英語と判定
-        return (len(english_words) > 3 and
-                len(japanese_chars) < len(english_words))
-
     try:
-        logger.debug(f"使用モデル: {MODEL_NAME}")
+        logger.debug("使用モデル: %s", model)
 
         # 初回翻訳
-        translated_text = translate_attempt(text, glossary, casual_mode)
+        translated_text = await translate_attempt(text, glossary, casual_mode)
 
         # 英語のままの場合はリトライ
         if is_mostly_english(translated_text):
-            logger.warning(f"英語のまま翻訳されました。リトライします: {translated_text[:50]}...")
-            translated_text = translate_attempt(text, glossary, casual_mode)
+            logger.warning("英語のまま翻訳されました。リトライします: %s...", translated_text[:50])
+            translated_text = await translate_attempt(text, glossary,
+                                                      casual_mode)
 
         return translated_text
 
     except Exception as e:
         logger.error("翻訳エラー詳細:")
-        logger.error(f"  エラータイプ: {type(e).__name__}")
-        logger.error(f"  エラーメッセージ: {str(e)}")
+        logger.error("  エラータイプ: %s", type(e).__name__)
+        logger.error("  エラーメッセージ: %s", str(e))
         raise e
 
 
+def parse_batch_response(content: str, count: int):
+    """まとめ翻訳の「番号: 翻訳」形式の応答を分解（不整合ならNone）"""
+    numbered = {}
+    for row in content.splitlines():
+        match = re.match(r'^\s*(\d+)\s*[:：]\s?(.*)$', row)
+        if match:
+            numbered[int(match.group(1))] = match.group(2).strip()
+
+    if sorted(numbered) != list(range(1, count + 1)):
+        return None
+    return [numbered[i] for i in range(1, count + 1)]
+
+
+async def ollama_translate_batch(texts: list[str], glossary: dict,
+                                 casual_mode: bool = False,
+                                 options: dict = None,
+                                 examples: list[tuple[str, str]] = None):
+    """複数の短い行を1リクエストでまとめて翻訳（解析失敗時はNone）"""
+    translation_rules = build_batch_prompt(texts, glossary, casual_mode,
+                                           examples)
+
+    logger.debug("使用モデル: %s (まとめ翻訳: %s行)", MODEL_NAME, len(texts))
+    response = await async_chat(
+        model=MODEL_NAME,
+        messages=[
+            {
+                'role': 'user',
+                'content': translation_rules
+            }
+        ],
+        options=options,
+        reasoning=get_reasoning_level('short')
+    )
+
+    return parse_batch_response(response['message']['content'], len(texts))
+
+
+def can_batch_line(text: str) -> bool:
+    """まとめ翻訳できる行か（IDAは文体が異なるため単独で翻訳）"""
+    return '[IDA]' not in text
+
+
+async def translate_with_mask(text: str, glossary: dict,
+                              casual_mode: bool = False, options: dict = None,
+                              feedback: str = None, mask: bool = True,
+                              model: str = None, context: str = None,
+                              examples: list[tuple[str, str]] = None) -> str:
+    """タグをプレースホルダーに置換して翻訳し、元のタグに戻す
+
+    翻訳例もプレースホルダー表記に揃えて添える。
+    """
+    tag_mask = mask_tags(text) if mask else None
+    if tag_mask is None or not tag_mask.tags:
+        return await ollama_translate_line(text, glossary, casual_mode,
+                                           options, feedback, model, context,
+                                           examples)
+
+    translated_text = await ollama_translate_line(
+        tag_mask.text, glossary, casual_mode, options, feedback, model,
+        context, examples and mask_examples(examples))
+    restored_text = tag_mask.restore(translated_text)
+    if restored_text is not None:
+        return restored_text
+
+    logger.warning("プレースホルダーが保持されなかったため、タグ付きのまま翻訳し直します")
+    return await ollama_translate_line(text, glossary, casual_mode, options,
+                                       feedback, model, context, examples)
+
+
+async def translate_segmented(text: str, glossary: dict, casual_mode: bool,
+                              mask: bool = True) -> str:
+    """長い行を段落・文単位に分割し、前後の文を参考に並行して翻訳
+
+    品質チェックに失敗したセグメントのみを指摘付きで再翻訳する。
+    同時に送るリクエスト数は set_model_concurrency() の上限に従う。
+    """
+    segments = split_segments(text)
+    logger.info("長文を%sセグメントに分割して翻訳 (%s文字)", len(segments), len(text))
+
+    async def translate_segment(index: int) -> str:
+        segment = segments[index][0]
+        if not segment.strip():
+            return segment
+
+        filtered_glossary = filter_glossary_for_text(segment, glossary)
+        options = get_class_options(classify_length(segment))
+        context = build_context(segments, index)
+        feedback = None
+        for attempt in range(SEGMENT_MAX_RETRIES + 1):
+            translated_text = await translate_with_mask(
+                segment, filtered_glossary, casual_mode, options, feedback,
+                mask, context=context)
+            failures = check_segment_translation(segment, translated_text)
+            if not failures:
+                break
+            logger.warning("セグメント%s/%s: 品質チェック失敗 (%s)",
+                           index + 1, len(segments), '; '.join(failures))
+            feedback = format_feedback(translated_text, failures)
+        return translated_text
+
+    translations = await asyncio.gather(
+        *(translate_segment(i) for i in range(len(segments))))
+    return join_segments(translations, segments)
+
+
+def find_examples(text: str, memory: TranslationMemory = None,
+                  example_count: int = DEFAULT_EXAMPLE_COUNT) -> list:
+    """翻訳メモリから類似文の翻訳例を検索（翻訳メモリがなければ空）"""
+    if memory is None:
+        return []
+    return memory.search(text, example_count)
+
+
+def find_batch_examples(texts: list[str], memory: TranslationMemory = None,
+                        example_count: int = DEFAULT_EXAMPLE_COUNT) -> list:
+    """まとめ翻訳の各行に類似した翻訳例を合わせて最大 example_count 件検索"""
+    if memory is None:
+        return []
+    return memory.search_many(texts, example_count)
+
+
+def mask_unit_examples(examples: list, tag_masks: list) -> list:
+    """まとめ翻訳でタグをマスクした行があれば、翻訳例もプレースホルダー表記に揃える"""
+    if examples and any(tag_mask is not None and tag_mask.tags
+                        for tag_mask in tag_masks):
+        return mask_examples(examples)
+    return examples
+
+
+async def translate_unit(unit, glossary: dict, casual_mode: bool,
+                         mask: bool = True, split_long: bool = False,
+                         memory: TranslationMemory = None,
+                         example_count: int = DEFAULT_EXAMPLE_COUNT) -> list[str]:
+    """スケジュールされた1単位（1行またはまとめ）を翻訳
+
+    split_long を指定すると、長い行は段落・文単位に分割して並行に翻訳する。
+    memory を指定すると、プロンプトに類似文の翻訳例を添える。
+    """
+    options = get_class_options(unit.class_name)
+    texts = [text for _, text in unit.jobs]
+
+    if unit.is_batch:
+        filtered_glossary = filter_glossary_for_text(' '.join(texts), glossary)
+        logger.debug("用語数: %s → %s", len(glossary), len(filtered_glossary))
+
+        tag_masks = [mask_tags(text) if mask else None for text in texts]
+        masked_texts = [tag_mask.text if tag_mask else text
+                        for tag_mask, text in zip(tag_masks, texts)]
+
+        examples = mask_unit_examples(
+            find_batch_examples(texts, memory, example_count), tag_masks)
+        translations = await ollama_translate_batch(
+            masked_texts, filtered_glossary, casual_mode, options, examples)
+        if translations is not None:
+            for i, translated_text in enumerate(translations):
+                if tag_masks[i] is not None:
+                    translated_text = tag_masks[i].restore(translated_text)
+                # タグが崩れた行・英語のまま残った行だけ単独で翻訳し直す
+                if translated_text is None or (
+                        texts[i].strip() and is_mostly_english(translated_text)):
+                    logger.warning("行%s: まとめ翻訳の結果が不完全なため単独で翻訳します",
+                                   unit.jobs[i][0])
+                    translated_text = await translate_with_mask(
+                        texts[i], filter_glossary_for_text(texts[i], glossary),
+                        casual_mode, mask=mask,
+                        examples=find_examples(texts[i], memory, example_count))
+                translations[i] = translated_text
+            return translations
+
+        logger.warning("まとめ翻訳の応答を解析できないため1行ずつ翻訳します")
+
+    translations = []
+    for text in texts:
+        # IDAは文体の判定に行全体が必要なため分割しない
+        if (split_long and should_split(text) and can_batch_line(text) and
+                len(split_segments(text)) > 1):
+            translations.append(await translate_segmented(
+                text, glossary, casual_mode, mask))
+            continue
+
+        # 翻訳対象テキストに関連する用語のみを抽出
+        filtered_glossary = filter_glossary_for_text(text, glossary)
+        logger.debug("用語数: %s → %s", len(glossary), len(filtered_glossary))
+        translations.append(await translate_with_mask(
+            text, filtered_glossary, casual_mode, options, mask=mask,
+            examples=find_examples(text, memory, example_count)))
+    return translations
+
+
+def plan_unit(unit, glossary: dict, casual_mode: bool, mask: bool = True,
+              split_long: bool = False, memory: TranslationMemory = None,
+              example_count: int = DEFAULT_EXAMPLE_COUNT) -> list[tuple[str, str]]:
+    """translate_unit が最初に送るリクエストの (プロンプト, 原文) のリスト（--dry-run 用）"""
+    texts = [text for _, text in unit.jobs]
+
+    def masked(text: str) -> str:
+        tag_mask = mask_tags(text) if mask else None
+        return tag_mask.text if tag_mask else text
+
+    if unit.is_batch:
+        filtered_glossary = filter_glossary_for_text(' '.join(texts), glossary)
+        examples = mask_unit_examples(
+            find_batch_examples(texts, memory, example_count),
+            [mask_tags(text) if mask else None for text in texts])
+        return [(build_batch_prompt([masked(text) for text in texts],
+                                    filtered_glossary, casual_mode, examples),
+                 ''.join(texts))]
+
+    requests = []
+    for text in texts:
+        segments = [(text, '')]
+        if split_long and should_split(text) and can_batch_line(text):
+            segments = split_segments(text)
+        for index, (segment, _) in enumerate(segments):
+            if not segment.strip():
+                continue
+            context = None
+            examples = None
+            if len(segments) > 1:
+                context = build_context(segments, index)
+            else:
+                examples = mask_unit_examples(
+                    find_examples(segment, memory, example_count),
+                    [mask_tags(segment) if mask else None])
+            requests.append((build_line_prompt(
+                masked(segment), filter_glossary_for_text(segment, glossary),
+                casual_mode, context=context, examples=examples), segment))
+    return requests
+
+
+def finalize_translation(line: str, translated_line: str, line_no: int,
+                         postprocessor_words: list[str]) -> tuple[str, list]:
+    """翻訳結果の後処理と品質チェック（整形後の翻訳, 問題点のリスト）を返す"""
+    # 一時コード数をカウント（postprocessor適用前）
+    failures = check_newline_count(line, translated_line, line_no)
+
+    translated_line = processor_words(translated_line, postprocessor_words)
+
+    # カラータグ補完
+    translated_line = fix_color_tags(translated_line.strip(), line_no)
+
+    # 句読点整形
+    translated_line = format_punctuation(translated_line, line_no)
+
+    # コンテンツフィルタ検出・タグ検証
+    failures.extend(check_final_translation(translated_line.strip(), line_no))
+
+    return translated_line.strip(), failures
+
+
+async def repair_line(item: RepairItem, glossary: dict, casual_mode: bool,
+                      postprocessor_words: list[str], mask: bool = True,
+                      model: str = None) -> tuple[str, list]:
+    """品質チェックに失敗した1行を、指摘内容を添えて再翻訳"""
+    item.attempts += 1
+    filtered_glossary = filter_glossary_for_text(item.line, glossary)
+    translated_line = await translate_with_mask(
+        item.line, filtered_glossary, casual_mode,
+        get_class_options(classify_length(item.line)),
+        feedback=format_feedback(item.translated, item.failures),
+        mask=mask, model=model)
+
+    return finalize_translation(
+        item.line, translated_line, item.line_no, postprocessor_words)
+
+
+async def repair_until_passed(item: RepairItem, glossary: dict,
+                              casual_mode: bool, postprocessor_words: list[str],
+                              writer, max_attempts: int, mask: bool = True,
+                              model: str = None) -> bool:
+    """品質チェックに失敗した1行を、通過するまで最大 max_attempts 回再翻訳して書き出す
+
+    上限まで失敗した場合は最後の翻訳をそのまま書き出して False を返す。
+    """
+    while item.attempts < max_attempts:
+        final_line, failures = await repair_line(
+            item, glossary, casual_mode, postprocessor_words, mask, model)
+        item.translated = final_line
+        if not failures:
+            logger.info("行%s: 修正リトライ%s回目で品質チェックを通過 (モデル: %s)",
+                        item.line_no, item.attempts, model or MODEL_NAME)
+            writer.put(item.line_no - 1, final_line)
+            return True
+        item.failures = failures
+
+    logger.warning("行%s: %s回の修正リトライ後も品質チェックに失敗: %s",
+                   item.line_no, item.attempts, '; '.join(item.failures))
+    writer.put(item.line_no - 1, item.translated)
+    return False
+
+
+async def repair_failed_lines(repair_queue: list, glossary: dict,
+                              casual_mode: bool, postprocessor_words: list[str],
+                              writer, max_attempts: int, mask: bool = True,
+                              model: str = None, concurrency: int = 1):
+    """品質チェックに失敗した行を、指摘内容を添えて再翻訳
+
+    model を指定した場合（カスケードモード）はそのモデルで再翻訳する。
+    上限まで失敗した行（RepairItem）のリストを返す。
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def repair_with_limit(item: RepairItem):
+        async with semaphore:
+            return await repair_until_passed(
+                item, glossary, casual_mode, postprocessor_words, writer,
+                max_attempts, mask, model)
+
+    if repair_queue:
+        logger.info("修正リトライ: %s行 (モデル: %s)",
+                    len(repair_queue), model or MODEL_NAME)
+    passed = await asyncio.gather(
+        *(repair_with_limit(item) for item in repair_queue))
+    return [item for item, ok in zip(repair_queue, passed) if not ok]
+
+
 def load_glossary(filename: str) -> dict:
     """用語集を読み込む"""
     try:
@@ -147,25 +550,17 @@ def load_glossary(filename: str) -> dict:
                     glossary_dict[en] = ja
             return glossary_dict
     except FileNotFoundError:
-        logger.warning(f"用語集ファイル {filename} が見つかりません")
+        logger.warning("用語集ファイル %s が見つかりません", filename)
         return {}
 
 
 def filter_glossary_for_text(text: str, full_glossary: dict) -> dict:
     """翻訳対象テキストに含まれる単語のみを抽出"""
-    import re
-    filtered_glossary = {}
-
     # テキストを単語に分割
     words_in_text = set(re.findall(r'\b[A-Za-z]+\b', text.lower()))
 
-    for en_term, ja_term in full_glossary.items():
-        # 用語が翻訳対象テキストに含まれているかチェック
-        if (en_term.lower() in words_in_text or
-                any(word in en_term.lower() for word in words_in_text)):
-            filtered_glossary[en_term] = ja_term
-
-    return filtered_glossary
+    # 単語を含む用語（単語と一致する用語も含む）を用語集の順に抽出
+    return compile_glossary(full_glossary).filter(words_in_text)
 
 
 def read_processor_words(filename: str) -> list[str]:
@@ -174,83 +569,32 @@ def read_processor_words(filename: str) -> list[str]:
         with open(filename, 'r', encoding='utf_8') as f:
             return [s.rstrip() for s in f.readlines()]
     except FileNotFoundError:
-        logger.warning(f"プロセッサファイル {filename} が見つかりません")
+        logger.warning("プロセッサファイル %s が見つかりません", filename)
         return []
 
 
-def processor_words(src_str: str, processor_words: list[str]) -> str:
-    """プリ/ポストプロセッサ"""
-    dest_str = src_str
+@functools.lru_cache(maxsize=8)
+def compile_processor_rules(processor_words: tuple) -> list:
+    """「正規表現<TAB>置換文字列」の行をコンパイル済みの (パターン, 置換文字列) にする"""
+    rules = []
     for processor_word in processor_words:
         parts = processor_word.split('\t')
         if len(parts) >= 2:
-            dest_str = re.sub(parts[0], parts[1], dest_str)
-    return dest_str
-
-
-def get_model_size_gb(model_name):
-    """モデルのサイズをGB単位で取得"""
-    try:
-        models = ollama.list()
-        logger.debug(f"モデル情報: {models}")
-
-        for model in models['models']:
-            logger.debug(f"モデル詳細: {model}")
-            # 様々なキーを試す
-            name = model.get('name') or model.get('model') or model.get('id', '')
-            if name == model_name:
-                size_bytes = model.get('size', 0)
-                size_gb = size_bytes / (1024**3)
-                logger.info(f"モデルサイズ: {size_gb:.1f}GB")
-                return size_gb
-        logger.error(f"モデル {model_name} が見つかりません")
-        return None
-    except Exception as e:
-        logger.error(f"モデルサイズ取得エラー: {e}")
-        logger.error(f"モデル情報の構造: {models if 'models' in locals() else 'N/A'}")
-        exit(1)
-
-
-def get_available_vram_gb():
-    """利用可能なVRAMをGB単位で取得"""
-    try:
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=memory.free',
-             '--format=csv,noheader,nounits'],
-            capture_output=True, text=True)
-        if result.returncode == 0:
-            vram_mb = int(result.stdout.strip().split('\n')[0])
-            vram_gb = vram_mb / 1024
-            logger.info(f"利用可能VRAM: {vram_gb:.1f}GB")
-            return vram_gb
-        else:
-            logger.warning("nvidia-smiコマンドが失敗しました")
-            return 0
-    except Exception as e:
-        logger.error(f"VRAM取得エラー: {e}")
-        exit(1)
-
-
-# def setup_cpu_only_if_needed(model_name):
-#     """VRAM不足時にCPU実行を設定"""
-#     model_size = get_model_size_gb(model_name)
-#     available_vram = get_available_vram_gb()
+            rules.append((re.compile(parts[0]), parts[1]))
+    return rules
 
-#     if model_size and available_vram > 0:
-#         required_vram = model_size * 0.8  # 80%のマージン
-#         logger.info(f"必要VRAM(推定): {required_vram:.1f}GB")
 
-#         if available_vram < required_vram:
-#             logger.warning("VRAM不足のためCPU実行に切り替えます")
-#             os.environ['CUDA_VISIBLE_DEVICES'] = ''
-#             os.environ['OLLAMA_NUM_GPU'] = '0'
-#             os.environ['NUM_GPU'] = '0'
-#         else:
-#             logger.info("GPU使用可能です")
+def processor_words(src_str: str, processor_words: list[str]) -> str:
+    """プリ/ポストプロセッサ"""
+    dest_str = src_str
+    for pattern, replacement in compile_processor_rules(tuple(processor_words)):
+        dest_str = pattern.sub(replacement, dest_str)
+    return dest_str
 
 
 def check_ollama_connection():
     """Ollama接続確認"""
+    import ollama
     try:
         models = ollama.list()
         # モデル構造を確認してから処理
@@ -262,85 +606,418 @@ def check_ollama_connection():
                 available_models.append(model_name)
 
             if any(MODEL_NAME in model for model in available_models):
-                logger.info(f"{MODEL_NAME}モデルが利用可能です")
-                # # VRAM不足チェック
-                # setup_cpu_only_if_needed(MODEL_NAME)
+                logger.info("%sモデルが利用可能です", MODEL_NAME)
             else:
-                logger.warning(f"{MODEL_NAME}モデルが見つかりません")
-                logger.info(f"利用可能なモデル: {available_models}")
+                logger.warning("%sモデルが見つかりません", MODEL_NAME)
+                logger.info("利用可能なモデル: %s", available_models)
         else:
             logger.warning("モデル一覧の取得に失敗しました")
 
     except Exception as e:
-        logger.error(f"Ollama接続エラー: {e}")
+        logger.error("Ollama接続エラー: %s", e)
         logger.error("ollama serveが起動していることを確認してください")
 
 
+def save_to_translation_memory(tm_store: TmStore, source_lines: list[str],
+                               output_file: str, tm_translations: dict,
+                               failed_sources: set, origins: list, version: str,
+                               style: str):
+    """出力した訳を翻訳メモリに登録
+
+    origins は行ごとの作成元（翻訳したモデル名、ORIGIN_LOCAL、ORIGIN_PREVIOUS）。
+    翻訳メモリから再利用した行（元の作成元を残す）と、
+    品質チェックに失敗したまま出力した行は登録しない。
+    """
+    with open(output_file, 'r', encoding='utf-8') as f:
+        translated_lines = [line.rstrip('\r\n') for line in f]
+
+    entries = []
+    for source_line, translated_line, origin in zip(source_lines,
+                                                    translated_lines, origins):
+        source_line = source_line.rstrip('\r\n')
+        if (not source_line.strip() or origin is None or
+                source_line in failed_sources or
+                tm_translations.get(line_hash(source_line)) == translated_line):
+            continue
+        entries.append(TmEntry(source_line, translated_line, origin, version,
+                               style))
+    changed = tm_store.add(entries)
+    logger.info("翻訳メモリに登録しました: %s (追加・更新 %s件, 計%s件)",
+                tm_store.filename, changed, len(tm_store))
+
+
 def main(args):
     """メイン処理"""
-
-    # Ollama接続確認
-    check_ollama_connection()
+    setup_logging(args.log_level, args.qa_log)
+
+    # ステージ別の処理時間・cProfile・メモリ使用量の計測（終了時に出力）
+    start_profiling(
+        [processor_words, filter_glossary_for_text, ollama_translate_line,
+         fix_color_tags, format_punctuation, detect_content_filter,
+         validate_tags, generate_html_preview, find_examples]
+        if args.profile else None,
+        args.cprofile, args.tracemalloc)
+
+    # 応答の記録・再生（再生時はOllamaに接続しない）
+    cassette = None
+    if (args.record or args.replay) and not args.dry_run:
+        cassette = Cassette(
+            args.record or args.replay, 'record' if args.record else 'replay',
+            args.replay_speed)
+    runtime_settings['cassette'] = cassette
+    try:
+        translate_file(args)
+    finally:
+        # 途中で失敗しても記録済みの応答を残す（.gz は閉じないと読めない）
+        if cassette is not None:
+            cassette.close()
+            runtime_settings['cassette'] = None
+
+
+def translate_file(args):
+    """入力ファイルを翻訳し、出力ファイル・翻訳メモリ・プレビューを書き出す"""
+    # カスケードモード: 小さいモデルで下訳し、失敗行のみ大きいモデルへ
+    if args.cascade:
+        args.max_repair_attempts = max(args.max_repair_attempts, 1)
+        set_model_concurrency(MODEL_NAME, args.draft_concurrency)
+        set_model_concurrency(args.escalation_model,
+                              args.escalation_concurrency)
+        logger.info("カスケードモード: %s → %s (同時実行数 %s/%s)",
+                    MODEL_NAME, args.escalation_model, args.draft_concurrency,
+                    args.escalation_concurrency)
+    else:
+        # 長文の分割翻訳のセグメントも含め、同時リクエスト数を --concurrency までに抑える
+        set_model_concurrency(MODEL_NAME, args.concurrency)
+
+    # 推論レベル（gpt-oss 系のみ既定値を適用）
+    if args.reasoning:
+        runtime_settings['reasoning'] = args.reasoning
+    elif MODEL_NAME.startswith('gpt-oss'):
+        runtime_settings['reasoning'] = dict(DEFAULT_REASONING)
+    logger.info("推論レベル: %s", runtime_settings['reasoning'] or '指定なし')
+
+    # モデルの事前ロードは最初のリクエストの直前に行う（ensure_model_ready）
+    runtime_settings['keep_alive'] = args.keep_alive
 
     glossary = load_glossary("deepl_glossary_empyrion.json")
     preprocessor_words = read_processor_words("preprocessor_words.tsv")
     postprocessor_words = read_processor_words("postprocessor_words.tsv")
+    glossary_index = build_glossary_index(glossary)
 
     # 入力ファイルを読み込み、最後の行の改行情報を保持
     with open(args.input, 'r', encoding='utf_8') as inputfile:
         lines = inputfile.readlines()
 
-    with open(args.output, 'w', encoding='utf_8') as outputfile:
-        for line_no, raw_line in enumerate(lines, 1):
-            line = processor_words(raw_line, preprocessor_words)
-
-            logger.info(f"翻訳中: {line_no}行目")
+    # 差分モード: 前回リリースと同じ英語行は前回の翻訳をそのまま使う
+    previous_translations = {}
+    previous_terms = None
+    if args.prev_source and args.prev_output:
+        previous_translations = load_previous_translations(
+            args.prev_source, args.prev_output)
+        previous_terms = TermRecord.load(args.prev_output)
+    reused_count = 0
+
+    # 翻訳メモリ: 同じ用語集・文体で翻訳済みの行は再利用する
+    tm_store = None
+    tm_translations = {}
+    tm_reused_count = 0
+    current_glossary_version = glossary_version(glossary)
+    style = style_flag(args.casual)
+    if args.tm:
+        tm_store = TmStore(args.tm)
+        tm_translations = tm_store.lookup_table(current_glossary_version, style)
+        logger.info("翻訳メモリを読み込みました: %s (%s件中 %s件が同じ用語集・文体)",
+                    args.tm, len(tm_store), len(tm_translations))
+
+    # 前回リリースの翻訳・翻訳メモリから類似文の翻訳例をプロンプトに添える
+    memory = None
+    if args.examples > 0:
+        pairs = []
+        if args.prev_source and args.prev_output:
+            pairs.extend(read_line_pairs(args.prev_source, args.prev_output))
+        if tm_store is not None:
+            pairs.extend(tm_store.pairs(current_glossary_version, style))
+        memory = TranslationMemory(pairs)
+        logger.info("翻訳例の索引を作成しました: %s件", len(memory))
+
+    # 用語集が前回から変わっていれば、変更された用語を使う行だけを再翻訳
+    glossary_invalidator = GlossaryInvalidator(
+        previous_terms, glossary, filter_glossary_for_text)
+    term_record = TermRecord(glossary)
+
+    # シャード実行: 担当する連続範囲の行のみを翻訳
+    start, end = 0, len(lines)
+    if args.shard:
+        start, end = shard_range(len(lines), *args.shard)
+        logger.info("シャード %s/%s: %s〜%s行目 (%s行)",
+                    args.shard[0], args.shard[1], start + 1, end, end - start)
+
+    # 完了行数・処理速度・残り時間を定期的に出力
+    progress = ProgressReporter(
+        [line.rstrip('\r\n') for line in lines[start:end]],
+        args.status_file, args.progress_interval, generated_token_count)
+
+    model_ready = None  # 接続確認・事前ロードのタスク
+    escalation_warmup = None  # カスケードモードの大きいモデルの事前ロード
+
+    async def prepare_models():
+        nonlocal escalation_warmup
+        if not args.no_connection_check:
+            await asyncio.to_thread(check_ollama_connection)
+        if args.no_warmup:
+            return
+        # ロード待ちは処理速度（--dry-run の見積もり用）に含めない
+        progress.exclude(await async_warm_up_model(MODEL_NAME, args.keep_alive))
+        if args.cascade:
+            # 大きいモデルは下訳と並行してロードし、エスカレーション前に待つ
+            escalation_warmup = asyncio.ensure_future(
+                async_warm_up_model(args.escalation_model, args.keep_alive))
+
+    async def ensure_model_ready():
+        """Ollama接続確認とモデルの事前ロード（LLMで翻訳する最初の単位の前に1回）
+
+        全行を再利用・ローカル確定できる小さなファイルではOllamaに接続しない。
+        同時に呼び出した他の翻訳ワーカーは完了まで待つ。
+        """
+        nonlocal model_ready
+        if args.replay:
+            return
+        if model_ready is None:
+            model_ready = asyncio.ensure_future(prepare_models())
+        await model_ready
+
+    with open(os.devnull if args.dry_run else args.output, 'w',
+              encoding='utf_8') as outputfile:
+        # 翻訳順に関係なく元の行順で書き出す
+        writer = OrderedWriter(outputfile, end, start)
+        jobs = []
+        fast_path_stats = FastPathStats()
+        # 同じ文字列は1回だけ翻訳して全ての出現箇所に書き出す
+        first_occurrences = {}
+        # 翻訳メモリに記録する行ごとの作成元（重複行は最初の出現行を参照）
+        line_origins = {}
+        duplicate_sources = {}
+
+        def iter_jobs():
+            """prepare ステージ: 前処理・ローカル確定・重複除去"""
+            nonlocal reused_count, tm_reused_count
+            for line_no, raw_line in enumerate(lines[start:end], start + 1):
+                line = processor_words(raw_line, preprocessor_words).rstrip('\r\n')
+
+                previous_line = previous_translations.get(line_hash(raw_line))
+                if (previous_line is not None and
+                        not glossary_invalidator.is_affected(raw_line, line)):
+                    writer.put(line_no - 1, previous_line)
+                    progress.skip(line_no - 1 - start)
+                    line_origins[line_no - 1] = ORIGIN_PREVIOUS
+                    reused_count += 1
+                    terms = previous_terms and previous_terms.get(raw_line)
+                    term_record.record(raw_line, terms if terms is not None else
+                                       filter_glossary_for_text(line, glossary))
+                    continue
+
+                # 行ごとに該当した用語を記録（次回の用語集変更時の判定用）
+                term_record.record(raw_line,
+                                   filter_glossary_for_text(line, glossary))
+
+                tm_line = tm_translations.get(line_hash(raw_line))
+                if tm_line is not None:
+                    writer.put(line_no - 1, tm_line)
+                    progress.skip(line_no - 1 - start)
+                    tm_reused_count += 1
+                    continue
+
+                # 空行・タグのみ・翻訳済み・用語集と完全一致する行はLLMを使わない
+                resolved_line, reason = resolve_locally(line, glossary_index)
+                if resolved_line is not None:
+                    final_line, _ = finalize_translation(
+                        line, resolved_line, line_no, postprocessor_words)
+                    writer.put(line_no - 1, final_line)
+                    progress.skip(line_no - 1 - start)
+                    line_origins[line_no - 1] = ORIGIN_LOCAL
+                    fast_path_stats.record(reason)
+                    continue
+
+                first_line_no = first_occurrences.get(line)
+                if first_line_no is not None:
+                    writer.add_duplicate(first_line_no - 1, line_no - 1)
+                    duplicate_sources[line_no - 1] = first_line_no - 1
+                    progress.skip(line_no - 1 - start)
+                    continue
+                first_occurrences[line] = line_no
+
+                jobs.append((line_no, line))
+                yield line_no, line
+
+        stats = ScheduleStats()
+        repair_queue = []
+        repair_tasks = []
+        repair_model = args.escalation_model if args.cascade else None
+        repair_semaphore = None  # 修正リトライの同時実行数（イベントループ内で作成）
+        # 品質チェックに失敗したまま出力した行（翻訳メモリに登録しない）
+        failed_sources = set()
+
+        async def translate(unit):
+            """translate ステージ: LLM呼び出し"""
+            line_numbers = ', '.join(str(line_no) for line_no, _ in unit.jobs)
+            logger.debug("翻訳中: %s行目", line_numbers)
+            await ensure_model_ready()
 
             try:
-                # 翻訳対象テキストに関連する用語のみを抽出
-                filtered_glossary = filter_glossary_for_text(line, glossary)
-                logger.debug(
-                    f"用語数: {len(glossary)} → {len(filtered_glossary)}")
-
-                translated_line = ollama_translate_line(
-                    line, filtered_glossary, args.casual)
-
-                # 一時コード数をカウント（postprocessor適用前）
-                original_newline_count = line.count('[NLINE]')
-                translated_newline_count = translated_line.count('[NLINE]')
-
-                # 改行コード数が一致しない場合は警告
-                if original_newline_count != translated_newline_count:
-                    logger.warning(
-                        f"行{line_no}: 改行コード数が不一致 - "
-                        f"元:{original_newline_count}, "
-                        f"翻訳後:{translated_newline_count}")
-
-                translated_line = processor_words(
-                    translated_line, postprocessor_words)
-
-                # カラータグ補完
-                translated_line = fix_color_tags(
-                    translated_line.strip(), line_no)
-
-                # 句読点整形
-                translated_line = format_punctuation(translated_line, line_no)
-
-                # コンテンツフィルタ検出
-                detect_content_filter(translated_line.strip(), line_no)
-
-                # タグ検証（カラータグ補完後に再実行）
-                check_translation_tags(translated_line.strip(), line_no)
-
-                translated_line_striped = translated_line.strip()
-                outputfile.write(translated_line_striped + '\n')
-                time.sleep(0.5)  # Ollamaは高速なので短縮
+                start_time = time.perf_counter()
+                counter = [0]
+                request_counter.set(counter)
+
+                translations = await translate_unit(
+                    unit, glossary, args.casual, not args.no_tag_masking,
+                    args.split_long, memory, args.examples)
+
+                elapsed = time.perf_counter() - start_time
+                stats.record(unit, elapsed, counter[0])
+                progress.record([line_no - 1 - start
+                                 for line_no, _ in unit.jobs], elapsed)
+                return translations
             except Exception as e:
                 logger.error(
-                    f"{line_no}行目でエラーが発生しました。"
-                    "処理を中断します。")
+                    "%s行目でエラーが発生しました。処理を中断します。", line_numbers)
                 raise e
 
+        def finalize(unit, translations):
+            """finalize ステージ: 後処理と品質チェック"""
+            return [
+                (unit, line_no, line) + finalize_translation(
+                    line, translated_line, line_no, postprocessor_words)
+                for (line_no, line), translated_line in zip(unit.jobs,
+                                                            translations)
+            ]
+
+        async def repair(item: RepairItem) -> bool:
+            """失敗行の再翻訳（カスケードモードでは大きいモデルにエスカレーション）"""
+            async with repair_semaphore:
+                if escalation_warmup is not None:
+                    await escalation_warmup
+                passed = await repair_until_passed(
+                    item, glossary, args.casual, postprocessor_words, writer,
+                    args.max_repair_attempts, not args.no_tag_masking,
+                    repair_model)
+            line_origins[item.line_no - 1] = repair_model or MODEL_NAME
+            if not passed:
+                failed_sources.add(lines[item.line_no - 1].rstrip('\r\n'))
+            return passed
+
+        def write(outputs):
+            """write ステージ: 元の行順で書き出し、失敗行は再翻訳"""
+            for unit, line_no, line, final_line, failures in outputs:
+                if failures:
+                    stats.record_failure(unit)
+                if failures and (args.max_repair_attempts > 0 or args.cascade):
+                    # 構造的な問題がある行は翻訳と並行して再翻訳し、
+                    # 後続の行の書き出しを全行の翻訳後まで待たせない
+                    item = RepairItem(line_no, line, final_line, failures)
+                    repair_queue.append(item)
+                    repair_tasks.append(asyncio.ensure_future(repair(item)))
+                else:
+                    if failures:
+                        failed_sources.add(lines[line_no - 1].rstrip('\r\n'))
+                    line_origins[line_no - 1] = MODEL_NAME
+                    writer.put(line_no - 1, final_line)
+
+        async def run_translation():
+            nonlocal repair_semaphore
+            repair_semaphore = asyncio.Semaphore(
+                max(args.escalation_concurrency, 1))
+            try:
+                # 短い行はまとめて優先的に、長い行は1行ずつ翻訳
+                pipeline_stats = await run_pipeline(
+                    iter_schedule(iter_jobs(), args.batch_size, can_batch_line),
+                    lambda unit: class_priority(unit.class_name),
+                    translate, finalize, write,
+                    args.concurrency, args.queue_size)
+                passed = await asyncio.gather(*repair_tasks)
+            except BaseException:
+                for task in repair_tasks:
+                    task.cancel()
+                raise
+
+            fast_path_stats.log_report(end - start)
+            duplicate_count = len(duplicate_sources)
+            if duplicate_count:
+                total_count = len(jobs) + duplicate_count
+                logger.info("重複除去: %s行 → %s種類 (重複率: %.0f%%)",
+                            total_count, len(jobs),
+                            duplicate_count / total_count * 100)
+
+            if repair_queue:
+                if args.cascade:
+                    # 失敗行だけを大きいモデルにエスカレーション
+                    logger.info("エスカレーション: %s/%s行を%sで再翻訳",
+                                len(repair_queue), len(jobs),
+                                args.escalation_model)
+                logger.info("品質チェック: %s行を修正リトライ、%s行が未解決",
+                            len(repair_queue), passed.count(False))
+
+            return pipeline_stats
+
+        if args.dry_run:
+            # LLMを呼び出さず、前処理・重複除去・スケジューリングの結果から見積もる
+            plan = DryRunPlan()
+            for unit in iter_schedule(iter_jobs(), args.batch_size,
+                                      can_batch_line):
+                for _, text in unit.jobs:
+                    plan.add_line(text)
+                for prompt, source_text in plan_unit(
+                        unit, glossary, args.casual, not args.no_tag_masking,
+                        args.split_long, memory, args.examples):
+                    plan.add_request(prompt, source_text)
+        else:
+            with progress:
+                pipeline_stats = asyncio.run(run_translation())
+
+    if args.dry_run:
+        plan.classify('前回翻訳を再利用', reused_count)
+        plan.classify('翻訳メモリから再利用', tm_reused_count)
+        plan.classify('ローカル確定', sum(fast_path_stats.counts.values()))
+        plan.classify('重複（翻訳結果を共有）', len(duplicate_sources))
+        plan.classify('LLMで翻訳', len(jobs))
+        glossary_invalidator.log_report()
+        plan.log_report(MODEL_NAME,
+                        load_throughput(MODEL_NAME, throughput_path(args.output)),
+                        args.concurrency)
+        return
+
+    pipeline_stats.log_report()
+    stats.log_report()
+    log_usage_report()
+
+    term_record.save(args.output)
+
+    # 次回の --dry-run の所要時間の見積もりに使う（再生時の時間は記録しない）
+    if not args.replay:
+        save_throughput(MODEL_NAME, progress.throughput(),
+                        {'concurrency': args.concurrency,
+                         'batch_size': args.batch_size},
+                        throughput_path(args.output))
+
+    if previous_translations:
+        logger.info("差分モード: %s行中 %s行を前回翻訳から再利用", end - start, reused_count)
+        glossary_invalidator.log_report()
+
+    if tm_store is not None:
+        logger.info("翻訳メモリ: %s行中 %s行を再利用", end - start, tm_reused_count)
+        origins = [line_origins.get(duplicate_sources.get(index, index))
+                   for index in range(start, end)]
+        save_to_translation_memory(
+            tm_store, lines[start:end], args.output, tm_translations,
+            failed_sources, origins, current_glossary_version, style)
+        tm_store.close()
+
+    if args.shard:
+        # プレビューは sharding.py で結合した後に生成する
+        write_manifest(args.output, args.input, *args.shard, start, end,
+                       len(lines))
+        logger.info("シャードの翻訳が完了しました。全シャード完了後に sharding.py で結合してください。")
+        return
+
     # 翻訳完了後にHTMLプレビューを自動生成
     logger.info("翻訳完了。HTMLプレビューを生成中...")
 
@@ -355,7 +1032,7 @@ def main(args):
     # HTMLプレビューを生成
     generate_html_preview(translated_lines, preview_file)
 
-    logger.info(f"HTMLプレビューを生成しました: {preview_file}")
+    logger.info("HTMLプレビューを生成しました: %s", preview_file)
     logger.info("ブラウザで開いて確認してください。")
 
 
@@ -365,9 +1042,91 @@ if __name__ == '__main__':
     parser.add_argument('-i', '--input', required=True, help='入力ファイル')
     parser.add_argument('-o', '--output', help='出力ファイル')
     parser.add_argument('-c', '--casual', action='store_true', help='口語体モード（ゲームのセリフ用）')
+    parser.add_argument('--prev-source', help='前回リリースの英語ファイル（差分モード）')
+    parser.add_argument('--prev-output', help='前回リリースの日本語ファイル（差分モード）')
+    parser.add_argument('--tm', metavar='FILE',
+                        help='翻訳メモリ（SQLite）。同じ用語集・文体の翻訳済み行を再利用し、'
+                             '翻訳結果を登録する（TMX の入出力・結合は tm_store.py）')
+    parser.add_argument('--examples', type=int, default=0, metavar='K',
+                        help='前回リリースの翻訳・翻訳メモリから類似文の翻訳例をK件プロンプトに添える'
+                             f'（--prev-source/--prev-output か --tm が必要、推奨 {DEFAULT_EXAMPLE_COUNT}）')
+    parser.add_argument('--log-level', default=DEFAULT_LOG_LEVEL,
+                        choices=LOG_LEVELS, help='ログの出力レベル')
+    parser.add_argument('--qa-log', metavar='FILE',
+                        help='品質チェックの警告（WARNING以上）も記録するファイル')
+    parser.add_argument('--shard',
+                        help='担当するシャード i/N（例: 1/4）。結合は sharding.py')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='LLMを呼び出さずにリクエスト数・トークン数・所要時間を見積もる')
+    parser.add_argument('--profile', action='store_true',
+                        help='ステージ別の呼び出し回数・累積時間を終了時に出力')
+    parser.add_argument('--cprofile', metavar='FILE',
+                        help='cProfile の統計を出力するファイル')
+    parser.add_argument('--tracemalloc', metavar='FILE',
+                        help='終了時のメモリ確保のスナップショットを出力するファイル')
+    parser.add_argument('--progress-interval', type=float,
+                        default=DEFAULT_PROGRESS_INTERVAL,
+                        help='進捗を出力する間隔（秒、0で終了時のみ）')
+    parser.add_argument('--status-file',
+                        help='進捗をJSONで書き出すファイル（他のツールから参照用）')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='同時に送る翻訳リクエスト数')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='パイプラインの各キューの上限')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='短い行をまとめて翻訳する行数（1でまとめない）')
+    parser.add_argument('--max-repair-attempts', type=int,
+                        default=DEFAULT_MAX_REPAIR_ATTEMPTS,
+                        help='品質チェック失敗行の再翻訳回数（0で無効）')
+    parser.add_argument('--no-tag-masking', action='store_true',
+                        help='タグをプレースホルダーに置換せずにそのまま送る')
+    parser.add_argument('--split-long', action='store_true',
+                        help='長い行を段落・文単位に分割して並行に翻訳')
+    parser.add_argument('--cascade', action='store_true',
+                        help='品質チェック失敗行のみ大きいモデルで再翻訳')
+    parser.add_argument('--escalation-model', default=ESCALATION_MODEL_NAME,
+                        help='カスケードモードで使う大きいモデル')
+    parser.add_argument('--draft-concurrency', type=int, default=1,
+                        help='下訳モデルの同時リクエスト数')
+    parser.add_argument('--escalation-concurrency', type=int, default=1,
+                        help='大きいモデルの同時リクエスト数')
+    parser.add_argument('--reasoning',
+                        help='推論レベル off/low/medium/high '
+                             '（長さクラス別指定: short=off,long=medium）')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', metavar='CASSETTE',
+                                help='Ollamaの応答と所要時間をカセットファイルに記録（.gzで圧縮）')
+    cassette_group.add_argument('--replay', metavar='CASSETTE',
+                                help='記録した応答を再生（Ollama不要）')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='再生時の待ち時間の倍速（2で半分、0で待たない）')
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE,
+                        help='モデルをメモリに保持する時間（例: 30m, -1で無期限）')
+    parser.add_argument('--no-warmup', action='store_true',
+                        help='最初のリクエスト前のモデル事前ロードを行わない')
+    parser.add_argument('--no-connection-check', action='store_true',
+                        help='最初のリクエスト前のOllama接続確認（モデル一覧の取得）を行わない')
 
     args = parser.parse_args()
 
+    if args.reasoning:
+        try:
+            args.reasoning = parse_reasoning_levels(args.reasoning)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.shard:
+        try:
+            args.shard = parse_shard_spec(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if bool(args.prev_source) != bool(args.prev_output):
+        parser.error('--prev-source と --prev-output は同時に指定してください')
+
+    if args.examples > 0 and not (args.prev_source or args.tm):
+        parser.error('--examples には --prev-source/--prev-output か --tm が必要です')
+
     if args.output is None:
         tdatetime = dt.now()
         date_time_str = tdatetime.strftime('%Y%m%d_%H%M%S')
@@ -376,6 +1135,8 @@ if __name__ == '__main__':
         base_name = os.path.splitext(args.input)[0]
         extension = os.path.splitext(args.input)[1]
 
-        args.output = f"{base_name}_ollama_{date_time_str}{extension}"
+        shard_suffix = (f"_shard{args.shard[0]}of{args.shard[1]}"
+                        if args.shard else "")
+        args.output = f"{base_name}_ollama_{date_time_str}{shard_suffix}{extension}"
 
     main(args)
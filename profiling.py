@@ -0,0 +1,128 @@
+import atexit
+import cProfile
+import functools
+import inspect
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# 終了時にログに出力するメモリ確保元の件数
+TRACEMALLOC_TOP = 10
+
+
+class StageTimers:
+    """ステージ（関数）ごとの呼び出し回数と累積時間"""
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, elapsed: float):
+        with self._lock:
+            entry = self.stats.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def log_report(self, wall_seconds: float):
+        if not self.stats:
+            return
+        logger.info("=== ステージ別プロファイル (経過時間 %.1f秒) ===", wall_seconds)
+        for name, (calls, seconds) in sorted(self.stats.items(),
+                                             key=lambda item: -item[1][1]):
+            logger.info("  %-26s: %7s回, 累積 %8.3f秒, 平均 %8.3fms (経過時間比 %.1f%%)",
+                        name, calls, seconds, seconds / calls * 1000,
+                        seconds / wall_seconds * 100 if wall_seconds else 0)
+        logger.info("  ※並行実行されるステージ（LLM呼び出し等）は経過時間比が100%を超えることがあります")
+
+
+def _timed(func, timers: StageTimers):
+    name = func.__name__
+    if inspect.iscoroutinefunction(func):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                timers.add(name, time.perf_counter() - start)
+    else:
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timers.add(name, time.perf_counter() - start)
+    return functools.wraps(func)(wrapper)
+
+
+def instrument_stages(functions: list, timers: StageTimers):
+    """関数を計測用のラッパーに置き換え、元に戻す関数を返す
+
+    from ... import で取り込んだ先のモジュールも含め、
+    読み込み済みの全モジュールで同じ関数を参照している名前を置き換える。
+    """
+    replaced = []
+    for func in functions:
+        wrapper = _timed(func, timers)
+        for module in list(sys.modules.values()):
+            if getattr(module, '__dict__', {}).get(func.__name__) is func:
+                setattr(module, func.__name__, wrapper)
+                replaced.append((module, func.__name__, func))
+
+    def restore():
+        for module, name, func in replaced:
+            setattr(module, name, func)
+    return restore
+
+
+def start_profiling(stages: list = None, cprofile_file: str = None,
+                    tracemalloc_file: str = None):
+    """ステージ別の計測・cProfile・tracemalloc を開始し、終了時に結果を出力
+
+    cProfile は呼び出したスレッド（イベントループ）のみが対象。
+    """
+    if not (stages or cprofile_file or tracemalloc_file):
+        return
+
+    timers = StageTimers()
+    if stages:
+        instrument_stages(stages, timers)
+
+    profiler = None
+    if cprofile_file:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if tracemalloc_file:
+        tracemalloc.start()
+
+    start_time = time.perf_counter()
+
+    def report():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_file)
+            logger.info("cProfile の統計を出力しました: %s "
+                        "(python -m pstats %s で確認)", cprofile_file, cprofile_file)
+
+        if tracemalloc_file:
+            # 計測自体（cProfile・tracemalloc）による確保は除く
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ])
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(tracemalloc_file)
+            logger.info("メモリ使用量: 現在 %.1fMB / ピーク %.1fMB (スナップショット: %s)",
+                        current / 1e6, peak / 1e6, tracemalloc_file)
+            for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+                logger.info("  %s", stat)
+
+        timers.log_report(time.perf_counter() - start_time)
+
+    # ログのリスナーより先に実行される（atexit は登録の逆順）
+    atexit.register(report)
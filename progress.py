@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from scheduler import classify_length, LENGTH_CLASSES
+
+logger = logging.getLogger(__name__)
+
+# 進捗を出力する間隔（秒）
+DEFAULT_PROGRESS_INTERVAL = 30.0
+
+
+def format_duration(seconds: float) -> str:
+    """秒数を「1時間02分」「3分05秒」の形式にする"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}時間{minutes:02d}分"
+    if minutes:
+        return f"{minutes}分{seconds:02d}秒"
+    return f"{seconds}秒"
+
+
+class ProgressReporter:
+    """完了行数・処理速度・残り時間を定期的に stderr と状態ファイルに出力
+
+    残り時間は、長さクラスごとに実測した1文字あたりのリクエスト所要時間を
+    未完了の文字数に掛け、並行実行による実際の処理速度
+    （リクエスト所要時間の合計 / 経過時間）で割って求める。
+    texts は対象の全行で、各メソッドには texts 内の位置を渡す。
+    """
+
+    def __init__(self, texts: list[str], status_file: str = None,
+                 interval: float = DEFAULT_PROGRESS_INTERVAL,
+                 token_count=None, stream=None):
+        self.texts = texts
+        self.status_file = status_file
+        self.interval = interval
+        self.token_count = token_count or (lambda: 0)
+        self.stream = stream or sys.stderr
+
+        self.remaining = {class_name: 0 for class_name, _, _ in LENGTH_CLASSES}
+        for text in texts:
+            self.remaining[classify_length(text)] += len(text)
+        self.total_chars = sum(self.remaining.values())
+        self.observed = {}  # 長さクラス → [文字数, 所要時間]
+        self.completed = 0
+        self.skipped = 0
+        self.busy_seconds = 0.0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.start_time = None
+        self.end_time = None
+        self.start_tokens = 0
+
+    def _complete(self, index: int):
+        text = self.texts[index]
+        class_name = classify_length(text)
+        self.remaining[class_name] -= len(text)
+        self.completed += 1
+        return class_name, len(text)
+
+    def skip(self, index: int):
+        """LLMを使わずに確定した行（再利用・ローカル確定・重複）"""
+        with self._lock:
+            self._complete(index)
+            self.skipped += 1
+
+    def record(self, indexes: list[int], elapsed: float):
+        """1リクエスト（まとめ翻訳の場合は複数行）の完了"""
+        with self._lock:
+            for index in indexes:
+                class_name, chars = self._complete(index)
+                entry = self.observed.setdefault(class_name, [0, 0.0])
+                entry[0] += chars
+                entry[1] += elapsed / len(indexes)
+            self.busy_seconds += elapsed
+
+    def exclude(self, seconds: float):
+        """経過時間から除く時間（処理の途中で行ったモデルのロード等）"""
+        with self._lock:
+            self.start_time += seconds
+
+    def estimate_remaining(self, elapsed: float):
+        """残り時間（秒）の推定。実測値がない場合はNone"""
+        observed_chars = sum(chars for chars, _ in self.observed.values())
+        if not observed_chars or elapsed <= 0:
+            return None
+        seconds_per_char = {class_name: seconds / chars
+                            for class_name, (chars, seconds)
+                            in self.observed.items() if chars}
+        # 実測のない長さクラスは全体の平均で代用
+        average = self.busy_seconds / observed_chars
+        remaining_seconds = sum(
+            chars * seconds_per_char.get(class_name, average)
+            for class_name, chars in self.remaining.items())
+        parallelism = max(self.busy_seconds / elapsed, 1e-9)
+        return remaining_seconds / parallelism
+
+    def throughput(self) -> dict:
+        """実測した処理速度（--dry-run の見積もり用、実測がなければ空）"""
+        with self._lock:
+            elapsed = (self.end_time or time.perf_counter()) - self.start_time
+            observed_chars = sum(chars for chars, _ in self.observed.values())
+            if not observed_chars or elapsed <= 0:
+                return {}
+            return {
+                'seconds_per_char': {
+                    class_name: seconds / chars
+                    for class_name, (chars, seconds) in self.observed.items()
+                    if chars},
+                'parallelism': self.busy_seconds / elapsed,
+                'output_tokens_per_char':
+                    (self.token_count() - self.start_tokens) / observed_chars,
+            }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = (self.end_time or time.perf_counter()) - self.start_time
+            tokens = self.token_count() - self.start_tokens
+            eta = self.estimate_remaining(elapsed)
+            total = len(self.texts)
+            return {
+                'completed': self.completed,
+                'total': total,
+                'skipped': self.skipped,
+                'percent': round(self.completed / total * 100, 1) if total else 100.0,
+                'remaining_chars': sum(self.remaining.values()),
+                'total_chars': self.total_chars,
+                'lines_per_sec': round(self.completed / elapsed, 3) if elapsed else 0,
+                'tokens_per_sec': round(tokens / elapsed, 1) if elapsed else 0,
+                'elapsed_seconds': round(elapsed, 1),
+                'eta_seconds': round(eta) if eta is not None else None,
+                'eta': ((datetime.now() + timedelta(seconds=eta)).isoformat(
+                    timespec='seconds') if eta is not None else None),
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+            }
+
+    def emit(self, state: str = 'running'):
+        status = self.snapshot()
+        status['state'] = state
+        if status['eta_seconds'] is None:
+            eta = '計測中'
+        else:
+            eta = (f"約{format_duration(status['eta_seconds'])} "
+                   f"(完了予定 {status['eta'][11:16]})")
+        self.stream.write(
+            f"[進捗] {status['completed']}/{status['total']}行 "
+            f"({status['percent']}%) {status['lines_per_sec']:.2f}行/秒 "
+            f"{status['tokens_per_sec']:.1f}トークン/秒 "
+            f"経過 {format_duration(status['elapsed_seconds'])} 残り {eta}\n")
+        self.stream.flush()
+
+        if self.status_file:
+            # 読み取り側が書きかけのファイルを読まないように置き換える
+            temp_file = self.status_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(status, f, ensure_ascii=False, indent=1)
+            os.replace(temp_file, self.status_file)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.emit()
+            except OSError as e:
+                logger.warning("進捗を出力できませんでした: %s", e)
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.start_tokens = self.token_count()
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, state: str = 'done'):
+        """定期出力を停止し、最終状態を出力"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.end_time = time.perf_counter()
+        self.emit(state)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop('done' if exc_type is None else 'failed')
@@ -29,7 +29,7 @@ def format_punctuation(text: str, line_no: int) -> str:
 
     if changes_made > 0:
         line_info = f"行{line_no}: " if line_no else ""
-        logger.info(f"句読点整形: {line_info}{changes_made}箇所に半角空白を追加")
+        logger.info("句読点整形: %s%s箇所に半角空白を追加", line_info, changes_made)
 
     return formatted_text
 
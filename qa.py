@@ -0,0 +1,288 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+from collections import Counter
+from typing import Optional
+from tag_validator import validate_tags
+from color_tag_fixer import fix_color_tags
+from content_filter_detector import detect_content_filter
+from punctuation_formatter import format_punctuation
+from quality_gate import is_mostly_english
+
+logger = logging.getLogger(__name__)
+
+# 翻訳済みファイル内の改行コード（postprocessorで戻されたもの）
+NEWLINE_CODE = '\\n'
+
+# ワーカーに一度に渡す行数
+DEFAULT_CHUNK_SIZE = 1000
+
+# 自動修正できるチェック
+FIXABLE_CHECKS = ('color_tag', 'punctuation')
+
+
+def check_line(text: str, source: Optional[str] = None) -> tuple[str, list]:
+    """1行を検証し、(自動修正後のテキスト, [(チェック名, 内容)]) を返す"""
+    findings = []
+    text = text.strip()
+    if not text:
+        return text, findings
+
+    # 翻訳時の後処理と同じ修正を適用し、変わった場合は未修正として報告
+    fixed = fix_color_tags(text)
+    if fixed != text:
+        findings.append(('color_tag', "終了タグ [/c] を [-][/c] に修正できます"))
+    formatted = format_punctuation(fixed, None).strip()
+    if formatted != fixed:
+        findings.append(('punctuation', "句読点の後に半角空白を追加できます"))
+
+    # 以降は修正後のテキストで検証（翻訳時の品質チェックと同じ順序）
+    category = detect_content_filter(formatted)
+    if category:
+        findings.append(('content_filter',
+                         f"拒否・ブロックの応答になっています ({category})"))
+
+    for error in validate_tags(formatted):
+        findings.append(('tag', error))
+
+    if is_mostly_english(formatted):
+        findings.append(('english', "英語のまま翻訳されていません"))
+
+    if source is not None:
+        source_count = source.count(NEWLINE_CODE)
+        text_count = formatted.count(NEWLINE_CODE)
+        if source_count != text_count:
+            findings.append(('newline', f"改行コードの数が元テキスト({source_count}個)と"
+                                        f"異なります({text_count}個)"))
+
+    return formatted, findings
+
+
+def check_chunk(chunk: list) -> list:
+    """[(行番号, 行, 元テキスト)] を検証して [(行番号, 行, 修正後, 問題点)] を返す"""
+    return [(line_no, text, *check_line(text, source))
+            for line_no, text, source in chunk]
+
+
+def _init_worker():
+    # 検出内容はレポートにまとめるため、ワーカーでは個別のログを出さない
+    logging.disable(logging.CRITICAL)
+
+
+class QaReport:
+    """検出した問題の集計とレポート出力"""
+
+    def __init__(self, input_file: str):
+        self.input_file = input_file
+        self.lines = 0
+        self.fixed_lines = 0
+        self.counts = Counter()
+        self.findings = []
+
+    def add(self, line_no: int, text: str, fixed: str, findings: list):
+        self.lines += 1
+        if fixed != text.strip():
+            self.fixed_lines += 1
+        if not findings:
+            return
+        self.counts.update(check for check, _ in findings)
+        self.findings.append({
+            'line': line_no,
+            'checks': sorted({check for check, _ in findings}),
+            'messages': [message for _, message in findings],
+            'text': text.strip(),
+        })
+
+    @property
+    def unfixable_count(self) -> int:
+        """自動修正できない問題を含む行数"""
+        return sum(1 for finding in self.findings
+                   if not set(finding['checks']) <= set(FIXABLE_CHECKS))
+
+    def save(self, report_file: str):
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'input': self.input_file,
+                'lines': self.lines,
+                'problem_lines': len(self.findings),
+                'unfixable_lines': self.unfixable_count,
+                'fixed_lines': self.fixed_lines,
+                'counts': dict(self.counts),
+                'findings': self.findings,
+            }, f, ensure_ascii=False, indent=1)
+
+    def log_report(self):
+        logger.info("QA: %s行中 %s行に問題 (自動修正不可 %s行, 自動修正 %s行)",
+                    self.lines, len(self.findings), self.unfixable_count,
+                    self.fixed_lines)
+        for check, count in self.counts.most_common():
+            logger.info("  %s: %s行", check, count)
+
+
+def _chunks(rows, chunk_size: int):
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        yield chunk
+
+
+def iter_text_rows(input_file: str, source_file: Optional[str] = None):
+    """テキストファイルを (行番号, 行, 元テキスト) で順に返す"""
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        if source_file is None:
+            for line_no, line in enumerate(f, 1):
+                yield line_no, line.rstrip('\r\n'), None
+            return
+        with open(source_file, 'r', encoding='utf-8', newline='') as source:
+            for line_no, (line, source_line) in enumerate(
+                    itertools.zip_longest(f, source), 1):
+                if line is None:
+                    logger.warning("翻訳ファイルが英語ファイルより短くなっています"
+                                   "（%s行目以降がありません）", line_no)
+                    return
+                yield (line_no, line.rstrip('\r\n'),
+                       source_line.rstrip('\r\n') if source_line is not None
+                       else None)
+
+
+def _column_index(header: list[str], column: Optional[str], default=None):
+    if column is None:
+        return default
+    if column in header:
+        return header.index(column)
+    raise ValueError(f"列が見つかりません: {column} (列: {', '.join(header)})")
+
+
+class TsvRows:
+    """TSVの日本語列を (行番号, セル, 元テキスト) で順に返す（列指定がなければ最後の列）"""
+
+    def __init__(self, input_file: str, column: Optional[str] = None,
+                 source_column: Optional[str] = None):
+        self.input_file = input_file
+        with open(input_file, 'r', encoding='utf-8') as f:
+            self.header = f.readline().rstrip('\r\n')
+        columns = self.header.split('\t')
+        self.column = _column_index(columns, column, len(columns) - 1)
+        self.source_column = _column_index(columns, source_column)
+
+    def __iter__(self):
+        with open(self.input_file, 'r', encoding='utf-8', newline='') as f:
+            next(f)
+            for line_no, line in enumerate(f, 2):
+                parts = line.rstrip('\r\n').split('\t')
+                if len(parts) <= self.column:
+                    logger.warning("行%s: 列数が不足しています", line_no)
+                    yield line_no, '', None
+                    continue
+                source = (parts[self.source_column]
+                          if self.source_column is not None
+                          and len(parts) > self.source_column else None)
+                yield line_no, parts[self.column], source
+
+    def replace_cell(self, line: str, fixed: str) -> str:
+        parts = line.rstrip('\r\n').split('\t')
+        if len(parts) > self.column:
+            parts[self.column] = fixed
+        return '\t'.join(parts)
+
+
+def run_qa(rows, report: QaReport, jobs: Optional[int] = None,
+           chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """行をプロセスプールで並列に検証し、(行番号, 行, 修正後, 問題点) を元の行順で返す
+
+    jobs=1 の場合はプールを使わずに同じプロセスで検証する。
+    """
+    chunks = _chunks(rows, chunk_size)
+    if jobs == 1:
+        yield from _collect(map(check_chunk, chunks), report)
+        return
+
+    with multiprocessing.Pool(jobs, initializer=_init_worker) as pool:
+        yield from _collect(pool.imap(check_chunk, chunks), report)
+
+
+def _collect(results, report: QaReport):
+    for checked in results:
+        for line_no, text, fixed, findings in checked:
+            report.add(line_no, text, fixed, findings)
+            yield line_no, text, fixed, findings
+
+
+def write_fixed(input_file: str, results, fixed_file: str,
+                tsv: Optional[TsvRows] = None):
+    """自動修正を反映したファイルを書き出す（修正のない行は元のまま）"""
+    with open(input_file, 'r', encoding='utf-8', newline='') as src, \
+            open(fixed_file, 'w', encoding='utf-8', newline='') as dst:
+        if tsv is not None:
+            dst.write(next(src))
+        for raw_line, (_, text, fixed, _) in zip(src, results):
+            if fixed == text.strip():
+                dst.write(raw_line)
+                continue
+            ending = raw_line[len(raw_line.rstrip('\r\n')):]
+            if tsv is not None:
+                fixed = tsv.replace_cell(raw_line, fixed)
+            dst.write(fixed + ending)
+        # 翻訳ファイルが英語ファイルより長い場合などの残り
+        for _ in results:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="翻訳済みファイルのタグ・コンテンツフィルタ・英語残り・句読点を並列に検証")
+    parser.add_argument('-i', '--input', required=True,
+                        help='翻訳済みファイル（テキストまたはTSV）')
+    parser.add_argument('--source',
+                        help='元の英語ファイル（テキストのみ、改行コード数を照合）')
+    parser.add_argument('--tsv', action='store_true',
+                        help='入力をヘッダー付きTSVとして扱う（拡張子 .tsv は自動）')
+    parser.add_argument('--column', help='TSVの検証する列名（省略時は最後の列）')
+    parser.add_argument('--source-column',
+                        help='TSVの英語の列名（改行コード数を照合）')
+    parser.add_argument('-r', '--report',
+                        help='レポートのJSONファイル（省略時は 入力ファイル.qa.json）')
+    parser.add_argument('--fix', metavar='OUTPUT',
+                        help='カラータグ・句読点を自動修正したファイルの出力先')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='ワーカープロセス数（省略時はCPU数、1で並列化しない）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='ワーカーに一度に渡す行数')
+
+    args = parser.parse_args()
+    report_file = args.report or args.input + '.qa.json'
+
+    tsv = None
+    try:
+        if args.tsv or args.input.lower().endswith('.tsv'):
+            tsv = TsvRows(args.input, args.column, args.source_column)
+            rows = iter(tsv)
+        else:
+            rows = iter_text_rows(args.input, args.source)
+    except (ValueError, OSError) as e:
+        logger.error("入力ファイルを読み込めません: %s", e)
+        exit(1)
+
+    report = QaReport(args.input)
+    results = run_qa(rows, report, args.jobs, args.chunk_size)
+    if args.fix:
+        write_fixed(args.input, results, args.fix, tsv)
+        logger.info("自動修正したファイルを出力しました: %s", args.fix)
+    else:
+        for _ in results:
+            pass
+
+    report.save(report_file)
+    report.log_report()
+    logger.info("レポートを出力しました: %s", report_file)
+
+    # 自動修正できない問題が残っている場合は終了コード1
+    if report.unfixable_count:
+        exit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s]: %(message)s')
+    main()
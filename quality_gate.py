@@ -0,0 +1,99 @@
+import re
+import logging
+from typing import Optional
+from tag_validator import validate_tags
+from content_filter_detector import detect_content_filter
+from fast_path import JAPANESE_CHAR_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# 改行の一時コード（preprocessorで置換されたもの）
+NLINE_TOKEN = '[NLINE]'
+
+DEFAULT_MAX_REPAIR_ATTEMPTS = 2
+
+
+def is_mostly_english(text: str) -> bool:
+    """テキストが主に英語かどうかを判定"""
+    # タグを除去してテキスト部分のみを抽出
+    clean_text = re.sub(r'\[[^\]]*\]|<[^>]*>', '', text)
+    # 英語の単語を検出
+    english_words = re.findall(r'\b[A-Za-z]+\b', clean_text)
+    # 日本語文字（ひらがな・カタカナ・漢字）を検出
+    japanese_chars = JAPANESE_CHAR_PATTERN.findall(clean_text)
+
+    # 英語の単語が多く、日本語文字が少ない場合は英語と判定
+    return (len(english_words) > 3 and
+            len(japanese_chars) < len(english_words))
+
+
+def check_newline_count(source: str, translated: str,
+                        line_no: Optional[int] = None) -> list[str]:
+    """改行の一時コード数が元テキストと一致するかチェック（postprocessor適用前）"""
+    original_count = source.count(NLINE_TOKEN)
+    translated_count = translated.count(NLINE_TOKEN)
+
+    if original_count == translated_count:
+        return []
+
+    line_info = f"行{line_no}: " if line_no else ""
+    logger.warning("%s改行コード数が不一致 - 元:%s, 翻訳後:%s",
+                   line_info, original_count, translated_count)
+    return [f"改行コード{NLINE_TOKEN}の数が元テキスト({original_count}個)と"
+            f"異なります({translated_count}個)"]
+
+
+def check_final_translation(text: str,
+                            line_no: Optional[int] = None) -> list[str]:
+    """後処理済みの翻訳結果を検証し、問題点のリストを返す"""
+    failures = []
+
+    # コンテンツフィルタ検出
+    if detect_content_filter(text, line_no):
+        failures.append("翻訳ではなく、拒否・ブロックの応答になっています")
+
+    # タグ検証（カラータグ補完後に実行）
+    tag_errors = validate_tags(text)
+    line_info = f"行{line_no}: " if line_no else ""
+    for error in tag_errors:
+        logger.warning("タグ検証: %s%s", line_info, error)
+        logger.warning("対象テキスト: %s", text.strip())
+    failures.extend(tag_errors)
+
+    if is_mostly_english(text):
+        logger.warning("%s英語のまま残っています", line_info)
+        failures.append("英語のまま翻訳されていません")
+
+    return failures
+
+
+def check_segment_translation(source: str, translated: str) -> list[str]:
+    """分割翻訳したセグメントの簡易チェック（後処理前、ログは出さない）"""
+    failures = []
+    if source.count(NLINE_TOKEN) != translated.count(NLINE_TOKEN):
+        failures.append(f"改行コード{NLINE_TOKEN}の数が元テキストと異なります")
+    failures.extend(validate_tags(translated))
+    if is_mostly_english(translated):
+        failures.append("英語のまま翻訳されていません")
+    return failures
+
+
+def format_feedback(previous: str, failures: list[str]) -> str:
+    """リトライ時にプロンプトへ追加する指摘"""
+    failure_lines = '\n'.join(f"- {failure}" for failure in failures)
+    return f"""前回の翻訳には次の問題がありました。問題を修正して翻訳し直してください:
+{failure_lines}
+
+前回の翻訳: {previous}"""
+
+
+class RepairItem:
+    """品質チェックに失敗した行"""
+
+    def __init__(self, line_no: int, line: str, translated: str,
+                 failures: list[str]):
+        self.line_no = line_no
+        self.line = line
+        self.translated = translated
+        self.failures = failures
+        self.attempts = 0
@@ -0,0 +1,158 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 長さクラスごとの設定（文字数の上限, Ollamaオプション）
+# short はまとめて1リクエストで翻訳、それ以外は1行1リクエスト
+LENGTH_CLASSES = [
+    ('short', 100, {'num_ctx': 4096}),
+    ('medium', 500, {'num_ctx': 4096}),
+    ('long', None, {'num_ctx': 8192}),
+]
+
+DEFAULT_BATCH_SIZE = 10
+
+
+def classify_length(text: str) -> str:
+    """テキストの長さクラスを判定"""
+    text_length = len(text.strip())
+    for class_name, max_chars, _ in LENGTH_CLASSES:
+        if max_chars is None or text_length < max_chars:
+            return class_name
+    return LENGTH_CLASSES[-1][0]
+
+
+def get_class_options(class_name: str) -> dict:
+    """長さクラスに対応するOllamaオプション"""
+    for name, _, options in LENGTH_CLASSES:
+        if name == class_name:
+            return dict(options)
+    return {}
+
+
+class WorkUnit:
+    """1回のリクエストで処理する行のまとまり"""
+
+    def __init__(self, class_name: str, jobs: list):
+        self.class_name = class_name
+        self.jobs = jobs  # [(行番号, テキスト), ...]
+
+    @property
+    def is_batch(self) -> bool:
+        return len(self.jobs) > 1
+
+
+def class_priority(class_name: str) -> int:
+    """長さクラスの優先度（短いクラスほど小さい値）"""
+    for priority, (name, _, _) in enumerate(LENGTH_CLASSES):
+        if name == class_name:
+            return priority
+    return len(LENGTH_CLASSES)
+
+
+def iter_schedule(jobs, batch_size: int = DEFAULT_BATCH_SIZE, can_batch=None):
+    """jobs を順に受け取り、処理単位 (WorkUnit) を逐次生成する
+
+    jobs は (行番号, テキスト) の反復可能オブジェクト。
+    短い行は batch_size 行たまるごとにまとめ、それ以外は1行ずつ生成する。
+    can_batch(text) が False を返す行はまとめずに単独で送る。
+    """
+    batchable = []
+    for line_no, text in jobs:
+        class_name = classify_length(text)
+        if (class_name == 'short' and batch_size > 1
+                and (can_batch is None or can_batch(text))):
+            batchable.append((line_no, text))
+            if len(batchable) >= batch_size:
+                yield WorkUnit('short', batchable)
+                batchable = []
+        else:
+            yield WorkUnit(class_name, [(line_no, text)])
+
+    if batchable:
+        yield WorkUnit('short', batchable)
+
+
+class OrderedWriter:
+    """処理順に関係なく元の行順で書き出す（prepare・write の両スレッドから呼び出せる）"""
+
+    def __init__(self, outputfile, total: int, start_index: int = 0):
+        self.outputfile = outputfile
+        self.total = total
+        self.next_index = start_index
+        self.pending = {}
+        self.duplicates = {}
+        self.results = {}  # 登録済みの結果（後から見つかった重複行用）
+        self._lock = threading.RLock()
+
+    def add_duplicate(self, source_index: int, index: int):
+        """index 行目は source_index 行目と同じ結果を書き出す"""
+        with self._lock:
+            text = self.results.get(source_index)
+            if text is not None:
+                self.put(index, text)
+            else:
+                self.duplicates.setdefault(source_index, []).append(index)
+
+    def put(self, index: int, text: str):
+        """index 行目の結果を登録し、連続している分を書き出す"""
+        with self._lock:
+            self.results[index] = text
+            self.pending[index] = text
+            for duplicate_index in self.duplicates.pop(index, []):
+                self.pending[duplicate_index] = text
+            while self.next_index in self.pending:
+                self.outputfile.write(self.pending.pop(self.next_index) + '\n')
+                self.next_index += 1
+            self.outputfile.flush()
+
+    def is_complete(self) -> bool:
+        return self.next_index >= self.total and not self.pending
+
+
+class ScheduleStats:
+    """長さクラスごとのリクエスト数・処理時間を集計"""
+
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, unit: WorkUnit, elapsed: float, requests: int = 1):
+        entry = self.stats.setdefault(
+            unit.class_name,
+            {'lines': 0, 'requests': 0, 'chars': 0, 'seconds': 0.0,
+             'failures': 0})
+        entry['lines'] += len(unit.jobs)
+        entry['requests'] += requests
+        entry['chars'] += sum(len(text) for _, text in unit.jobs)
+        entry['seconds'] += elapsed
+
+    def record_failure(self, unit: WorkUnit):
+        """品質チェックに失敗した行数を記録"""
+        if unit.class_name in self.stats:
+            self.stats[unit.class_name]['failures'] += 1
+
+    def log_report(self):
+        """スケジューリング結果のレポートを出力"""
+        if not self.stats:
+            return
+
+        total_lines = sum(s['lines'] for s in self.stats.values())
+        total_requests = sum(s['requests'] for s in self.stats.values())
+
+        logger.info("=== スケジューリングレポート ===")
+        for class_name, _, _ in LENGTH_CLASSES:
+            entry = self.stats.get(class_name)
+            if not entry:
+                continue
+            seconds = entry['seconds'] or 1e-9
+            logger.info(
+                "  %-6s: %s行 / %sリクエスト, %.0f文字/リクエスト, %.2f行/秒, 品質NG %s行",
+                class_name, entry['lines'], entry['requests'],
+                entry['chars'] / max(entry['requests'], 1),
+                entry['lines'] / seconds, entry['failures'])
+        if total_requests:
+            logger.info(
+                "  合計: %s行を%sリクエストで処理 (リクエスト削減率: %.0f%%)",
+                total_lines, total_requests,
+                (1 - total_requests / total_lines) * 100)
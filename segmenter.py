@@ -0,0 +1,116 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 段落の区切り（空行: "\n\n" または改行の一時コード2つ以上）
+PARAGRAPH_SEPARATOR_PATTERN = re.compile(r'(?:\\n|\[NLINE\]){2,}')
+
+# 文の区切り（文末記号の後の空白）
+SENTENCE_SEPARATOR_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# 途中で分割してはいけない範囲（カラータグ・サイズタグの内側）
+PROTECTED_SPAN_PATTERN = re.compile(
+    r'\[c\]\[[0-9A-Fa-f]{6}\].*?\[-\]\[/c\]'
+    r'|<size=\d+>.*?</size>'
+)
+
+# この文字数以上の行を分割する（長さクラス long と同じ）
+MIN_SPLIT_CHARS = 500
+
+# 1セグメントの目安の文字数（これを超える段落は文単位で分割）
+DEFAULT_MAX_SEGMENT_CHARS = 400
+
+# 前後のセグメントから参考として渡す文字数
+CONTEXT_CHARS = 200
+
+
+def _split_points(text: str, pattern, protected: list) -> list:
+    """保護範囲にかからない区切り位置 (開始, 終了) のリスト"""
+    return [(match.start(), match.end()) for match in pattern.finditer(text)
+            if not any(start < match.end() and match.start() < end
+                       for start, end in protected)]
+
+
+def _protected_spans(text: str) -> list:
+    return [(match.start(), match.end())
+            for match in PROTECTED_SPAN_PATTERN.finditer(text)]
+
+
+def _split_sentences(paragraph: str, max_chars: int) -> list:
+    """長い段落を max_chars 程度の文のまとまりに分割して [(本文, 区切り)] を返す"""
+    points = _split_points(paragraph, SENTENCE_SEPARATOR_PATTERN,
+                           _protected_spans(paragraph))
+    segments = []
+    segment_start = 0
+    for i, (start, end) in enumerate(points):
+        next_start = points[i + 1][0] if i + 1 < len(points) else len(paragraph)
+        # 次の文を足すと上限を超える位置で区切る
+        if next_start - segment_start > max_chars:
+            segments.append((paragraph[segment_start:start],
+                             paragraph[start:end]))
+            segment_start = end
+    segments.append((paragraph[segment_start:], ''))
+    return segments
+
+
+def split_segments(text: str,
+                   max_chars: int = DEFAULT_MAX_SEGMENT_CHARS) -> list:
+    """段落・文の境界でテキストを分割して [(本文, 後続の区切り)] を返す
+
+    カラータグ・サイズタグの内側では分割しない。
+    本文と区切りをすべて連結すると元のテキストに戻る。
+    """
+    points = _split_points(text, PARAGRAPH_SEPARATOR_PATTERN,
+                           _protected_spans(text))
+    paragraphs = []
+    paragraph_start = 0
+    for start, end in points:
+        paragraphs.append((text[paragraph_start:start], text[start:end]))
+        paragraph_start = end
+    paragraphs.append((text[paragraph_start:], ''))
+
+    segments = []
+    for paragraph, separator in paragraphs:
+        if len(paragraph) > max_chars:
+            sentences = _split_sentences(paragraph, max_chars)
+            sentences[-1] = (sentences[-1][0], separator)
+            segments.extend(sentences)
+        else:
+            segments.append((paragraph, separator))
+    return segments
+
+
+def should_split(text: str) -> bool:
+    return len(text.strip()) >= MIN_SPLIT_CHARS
+
+
+def build_context(segments: list, index: int) -> str:
+    """前後のセグメントを参考テキストとして連結"""
+    parts = []
+    if index > 0:
+        parts.append(f"前: {segments[index - 1][0][-CONTEXT_CHARS:]}")
+    if index + 1 < len(segments):
+        parts.append(f"後: {segments[index + 1][0][:CONTEXT_CHARS]}")
+    return '\n'.join(parts)
+
+
+def join_segments(translations: list[str], segments: list) -> str:
+    """翻訳したセグメントを元の区切りで連結"""
+    return ''.join(translated + separator
+                   for translated, (_, separator) in zip(translations,
+                                                         segments))
+
+
+if __name__ == "__main__":
+    # テスト用
+    test_text = ("First paragraph. It has [c][ff0000]two. Sentences[-][/c] here."
+                 "\\n\\nSecond paragraph is short.\\n\\n"
+                 "<size=14>Third. Paragraph.</size> Ends here.")
+
+    logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s]: %(message)s')
+
+    segments = split_segments(test_text, max_chars=30)
+    for i, (segment, separator) in enumerate(segments, 1):
+        print(f"セグメント{i}: {segment!r} 区切り: {separator!r}")
+    print(f"復元一致: {join_segments([s for s, _ in segments], segments) == test_text}")
@@ -0,0 +1,155 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from text_preview import generate_html_preview
+from glossary_tracking import merge_term_records
+
+logger = logging.getLogger(__name__)
+
+SHARD_SPEC_PATTERN = re.compile(r'^(\d+)/(\d+)$')
+
+# シャード出力と一緒に書き出す情報ファイルの拡張子
+MANIFEST_SUFFIX = '.shard.json'
+
+
+def parse_shard_spec(spec: str) -> tuple[int, int]:
+    """シャード指定を解析（例: "2/4" → (2, 4)、番号は1始まり）"""
+    match = SHARD_SPEC_PATTERN.match(spec.strip())
+    if not match:
+        raise ValueError(f"シャード指定は i/N の形式で指定してください: {spec}")
+
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"シャード番号は1〜{count}で指定してください: {spec}")
+    return index, count
+
+
+def shard_range(total: int, index: int, count: int) -> tuple[int, int]:
+    """index 番目のシャードが担当する行範囲 [start, end)（連続範囲で均等に分割）"""
+    return total * (index - 1) // count, total * index // count
+
+
+def file_hash(filename: str) -> str:
+    """入力ファイルのハッシュ（シャード間で同じ入力かを確認する）"""
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def manifest_path(output_file: str) -> str:
+    return output_file + MANIFEST_SUFFIX
+
+
+def write_manifest(output_file: str, input_file: str, index: int, count: int,
+                   start: int, end: int, total: int, header: bool = False,
+                   lines: int = None):
+    """シャード出力の情報ファイルを書き出し
+
+    lines には出力した行数を指定する（入力行をスキップした場合。省略時は担当範囲の行数）。
+    """
+    manifest = {
+        'input_hash': file_hash(input_file),
+        'shard': index,
+        'shards': count,
+        'start': start,
+        'end': end,
+        'total': total,
+        'header': header,
+        'lines': end - start if lines is None else lines,
+    }
+    with open(manifest_path(output_file), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    logger.info("シャード情報を出力しました: %s", manifest_path(output_file))
+
+
+def load_manifest(output_file: str) -> dict:
+    with open(manifest_path(output_file), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def merge_shards(input_file: str, shard_files: list[str],
+                 output_file: str) -> list[str]:
+    """シャード出力を元の行順で結合（欠落・重複・入力の不一致はValueError）"""
+    input_hash = file_hash(input_file)
+    shards = []
+    for shard_file in shard_files:
+        manifest = load_manifest(shard_file)
+        if manifest['input_hash'] != input_hash:
+            raise ValueError(f"{shard_file}: 入力ファイルのハッシュが一致しません")
+        shards.append((manifest, shard_file))
+    if not shards:
+        raise ValueError("シャード出力が指定されていません")
+
+    shards.sort(key=lambda shard: shard[0]['shard'])
+    count = shards[0][0]['shards']
+    numbers = [manifest['shard'] for manifest, _ in shards]
+    if numbers != list(range(1, count + 1)):
+        missing = sorted(set(range(1, count + 1)) - set(numbers))
+        raise ValueError(f"シャードが揃っていません (指定: {numbers}, "
+                         f"不足: {missing}, 全{count}シャード)")
+
+    merged = []
+    header = None
+    expected_start = 0
+    for manifest, shard_file in shards:
+        if manifest['start'] != expected_start:
+            raise ValueError(f"{shard_file}: 担当範囲が連続していません")
+        expected_start = manifest['end']
+
+        with open(shard_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        if manifest['header']:
+            header, lines = lines[0], lines[1:]
+        expected_lines = manifest['lines']
+        if len(lines) != expected_lines:
+            raise ValueError(f"{shard_file}: 出力行数が不足しています "
+                             f"({len(lines)}/{expected_lines}行)")
+        merged.extend(lines)
+
+    if expected_start != shards[-1][0]['total']:
+        raise ValueError("シャードの担当範囲が入力の全行を覆っていません")
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        if header is not None:
+            f.write(header)
+        f.writelines(merged)
+
+    logger.info("%sシャードを結合しました: %s (%s行)",
+                len(shards), output_file, len(merged))
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="--shard で分割翻訳した出力を元の行順で結合")
+    parser.add_argument('-i', '--input', required=True,
+                        help='分割前の入力ファイル（ハッシュ照合用）')
+    parser.add_argument('-o', '--output', required=True, help='結合後の出力ファイル')
+    parser.add_argument('--no-preview', action='store_true',
+                        help='HTMLプレビューを生成しない')
+    parser.add_argument('shards', nargs='+', help='各シャードの出力ファイル')
+
+    args = parser.parse_args()
+
+    try:
+        merged = merge_shards(args.input, args.shards, args.output)
+    except (ValueError, OSError) as e:
+        logger.error("結合に失敗しました: %s", e)
+        exit(1)
+
+    # 用語集変更時の再翻訳判定に使う用語記録も結合
+    if merge_term_records(args.shards, args.output):
+        logger.info("シャードの用語記録を結合しました")
+
+    if not args.no_preview:
+        preview_file = f"{os.path.splitext(args.output)[0]}_preview.html"
+        generate_html_preview(merged, preview_file)
+        logger.info("HTMLプレビューを生成しました: %s", preview_file)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s]: %(message)s')
+    main()
@@ -0,0 +1,116 @@
+import re
+import logging
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# マスク対象のマークアップ（連続するタグはまとめて1つのプレースホルダーにする）
+MARKUP_PATTERN = re.compile(
+    r'(?:\[c\]\[[0-9A-Fa-f]{6}\]'     # カラータグ開始
+    r'|\[-\]\[/c\]'                   # カラータグ終了
+    r'|\[/?(?:u|i|b|sup)\]'           # 装飾タグ
+    r'|</?(?:i|b)>'                   # HTML形式の装飾タグ
+    r'|<color=#[0-9A-Fa-f]+>|</color>'
+    r'|<size=\d+>|</size>'            # サイズタグ
+    r'|\[NLINE\]'                     # 改行の一時コード
+    r'|\\n'                           # 改行コード
+    r'|@[a-z]\d+'                     # 読み上げ記号 (@p9, @w4 等)
+    r')+'
+)
+
+PLACEHOLDER_PATTERN = re.compile(r'\{(\d+)\}')
+
+# マスク済みテキストを送る際にプロンプトへ追加するルール
+PLACEHOLDER_RULE = "{1} のような波括弧の番号はタグの代わりです。番号を変えず、すべてそのまま残してください"
+
+
+class TagMask:
+    """タグをプレースホルダーに置換したテキストと元のタグ"""
+
+    def __init__(self, text: str, tags: list[str]):
+        self.text = text
+        self.tags = tags
+
+    def restore(self, translated: str) -> Optional[str]:
+        """プレースホルダーを元のタグに戻す（欠落・重複があればNone）"""
+        found = Counter(PLACEHOLDER_PATTERN.findall(translated))
+        expected = Counter(str(i) for i in range(1, len(self.tags) + 1))
+        if found != expected:
+            return None
+
+        return PLACEHOLDER_PATTERN.sub(
+            lambda match: self.tags[int(match.group(1)) - 1], translated)
+
+
+def mask_tags(text: str) -> Optional[TagMask]:
+    """マークアップを {1}, {2}, ... に置換（元テキストに波括弧の番号があればNone）"""
+    if PLACEHOLDER_PATTERN.search(text):
+        return None
+
+    tags = []
+
+    def replace(match):
+        tags.append(match.group(0))
+        return f"{{{len(tags)}}}"
+
+    masked_text = MARKUP_PATTERN.sub(replace, text)
+    if tags:
+        logger.debug("タグマスク: %s個 (%s文字 → %s文字)",
+                     len(tags), len(text), len(masked_text))
+    return TagMask(masked_text, tags)
+
+
+def mask_example(source: str, target: str) -> Optional[tuple[str, str]]:
+    """翻訳例の英語と日本語を同じ番号のプレースホルダーに置換
+
+    日本語側のタグは英語側の同じタグの番号に置き換える。英語側にないタグが
+    あるなど対応が取れない場合はNoneを返す。
+    """
+    source_mask = mask_tags(source)
+    if source_mask is None or PLACEHOLDER_PATTERN.search(target):
+        return None
+
+    numbers = {}
+    for number, tag in enumerate(source_mask.tags, 1):
+        numbers.setdefault(tag, []).append(number)
+    unmatched = []
+
+    def replace(match):
+        candidates = numbers.get(match.group(0))
+        if not candidates:
+            unmatched.append(match.group(0))
+            return match.group(0)
+        return f"{{{candidates.pop(0)}}}"
+
+    masked_target = MARKUP_PATTERN.sub(replace, target)
+    if unmatched:
+        return None
+    return source_mask.text, masked_target
+
+
+def mask_examples(examples: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """翻訳例をプレースホルダー表記に揃える（対応が取れない例は除く）"""
+    masked = []
+    for source, target in examples:
+        pair = mask_example(source, target)
+        if pair is not None:
+            masked.append(pair)
+    return masked
+
+
+if __name__ == "__main__":
+    # テスト用
+    test_cases = [
+        "Locate [c][eeff00]bridge[-][/c]",
+        "[b]Warning:[/b] @p9 Check the <size=14>[c][ff0000]reactor[-][/c]</size>\\n\\nNow!",
+        "通常のテキスト",
+    ]
+
+    logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s]: %(message)s')
+
+    for i, test in enumerate(test_cases, 1):
+        print(f"\nテスト{i}: {test}")
+        mask = mask_tags(test)
+        print(f"マスク後: {mask.text}")
+        print(f"復元: {mask.restore(mask.text)}")
@@ -64,8 +64,8 @@ def check_translation_tags(text: str, line_no: Optional[int] = None):
     errors = validate_tags(text, line_no)
 
     for error in errors:
-        logger.warning(f"タグ検証: {error}")
-        logger.warning(f"対象テキスト: {text.strip()}")
+        logger.warning("タグ検証: %s", error)
+        logger.warning("対象テキスト: %s", text.strip())
 
     return len(errors) == 0
 
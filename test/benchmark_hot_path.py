@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+行ごとに実行される正規表現処理のマイクロベンチマーク
+
+validate_tags / fix_color_tags / format_punctuation / parse_game_text /
+processor_words / filter_glossary_for_text を実際のEmpyrionの文字列で計測し、
+10万件の翻訳メモリの検索（TranslationMemory.search）と合わせて、1行あたりの時間(ns)と
+1回の呼び出しで確保されるメモリのピーク(B)を基準値と比較する。
+時間は各関数と交互に計測した較正用の処理（正規表現と文字列処理）の時間との比で比較し、
+マシンの速度や負荷の違いを打ち消す。
+基準値より遅くなった（またはメモリ確保が増えた）関数があれば終了コード1を返す。
+
+    python test/benchmark_hot_path.py                     # 基準値と比較
+    python test/benchmark_hot_path.py --update-baseline   # 基準値を更新
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(REPO_DIR)
+
+from tag_validator import validate_tags
+from color_tag_fixer import fix_color_tags
+from punctuation_formatter import format_punctuation
+from text_preview import parse_game_text
+from ollama_translate import (processor_words, read_processor_words,
+                              filter_glossary_for_text, load_glossary)
+from translation_memory import TranslationMemory
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'benchmark_baseline.json')
+
+# 基準値からの許容する遅延の割合
+DEFAULT_TOLERANCE = 0.3
+
+# 1回の計測の目安時間（秒）と繰り返し回数（最小値を採用）
+TARGET_SECONDS = 0.2
+REPEAT = 5
+
+# 英語（翻訳前）の行
+SOURCE_LINES = [
+    "Equipped:",
+    "Locate [c][eeff00]bridge[-][/c]",
+    "[c][ff0000]<size=18>[b]WARNING[/b]</size>[-][/c] Hull breach detected!",
+    "@p9 Commander, @w4 the [c][00ff00]Talon[-][/c] outpost is under attack.",
+    "Now I only need to find the [c][fbff00]Bridge Logs[-][/c].\\n\\n"
+    "I better check my weapons. This place is much too silent for so many "
+    "lost souls yet no bodies...",
+    "[IDA] Welcome aboard. Please proceed to the [c][00ccff]Medical Bay[-][/c]"
+    " for your [i]mandatory[/i] check-up.\\nThank you for your cooperation.",
+    ("Day 47: The [c][ff9900]Zirax[-][/c] patrols have doubled since the "
+     "incident at <size=14>[u]Sector 7[/u]</size>. We lost contact with the "
+     "mining crew on Ningues three days ago. Supplies: 1,250 units of "
+     "[c][aaaaaa]Iron Ore[-][/c], 300 [c][aaaaaa]Copper[-][/c].\\n\\n") * 3,
+]
+
+# 日本語（翻訳後）の行（タグの誤り・句読点の整形対象を含む）
+TRANSLATED_LINES = [
+    "装備:",
+    "[c][eeff00]ブリッジ[-][/c]を探す",
+    "[c][ff0000]<size=18>[b]警告[/b]</size>[-][/c] 船体に穴が開いています！",
+    "@p9 司令官, @w4 [c][00ff00]タロン[/c]の前哨基地が攻撃を受けています.",
+    "これで, [c][fbff00]ブリッジのログ[-][/c]を見つけるだけだ.\\n\\n"
+    "武器を確認したほうがいい.ここは失われた魂が多いのに,静かすぎる...",
+    "[IDA] ようこそ.[c][00ccff]医務室[-][/c]で[i]必須の[/i]健康診断を"
+    "受けてください.\\nご協力ありがとうございます.",
+    ("47日目: [c][ff9900]Zirax[-][/c]の巡回は<size=14>[u]セクター7[/u]</size>"
+     "の事件以来2倍になった.3日前にNinguesの採掘班と連絡が途絶えた.物資:"
+     "[c][aaaaaa]鉄鉱石[-][/c] 1,250ユニット,[c][aaaaaa]銅[/c] 300.\\n\\n") * 3,
+]
+
+POSTPROCESSOR_WORDS = read_processor_words(
+    os.path.join(REPO_DIR, 'postprocessor_words.tsv'))
+GLOSSARY = load_glossary(os.path.join(REPO_DIR, 'deepl_glossary_empyrion.json'))
+
+# 翻訳メモリの件数（ランダムな単語列の英語）
+TRANSLATION_MEMORY_SIZE = 100000
+
+
+def random_sentences(count: int, seed: int = 0) -> list[str]:
+    """5000語からランダムに2〜20語を並べた文"""
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz')
+                     for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(2, 20)))
+            for _ in range(count)]
+
+
+TM_LINES = random_sentences(TRANSLATION_MEMORY_SIZE)
+TRANSLATION_MEMORY = TranslationMemory((line, line) for line in TM_LINES)
+# 1語を除いた既存の文（類似例あり）と、ランダムな文（類似例なし）
+TM_QUERIES = ([line.rsplit(' ', 1)[0] for line in TM_LINES[:50]] +
+              random_sentences(50, seed=1))
+
+BENCHMARKS = {
+    'validate_tags': (validate_tags, TRANSLATED_LINES),
+    'fix_color_tags': (fix_color_tags, TRANSLATED_LINES),
+    'format_punctuation': (lambda text: format_punctuation(text, None),
+                           TRANSLATED_LINES),
+    'parse_game_text': (parse_game_text, TRANSLATED_LINES),
+    'processor_words': (lambda text: processor_words(text, POSTPROCESSOR_WORDS),
+                        TRANSLATED_LINES + SOURCE_LINES),
+    'filter_glossary_for_text': (
+        lambda text: filter_glossary_for_text(text, GLOSSARY), SOURCE_LINES),
+    'translation_memory_search': (TRANSLATION_MEMORY.search, TM_QUERIES),
+}
+
+
+def calibration(text: str) -> list[str]:
+    """較正用の処理（計測対象と同じく正規表現・文字列処理が中心）"""
+    text = re.sub(r'\[[^\]]*\]|<[^>]*>', '', text)
+    return [word.strip('.,!?') for word in text.lower().split()]
+
+
+def count_loops(func, lines: list[str]) -> int:
+    """1回の計測が目安時間に達する繰り返し回数"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            for line in lines:
+                func(line)
+        if time.perf_counter() - start >= TARGET_SECONDS / REPEAT:
+            return loops
+        loops *= 2
+
+
+def time_per_line(func, lines: list[str]) -> tuple[float, float]:
+    """(1行あたりの処理時間(ns), 較正用の処理の1行あたりの時間(ns))
+
+    計測対象と較正用の処理を交互に繰り返し、それぞれの最小値を採用する
+    （マシンの負荷の変動を両方がほぼ同じだけ受ける）。
+    """
+    calibration_lines = SOURCE_LINES + TRANSLATED_LINES
+    targets = [(func, lines, count_loops(func, lines)),
+               (calibration, calibration_lines,
+                count_loops(calibration, calibration_lines))]
+    best = [float('inf')] * len(targets)
+    for _ in range(REPEAT):
+        for i, (target, target_lines, loops) in enumerate(targets):
+            start = time.perf_counter()
+            for _ in range(loops):
+                for line in target_lines:
+                    target(line)
+            best[i] = min(best[i], (time.perf_counter() - start) /
+                          (loops * len(target_lines)) * 1e9)
+    return best[0], best[1]
+
+
+def peak_bytes_per_call(func, lines: list[str]) -> int:
+    """1回の呼び出しで一時的に確保されるメモリの最大値(B)"""
+    func(lines[0])  # 正規表現のコンパイル・キャッシュを除く
+    tracemalloc.start()
+    try:
+        peak = 0
+        for line in lines:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func(line)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks() -> dict:
+    # 修正・整形時のINFOログは計測対象外
+    logging.disable(logging.CRITICAL)
+    results = {}
+    for name, (func, lines) in BENCHMARKS.items():
+        ns_per_line, calibration_ns = time_per_line(func, lines)
+        results[name] = {
+            'ns_per_line': round(ns_per_line),
+            'calibration_ns': round(calibration_ns),
+            'peak_bytes': peak_bytes_per_call(func, lines),
+        }
+    logging.disable(logging.NOTSET)
+    return results
+
+
+def relative_time(result: dict) -> float:
+    """較正用の処理の時間に対する比"""
+    return result['ns_per_line'] / result['calibration_ns']
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """基準値と比較して表を出力し、遅くなった関数名のリストを返す
+
+    「比」は較正用の処理の時間で補正した基準値との比
+    （較正用の時間を記録していない古い基準値とは ns/行 をそのまま比較）。
+    """
+    regressions = []
+    print(f"{'関数':24} {'ns/行':>10} {'基準':>10} {'比':>6} {'ピークB':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base:
+            if 'calibration_ns' in base:
+                ratio = relative_time(result) / relative_time(base)
+            else:
+                ratio = result['ns_per_line'] / base['ns_per_line']
+            mark = ''
+            if (ratio > 1 + tolerance or
+                    result['peak_bytes'] > base['peak_bytes'] * (1 + tolerance)):
+                regressions.append(name)
+                mark = ' ❌'
+            print(f"{name:24} {result['ns_per_line']:>10} "
+                  f"{base['ns_per_line']:>10} {ratio:>6.2f} "
+                  f"{result['peak_bytes']:>8}{mark}")
+        else:
+            print(f"{name:24} {result['ns_per_line']:>10} {'-':>10} {'-':>6} "
+                  f"{result['peak_bytes']:>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="行ごとの正規表現処理のベンチマーク")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='計測結果を基準値として保存')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='許容する遅延の割合（0.3で30%%まで）')
+    args = parser.parse_args()
+
+    results = run_benchmarks()
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'results': results}, f, ensure_ascii=False, indent=1)
+        print(f"\n基準値を更新しました: {BASELINE_FILE}")
+        return
+
+    if baseline and baseline.get('python') != platform.python_version():
+        print(f"\n※基準値は Python {baseline.get('python')} で計測されています")
+    if regressions:
+        print(f"\n❌ 基準値より{args.tolerance:.0%}以上遅く（またはメモリ確保が多く）なりました: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ 基準値からの性能低下はありません")
+
+
+if __name__ == "__main__":
+    main()
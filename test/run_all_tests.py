@@ -32,7 +32,31 @@ def main():
     tests = [
         "test_path_traversal.py",
         "test_log_injection.py", 
-        "test_xss_vulnerability.py"
+        "test_xss_vulnerability.py",
+        "test_incremental.py",
+        "test_tag_masking.py",
+        "test_sharding.py",
+        "test_glossary_tracking.py",
+        "test_segmenter.py",
+        "test_cassette.py",
+        "test_qa.py",
+        "test_content_filter.py",
+        "test_progress.py",
+        "test_dry_run.py",
+        "test_profiling.py",
+        "test_translation_memory.py",
+        "test_tm_store.py",
+        "test_glossary_filter.py",
+        "test_quality_gate.py",
+        "test_csv_localization.py",
+        "test_scheduler.py",
+        "test_async_pipeline.py",
+        "test_fast_path.py",
+        "test_reasoning.py",
+        "test_diff_dedup.py",
+        "test_log_config.py",
+        "test_warmup.py",
+        "test_repair.py"
     ]
     
     results = {}
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+非同期パイプラインのテスト
+"""
+import asyncio
+import os
+import sys
+import threading
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from async_pipeline import run_pipeline
+
+
+def run(source, translate, finalize=None, write=None, priority=None,
+        concurrency=1, queue_size=4):
+    """スタブのステージでパイプラインを実行し、(書き出し結果, 統計, 残タスク) を返す"""
+    written = []
+
+    async def main():
+        stats = await run_pipeline(
+            source, priority or (lambda unit: 0), translate,
+            finalize or (lambda unit, result: (unit, result)),
+            write or written.append, concurrency, queue_size)
+        # 全ステージのタスクが終了していること
+        pending = [task for task in asyncio.all_tasks()
+                   if task is not asyncio.current_task()]
+        return stats, pending
+
+    stats, pending = asyncio.run(main())
+    return written, stats, pending
+
+
+def test_priority_order():
+    """優先度の小さい作業単位から、同じ優先度は投入順に翻訳する"""
+    translated = []
+
+    async def translate(unit):
+        translated.append(unit)
+        await asyncio.sleep(0)
+        return unit * 10
+
+    written, stats, pending = run(range(8), translate,
+                                  priority=lambda unit: unit % 2,
+                                  queue_size=16)
+    print(f"翻訳順: {translated}")
+    assert translated == [0, 2, 4, 6, 1, 3, 5, 7]
+    assert written == [(unit, unit * 10) for unit in translated]
+    assert stats.stages['write'].items == 8
+    assert pending == []
+
+
+def test_finalize_runs_in_thread():
+    """finalize はイベントループとは別のスレッドで実行し、全件を書き出す"""
+    loop_thread = threading.get_ident()
+    finalize_threads = set()
+
+    async def translate(unit):
+        await asyncio.sleep(0.001 * (unit % 3))
+        return unit
+
+    def finalize(unit, result):
+        finalize_threads.add(threading.get_ident())
+        return result
+
+    written, stats, pending = run(range(20), translate, finalize,
+                                  concurrency=3, queue_size=2)
+    assert sorted(written) == list(range(20))
+    assert loop_thread not in finalize_threads
+    assert stats.queues['translate'].max_depth <= 2
+    assert pending == []
+
+
+def test_source_runs_in_thread():
+    """作業単位の生成（prepare）もイベントループとは別のスレッドで実行する"""
+    loop_thread = threading.get_ident()
+    source_threads = set()
+
+    def source():
+        for unit in range(10):
+            source_threads.add(threading.get_ident())
+            yield unit
+
+    async def translate(unit):
+        return unit
+
+    written, stats, pending = run(source(), translate, queue_size=3)
+    assert sorted(unit for unit, _ in written) == list(range(10))
+    assert loop_thread not in source_threads
+    assert stats.stages['prepare'].items == 10
+    assert pending == []
+
+
+def assert_pipeline_raises(error, translate, finalize):
+    async def main():
+        await asyncio.wait_for(run_pipeline(
+            range(100), lambda unit: 0, translate, finalize,
+            lambda output: None, 2, 2), timeout=5)
+
+    try:
+        asyncio.run(main())
+    except error as e:
+        print(f"送出された例外: {e!r}")
+    else:
+        raise AssertionError(f"{error.__name__} が送出されていません")
+
+
+def test_stage_error_propagates():
+    """ステージで発生した例外は run_pipeline から送出し、他のステージも停止する"""
+    async def translate(unit):
+        await asyncio.sleep(0)
+        if unit == 3:
+            raise RuntimeError("translate failed")
+        return unit
+
+    def finalize(unit, result):
+        if unit == 5:
+            raise ValueError("finalize failed")
+        return result
+
+    assert_pipeline_raises(RuntimeError, translate,
+                           lambda unit, result: result)
+
+    async def translate_all(unit):
+        await asyncio.sleep(0)
+        return unit
+
+    assert_pipeline_raises(ValueError, translate_all, finalize)
+
+
+def test_empty_source():
+    """作業単位がなくても終端を送って正常に終了する"""
+    async def translate(unit):
+        return unit
+
+    written, stats, pending = run([], translate, concurrency=4)
+    assert written == []
+    assert stats.stages['translate'].items == 0
+    assert pending == []
+
+
+if __name__ == "__main__":
+    test_priority_order()
+    test_finalize_runs_in_thread()
+    test_source_runs_in_thread()
+    test_stage_error_propagates()
+    test_empty_source()
+    print("\n✅ 非同期パイプラインのテストが完了しました")
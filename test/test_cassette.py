@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+応答の記録・再生（カセット）のテスト
+"""
+import os
+import sys
+import types
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ollama_diff_translate
+from cassette import Cassette, CassetteMiss
+from ollama_client import runtime_settings
+
+
+def make_request(text: str, num_gpu: int = 10) -> dict:
+    return {
+        'model': 'gpt-oss:20b',
+        'messages': [{'role': 'user', 'content': text}],
+        'options': {'num_ctx': 4096, 'num_gpu': num_gpu},
+        'keep_alive': '30m',
+        'think': 'low',
+    }
+
+
+def test_record_and_replay(tmp_path):
+    """記録した応答が記録順に、所要時間/倍速の待ち時間で再生される"""
+    path = str(tmp_path / "cassette.jsonl.gz")
+    cassette = Cassette(path, 'record')
+    for content in ["一回目", "二回目"]:
+        response = {'message': {'role': 'assistant', 'content': content},
+                    'eval_count': 5}
+        cassette.record(make_request("Hello"), response, 0.4)
+    cassette.close()
+
+    cassette = Cassette(path, 'replay', speed=2.0)
+    # num_gpu はマシンごとに異なるため照合に使わない
+    first, delay = cassette.lookup(make_request("Hello", num_gpu=0))
+    second, _ = cassette.lookup(make_request("Hello"))
+    third, _ = cassette.lookup(make_request("Hello"))
+    print(f"再生: {first['message']['content']}, {second['message']['content']}, "
+          f"{third['message']['content']} (待ち時間 {delay}秒)")
+
+    assert first['message']['content'] == "一回目"
+    assert second['message']['content'] == third['message']['content'] == "二回目"
+    assert delay == 0.2
+    assert first['eval_count'] == 5
+
+
+def test_replay_miss(tmp_path):
+    """記録にないリクエストは CassetteMiss"""
+    path = str(tmp_path / "cassette.jsonl")
+    Cassette(path, 'record').close()
+
+    try:
+        Cassette(path, 'replay').lookup(make_request("Unknown"))
+    except CassetteMiss as e:
+        print(f"未記録: {e}")
+        return
+    raise AssertionError("未記録のリクエストが再生されました")
+
+
+def run_diff_translate(argv: list[str], chat=None):
+    """ollama_diff_translate.main() を実行（chat を指定すると ollama.chat を差し替える）"""
+    original_argv = sys.argv
+    original_module = sys.modules.get('ollama')
+    original_setup_logging = ollama_diff_translate.setup_logging
+    original_settings = dict(runtime_settings)
+    sys.argv = ['ollama_diff_translate.py', '--no-warmup',
+                '--progress-interval', '0'] + argv
+    if chat is not None:
+        sys.modules['ollama'] = types.SimpleNamespace(chat=chat)
+    # pytest のログ出力を置き換えない
+    ollama_diff_translate.setup_logging = lambda *args: None
+    try:
+        ollama_diff_translate.main()
+    finally:
+        sys.argv = original_argv
+        if original_module is None:
+            sys.modules.pop('ollama', None)
+        else:
+            sys.modules['ollama'] = original_module
+        ollama_diff_translate.setup_logging = original_setup_logging
+        runtime_settings.clear()
+        runtime_settings.update(original_settings)
+
+
+def test_diff_translate_record_and_replay(tmp_path):
+    """差分翻訳も記録・再生でき、途中で失敗しても記録済みの応答は残る"""
+    path = str(tmp_path / "cassette.jsonl.gz")
+    input_file = str(tmp_path / "diff.tsv")
+    output_file = str(tmp_path / "diff_out.tsv")
+    with open(input_file, 'w', encoding='utf-8') as f:
+        f.write("old\tnew\tjapanese\n"
+                "Locate bridge\tLocate the bridge now\tブリッジを探す\n"
+                "Open door\tOpen the hangar door\t扉を開ける\n")
+
+    def chat(**request):
+        if 'hangar' in request['messages'][0]['content']:
+            raise ConnectionError("Ollamaに接続できません")
+        return {'message': {'role': 'assistant',
+                            'content': "今すぐブリッジを探す"}}
+
+    try:
+        run_diff_translate(['-i', input_file, '-o', output_file,
+                            '--record', path], chat)
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("2行目の接続エラーが伝わっていません")
+
+    # 失敗した実行の記録も、1行目の応答を再生できる
+    with open(input_file, 'w', encoding='utf-8') as f:
+        f.write("old\tnew\tjapanese\n"
+                "Locate bridge\tLocate the bridge now\tブリッジを探す\n")
+    run_diff_translate(['-i', input_file, '-o', output_file,
+                        '--replay', path, '--replay-speed', '0'])
+    with open(output_file, 'r', encoding='utf-8') as f:
+        rows = f.read().splitlines()
+    print(f"再生結果: {rows}")
+    assert rows[1] == "Locate bridge\tLocate the bridge now\t今すぐブリッジを探す"
+    assert not os.path.exists(str(tmp_path / "throughput.json"))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_record_and_replay(Path(tmp_dir))
+        test_replay_miss(Path(tmp_dir))
+        test_diff_translate_record_and_replay(Path(tmp_dir))
+    print("\n✅ カセットのテストが完了しました")
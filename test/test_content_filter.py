@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+コンテンツフィルタ検出のテスト
+"""
+import os
+import re
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from content_filter_detector import (detect_content_filter, FILTER_PATTERNS,
+                                     FILTER_PATTERN, FIRST_CHARS, first_chars)
+
+CASES = [
+    ("The generated text has been blocked by our content filters.", 'blocked'),
+    ("I can’t assist with that request.", 'refusal'),
+    ("This violates our usage policy", 'policy'),
+    ("申し訳ありませんが、この文章の翻訳はできません。", 'refusal_ja'),
+    ("AIとして、そのような内容はお答えできません。", 'refusal_ja'),
+    ("申し訳ございませんが、AIアシスタントとしてこの内容には対応いたしかねます。",
+     'refusal_ja'),
+    ("この内容はコンテンツポリシーに違反しています。", 'policy_ja'),
+    ("申し訳ありませんが、ここは通せない。", None),  # ゲーム内のセリフ
+    ("申し訳ありませんが、そのご注文には対応できません。", None),
+    ("申し訳ございません。本日の営業は終了しました。ご提供できません。", None),
+    ("[c][fbff00]ブリッジのログ[-][/c]を見つけるだけだ。", None),
+]
+
+
+def test_categories():
+    """英語・日本語の拒否応答をカテゴリ付きで検出する"""
+    for text, expected in CASES:
+        category = detect_content_filter(text)
+        print(f"{text} → {category}")
+        assert category == expected
+
+
+def test_first_chars_cover_all_patterns():
+    """先頭文字の先読みで検出漏れが起きない"""
+    unfiltered = re.compile(
+        '|'.join(f"(?P<{category}>{pattern})"
+                 for category, pattern in FILTER_PATTERNS.items()),
+        re.IGNORECASE | re.DOTALL)
+    for text, _ in CASES:
+        plain = unfiltered.search(text)
+        fast = FILTER_PATTERN.search(text)
+        assert (plain and plain.lastgroup) == (fast and fast.lastgroup)
+
+
+def test_first_chars_derived_from_patterns():
+    """先読みの先頭文字はパターンから求め、求められない場合は先読みしない"""
+    assert first_chars(r"foo|(?:bar|[xy]z)") == {'f', 'b', 'x', 'y'}
+    assert first_chars(r".*foo") is None
+    assert first_chars(r"foo|\w+") is None
+    assert first_chars(r"[^a]b") is None
+    assert FIRST_CHARS == set().union(
+        *(first_chars(pattern) for pattern in FILTER_PATTERNS.values()))
+
+
+def test_long_line_does_not_backtrack():
+    """一致しない語の繰り返しでも長文で時間がかからない"""
+    text = "blocked content " * 300
+    start = time.perf_counter()
+    assert detect_content_filter(text) is None
+    elapsed = time.perf_counter() - start
+    print(f"{len(text)}文字: {elapsed * 1000:.2f}ms")
+    assert elapsed < 0.1
+
+
+if __name__ == "__main__":
+    test_categories()
+    test_first_chars_cover_all_patterns()
+    test_first_chars_derived_from_patterns()
+    test_long_line_does_not_backtrack()
+    print("\n✅ コンテンツフィルタ検出のテストが完了しました")
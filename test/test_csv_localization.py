@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Localization.csv の読み書きのテスト
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from csv_localization import CsvTranslator, iter_records, CsvRecord
+from incremental import line_hash
+
+
+class StubTranslator(CsvTranslator):
+    """LLMの代わりに英語の前に「訳:」を付ける"""
+
+    def __init__(self, previous_hashes=None, **options):
+        args = argparse.Namespace(key_column='KEY', source_column='English',
+                                  target_column='Japanese', chunk_size=2,
+                                  no_connection_check=True, no_warmup=True,
+                                  keep_alive='30m')
+        for name, value in options.items():
+            setattr(args, name, value)
+        super().__init__(args, {}, [], [], previous_hashes)
+        self.translated_lines = []
+
+    async def ensure_model_ready(self):
+        self.model_ready = True
+
+    async def translate_chunk(self, jobs):
+        self.translated_lines.extend(line for _, line in jobs)
+        return {line_no - 1: '訳:' + line for line_no, line in jobs}
+
+
+def run_translator(translator, content: str) -> str:
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, 'Localization.csv')
+        output_file = os.path.join(tmp, 'output.csv')
+        with open(input_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        asyncio.run(translator.run(input_file, output_file))
+        with open(output_file, 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+
+def test_round_trip_unchanged():
+    """翻訳しない行は引用符・セル内改行・エスケープされた引用符ごと元のまま"""
+    content = ('﻿KEY,English,Japanese\r\n'
+               'a,Hello,"こんにちは、世界"\r\n'
+               '"b","Say ""hi""\r\nnow","「やあ」と\r\n言う"\r\n'
+               '\r\n'
+               'c,Plain,訳済み')
+    translator = StubTranslator()
+    output = run_translator(translator, content)
+    assert output == content
+    assert translator.translated_lines == []
+    assert not translator.model_ready
+
+
+def test_translate_only_missing_cells():
+    """空セルのみ翻訳し、元の引用符の付け方を保つ"""
+    content = ('KEY,English,Japanese\n'
+               'a,"Hello, world",""\n'
+               'b,"Line one\nbroken",訳済み\n'
+               'c,Two\n')
+    output = run_translator(StubTranslator(), content)
+    print(f"出力: {output!r}")
+    assert output == ('KEY,English,Japanese\n'
+                      'a,"Hello, world","訳:Hello, world"\n'
+                      'b,"Line one\nbroken",訳済み\n'
+                      'c,Two,訳:Two\n')
+
+
+def test_embedded_newline_and_quotes():
+    """セル内の改行・引用符を含むセルを翻訳して正しく書き出す"""
+    content = ('KEY,English,Japanese\r\n'
+               'a,"Say ""go""\r\nnow",\r\n')
+    translator = StubTranslator()
+    output = run_translator(translator, content)
+    assert translator.translated_lines == ['Say "go"[NLINE]now']
+    assert output == ('KEY,English,Japanese\r\n'
+                      'a,"Say ""go""\r\nnow","訳:Say ""go""\nnow"\r\n')
+
+
+def test_stale_detection():
+    """前回から英語が変わった行だけ翻訳し直す"""
+    content = ('KEY,English,Japanese\n'
+               'a,Same,同じ\n'
+               'b,Changed,古い訳\n'
+               'c,New key,新しい\n')
+    translator = StubTranslator({'a': line_hash('Same'),
+                                 'b': line_hash('Original')})
+    output = run_translator(translator, content)
+    assert output.splitlines()[1:] == ['a,Same,同じ', 'b,Changed,訳:Changed',
+                                       'c,New key,新しい']
+    assert (translator.missing_count, translator.stale_count) == (0, 1)
+
+
+def test_append_target_column():
+    """日本語列がなければ末尾に追加して全行を翻訳する"""
+    content = ('"KEY","English"\n'
+               '"a","Hello"\n'
+               '"b"\n')
+    output = run_translator(StubTranslator(), content)
+    print(f"出力: {output!r}")
+    assert output == ('"KEY","English","Japanese"\n'
+                      '"a","Hello","訳:Hello"\n'
+                      '"b","",""\n')
+
+
+def test_iter_records():
+    """引用符内の改行では区切らない"""
+    records = list(iter_records(['a,"b\n', 'c",d\n', 'e\n']))
+    assert records == ['a,"b\nc",d\n', 'e\n']
+    assert CsvRecord(records[0]).values == ['a', 'b\nc', 'd']
+
+
+if __name__ == "__main__":
+    test_round_trip_unchanged()
+    test_translate_only_missing_cells()
+    test_embedded_newline_and_quotes()
+    test_stale_detection()
+    test_append_target_column()
+    test_iter_records()
+    print("\n✅ CSVの読み書きのテストが完了しました")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+差分翻訳の重複除去のテスト
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ollama_diff_translate
+from ollama_diff_translate import process_tsv_file
+
+
+def test_duplicates_fan_out():
+    """同じ新英語は1回だけ翻訳して全ての行に書き、翻訳内容が異なる行はまとめない"""
+    rows = [
+        ("Locate bridge", "Locate the bridge now", "ブリッジを探す"),
+        ("Find bridge", "Locate the bridge now", "ブリッジを見つける"),
+        ("Locate bridge", "Locate the Bridge now", "ブリッジを探す"),
+        ("Hello", "Locate the bridge now ", "こんにちは"),
+        ("Same", "Same", "同じ"),
+        ("Locate bridge", "Locate the bridge now", "ブリッジを探す"),
+    ]
+    requests = []
+
+    def fake_translate_line(text, glossary, casual_mode=False):
+        requests.append(text)
+        return f"翻訳{len(requests)}です"
+
+    original_translate_line = ollama_diff_translate.ollama_translate_line
+    ollama_diff_translate.ollama_translate_line = fake_translate_line
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            input_file = os.path.join(tmp, 'diff.tsv')
+            output_file = os.path.join(tmp, 'output.tsv')
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write("English_old\tEnglish\tJapanese_old\n")
+                f.writelines('\t'.join(row) + '\n' for row in rows)
+            process_tsv_file(input_file, output_file, {}, progress_interval=0)
+            with open(output_file, 'r', encoding='utf-8') as f:
+                results = [line.rstrip('\n').split('\t')[2]
+                           for line in f.readlines()[1:]]
+    finally:
+        ollama_diff_translate.ollama_translate_line = original_translate_line
+
+    print(f"リクエスト: {requests}")
+    print(f"結果: {results}")
+    # 大文字小文字・空白が異なる英語は別々に翻訳する
+    assert requests == ["Locate the bridge now", "Locate the Bridge now",
+                        "Locate the bridge now "]
+    assert results == ["翻訳1です", "翻訳1です", "翻訳2です", "翻訳3です", "同じ",
+                       "翻訳1です"]
+
+
+if __name__ == "__main__":
+    test_duplicates_fan_out()
+    print("\n✅ 差分翻訳の重複除去のテストが完了しました")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+ドライランの見積もりのテスト
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dry_run import (DryRunPlan, estimate_tokens, save_throughput,
+                     load_throughput, throughput_path)
+
+
+def test_estimate_from_recorded_throughput():
+    """記録した処理速度から所要時間・出力トークン数を見積もる"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # 出力ファイルと同じディレクトリに記録する
+        throughput_file = throughput_path(os.path.join(tmp, 'output.txt'))
+        assert throughput_file == os.path.join(tmp, 'throughput.json')
+        save_throughput('model-a', {
+            'seconds_per_char': {'short': 0.01, 'long': 0.02},
+            'parallelism': 2.0,
+            'output_tokens_per_char': 0.5,
+        }, {'concurrency': 2}, filename=throughput_file)
+        throughput = load_throughput('model-a', filename=throughput_file)
+        assert load_throughput('model-b', filename=throughput_file) is None
+
+    plan = DryRunPlan()
+    for text in ['a' * 50, 'b' * 600]:
+        plan.add_line(text)
+        plan.add_request(text, text)
+    # medium は実測がないため平均 0.015秒/文字 で代用
+    plan.add_line('c' * 200)
+
+    estimate = plan.estimate(throughput)
+    print(f"見積もり: {estimate}")
+    assert estimate['requests'] == 2
+    assert estimate['output_tokens'] == 325
+    assert abs(estimate['seconds'] - (50 * 0.01 + 600 * 0.02 + 200 * 0.015) / 2) < 1e-9
+    assert plan.estimate(None)['seconds'] is None
+
+
+def test_estimate_tokens():
+    """英数字は4文字で1トークン、日本語は1文字1トークンで概算"""
+    assert estimate_tokens('abcd' * 10) == 10
+    assert estimate_tokens('翻訳してください') == 8
+
+
+if __name__ == "__main__":
+    test_estimate_from_recorded_throughput()
+    test_estimate_tokens()
+    print("\n✅ ドライランの見積もりのテストが完了しました")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+LLMを使わない行のローカル確定のテスト
+"""
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fast_path import build_glossary_index, compile_glossary, resolve_locally
+
+GLOSSARY_INDEX = build_glossary_index({'Equipped:': '装備:', 'Bridge': 'ブリッジ'})
+
+
+def test_resolved_lines():
+    """空行・タグのみ・翻訳済み・用語集と完全一致する行はLLMに送らない"""
+    cases = [
+        ("   ", ("", 'empty')),
+        ("[c][ff0000]1,000[-][/c]", ("[c][ff0000]1,000[-][/c]", 'markup')),
+        ("<size=12>25%</size>", ("<size=12>25%</size>", 'markup')),
+        ("装備を確認してください", ("装備を確認してください", 'japanese')),
+        ("[c][ff0000]Zirax[-][/c]の基地を攻撃せよ",
+         ("[c][ff0000]Zirax[-][/c]の基地を攻撃せよ", 'japanese')),
+        ("equipped:", ("装備:", 'glossary')),
+        ("[b]Bridge[/b]", ("[b]ブリッジ[/b]", 'glossary')),
+    ]
+    for text, expected in cases:
+        result = resolve_locally(text, GLOSSARY_INDEX)
+        print(f"{text!r} → {result}")
+        assert result == expected
+
+
+def test_english_goes_to_model():
+    """英語が残る行は用語を含んでいてもLLMに送る（英語のまま出力しない）"""
+    for text in ["Locate bridge", "Bridge control", "Equipped: Laser",
+                 "Talon Guardian Orbital Laser Cannon の", "[b]Go to the Bridge[/b]",
+                 "A"]:
+        assert resolve_locally(text, GLOSSARY_INDEX) == (None, ''), text
+
+
+def test_compile_glossary_cache():
+    """同じ辞書・同じ内容には作成済みのものを返し、内容が違えば作り直す"""
+    glossary = {'Bridge': 'ブリッジ', 'Bridge Control': 'ブリッジ制御'}
+    matcher = compile_glossary(glossary)
+    assert compile_glossary(glossary) is matcher
+    assert compile_glossary(dict(glossary)) is matcher
+    assert matcher.filter(['bridge']) == glossary
+
+    # 破棄された辞書と同じ id の別内容の辞書でも古いデータを返さない
+    for i in range(20):
+        other = {f'Term{i}': f'用語{i}'}
+        assert compile_glossary(other).filter([f'term{i}']) == other
+        del other
+
+    glossary['Reactor'] = 'リアクター'
+    assert compile_glossary(glossary).filter(['reactor']) == {
+        'Reactor': 'リアクター'}
+
+    # 用語数が同じまま訳語だけをその場で書き換えても作り直す
+    glossary['Reactor'] = '反応炉'
+    assert compile_glossary(glossary).filter(['reactor']) == {
+        'Reactor': '反応炉'}
+
+
+if __name__ == "__main__":
+    test_resolved_lines()
+    test_english_goes_to_model()
+    test_compile_glossary_cache()
+    print("\n✅ ローカル確定のテストが完了しました")
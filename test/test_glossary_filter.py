@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+用語集フィルタ（コンパイル済みの照合用データ）のテスト
+"""
+import os
+import re
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fast_path import compile_glossary
+
+GLOSSARY = {
+    'Bridge': 'ブリッジ',
+    'Medical Bay': '医務室',
+    'Iron Ore': '鉄鉱石',
+    'Ore': '鉱石',
+    'Core': 'コア',
+    'Zirax': 'ジラックス',
+}
+
+
+def filter_by_scan(text: str, full_glossary: dict) -> dict:
+    """用語ごとに全単語を調べる（コンパイル前の実装）"""
+    words_in_text = set(re.findall(r'\b[A-Za-z]+\b', text.lower()))
+    return {en_term: ja_term for en_term, ja_term in full_glossary.items()
+            if en_term.lower() in words_in_text or
+            any(word in en_term.lower() for word in words_in_text)}
+
+
+def test_same_as_scan():
+    """単語を含む用語を、用語集の順で、全用語を調べた場合と同じだけ返す"""
+    matcher = compile_glossary(GLOSSARY)
+    for text in ["Locate the bridge", "Mine [c][aaaaaa]iron ore[-][/c] and CORE",
+                 "The Zirax are at the medical bay", "a", "", "123 !?"]:
+        words = set(re.findall(r'\b[A-Za-z]+\b', text.lower()))
+        filtered = matcher.filter(words)
+        print(f"{text!r} → {filtered}")
+        assert list(filtered.items()) == list(filter_by_scan(text, GLOSSARY).items())
+
+    assert list(matcher.filter({'ore'})) == ['Iron Ore', 'Ore', 'Core']
+
+
+def test_recompiled_when_glossary_changes():
+    """同じ辞書は作成済みのものを使い、内容が変わると作り直す"""
+    glossary = dict(GLOSSARY)
+    matcher = compile_glossary(glossary)
+    assert compile_glossary(glossary) is matcher
+
+    glossary['Talon'] = 'タロン'
+    assert compile_glossary(glossary).filter({'talon'}) == {'Talon': 'タロン'}
+
+
+if __name__ == "__main__":
+    test_same_as_scan()
+    test_recompiled_when_glossary_changes()
+    print("\n✅ 用語集フィルタのテストが完了しました")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+用語集変更時の再翻訳判定のテスト
+"""
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from glossary_tracking import TermRecord, GlossaryInvalidator, diff_glossary
+
+
+def match_terms(text: str, glossary: dict) -> dict:
+    """テスト用の単純な用語抽出"""
+    return {en: ja for en, ja in glossary.items() if en.lower() in text.lower()}
+
+
+def test_diff_glossary():
+    """変更・削除と追加の検出"""
+    old = {'Neodymium': 'ネオジム', 'Iron': '鉄', 'Gold': '金'}
+    new = {'Neodymium': 'ネオジウム', 'Iron': '鉄', 'Copper': '銅'}
+    changed, added = diff_glossary(old, new)
+    assert changed == {'Neodymium', 'Gold'}
+    assert added == {'Copper': '銅'}
+
+
+def test_only_affected_lines_invalidated():
+    """変更された用語を使った行と、追加された用語に該当する行のみ再翻訳"""
+    old_glossary = {'Neodymium': 'ネオジム', 'Iron': '鉄'}
+    record = TermRecord(old_glossary)
+    lines = ["Neodymium ore", "Iron ore", "Copper ore", "Hello"]
+    for line in lines:
+        record.record(line, match_terms(line, old_glossary))
+
+    new_glossary = {'Neodymium': 'ネオジウム', 'Iron': '鉄', 'Copper': '銅'}
+    invalidator = GlossaryInvalidator(record, new_glossary, match_terms)
+    affected = [line for line in lines if invalidator.is_affected(line, line)]
+    print(f"再翻訳対象: {affected}")
+
+    assert affected == ["Neodymium ore", "Copper ore"]
+    # 記録のない行は安全側で再翻訳
+    assert invalidator.is_affected("Unknown line", "Unknown line")
+
+
+def test_no_record_keeps_previous():
+    """用語記録がなければ従来どおり全て再利用"""
+    invalidator = GlossaryInvalidator(None, {'Iron': '鉄'}, match_terms)
+    assert not invalidator.is_affected("Iron ore", "Iron ore")
+
+
+if __name__ == "__main__":
+    test_diff_glossary()
+    test_only_affected_lines_invalidated()
+    test_no_record_keeps_previous()
+    print("\n✅ 用語集変更時の再翻訳判定のテストが完了しました")
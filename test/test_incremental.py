@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+差分モード（前回リリースとの行対応付け）のテスト
+"""
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from incremental import align_lines, build_diff_rows, line_hash
+
+
+def test_align_lines():
+    """変更なし・変更・新規の判定"""
+    old_lines = ["Hello", "Locate bridge", "Keep"]
+    new_lines = ["Hello", "Locate [c][eeff00]bridge[-][/c]", "Keep", "New"]
+
+    alignment = align_lines(old_lines, new_lines)
+    print(f"対応付け: {alignment}")
+
+    assert alignment == [
+        ('equal', 0), ('replace', 1), ('equal', 2), ('insert', None)
+    ]
+
+
+def test_line_hash_ignores_newline():
+    """改行・前後の空白はハッシュに影響しない"""
+    assert line_hash("Hello\n") == line_hash("Hello")
+    assert line_hash("Hello") != line_hash("hello")
+
+
+def test_build_diff_rows(tmp_path):
+    """差分TSV用の行抽出"""
+    old_source = tmp_path / "old_en.txt"
+    old_output = tmp_path / "old_ja.txt"
+    new_source = tmp_path / "new_en.txt"
+    old_source.write_text("Hello\nLocate bridge\nKeep\n", encoding='utf-8')
+    old_output.write_text("こんにちは\nブリッジを探す\n保持\n", encoding='utf-8')
+    # 行の移動のみの場合は変更扱いにしない
+    new_source.write_text("Keep\nHello\nLocate [c][eeff00]bridge[-][/c]\n",
+                          encoding='utf-8')
+
+    rows = build_diff_rows(str(old_source), str(old_output), str(new_source))
+    print(f"差分行: {rows}")
+
+    assert rows == [("Locate bridge", "Locate [c][eeff00]bridge[-][/c]",
+                     "ブリッジを探す")]
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_align_lines()
+    test_line_hash_ignores_newline()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_build_diff_rows(Path(tmp_dir))
+    print("\n✅ 差分モードのテストが完了しました")
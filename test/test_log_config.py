@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+ログ設定（別スレッドでの出力・QAログ）のテスト
+"""
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import log_config
+from log_config import setup_logging, stop_logging
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+class RootLoggerState:
+    """テスト後にルートロガーのハンドラー・レベルを元に戻す"""
+
+    def __enter__(self):
+        root_logger = logging.getLogger()
+        self.handlers = root_logger.handlers[:]
+        self.level = root_logger.level
+
+    def __exit__(self, *exc_info):
+        stop_logging()
+        root_logger = logging.getLogger()
+        root_logger.handlers[:] = self.handlers
+        root_logger.setLevel(self.level)
+
+
+def test_qa_log_is_opt_in():
+    """--qa-log を指定しなければカレントディレクトリにファイルを作らない"""
+    with tempfile.TemporaryDirectory() as tmp, RootLoggerState():
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            setup_logging('INFO')
+            logging.getLogger('test').warning("タグ検証: 不一致")
+            stop_logging()
+            assert os.listdir(tmp) == []
+        finally:
+            os.chdir(cwd)
+
+
+def test_stop_flushes_and_stops_listener():
+    """停止時にキューに残った警告を書き出し、リスナースレッドを終了する"""
+    with tempfile.TemporaryDirectory() as tmp, RootLoggerState():
+        qa_log = os.path.join(tmp, 'qa.log')
+        setup_logging('INFO', qa_log)
+        listener = log_config._listener
+        logger = logging.getLogger('test')
+        for i in range(100):
+            logger.warning("行%s: 英語のまま残っています", i)
+        logger.info("QAログには書かない")
+        stop_logging()
+
+        assert log_config._listener is None
+        assert listener._thread is None
+        with open(qa_log, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    assert len(lines) == 100
+    assert lines[-1].endswith("test: 行99: 英語のまま残っています")
+
+
+def test_flush_on_exit():
+    """stop_logging を呼ばずに終了しても、残ったログを書き出す"""
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_log = os.path.join(tmp, 'qa.log')
+        script = ("import logging, log_config\n"
+                  f"log_config.setup_logging('INFO', {qa_log!r})\n"
+                  "for i in range(500):\n"
+                  "    logging.getLogger('exit').warning('警告%s', i)\n")
+        result = subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=30)
+        assert result.returncode == 0, result.stderr
+        with open(qa_log, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    assert len(lines) == 500
+    assert result.stderr.splitlines()[-1] == '[WARNING]: 警告499'
+
+
+if __name__ == "__main__":
+    test_qa_log_is_opt_in()
+    test_stop_flushes_and_stops_listener()
+    test_flush_on_exit()
+    print("\n✅ ログ設定のテストが完了しました")
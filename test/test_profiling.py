@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+ステージ別プロファイルのテスト
+"""
+import asyncio
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import content_filter_detector
+import quality_gate
+from profiling import StageTimers, instrument_stages
+
+
+def test_instrument_imported_functions():
+    """インポート先のモジュールの名前も置き換え、元に戻せる"""
+    original = content_filter_detector.detect_content_filter
+
+    timers = StageTimers()
+    restore = instrument_stages([original], timers)
+    try:
+        assert quality_gate.detect_content_filter is not original
+        quality_gate.check_final_translation("翻訳済みのテキストです")
+        content_filter_detector.detect_content_filter("翻訳済み")
+    finally:
+        restore()
+
+    assert quality_gate.detect_content_filter is original
+    assert timers.stats['detect_content_filter'][0] == 2
+    print(f"計測結果: {timers.stats}")
+
+
+def test_async_stage():
+    """非同期関数は await の完了までを計測する"""
+    timers = StageTimers()
+    module = sys.modules[__name__]
+
+    async def stage():
+        await asyncio.sleep(0.01)
+        return 'done'
+
+    module.stage = stage
+    restore = instrument_stages([stage], timers)
+    try:
+        assert asyncio.run(module.stage()) == 'done'
+    finally:
+        restore()
+        del module.stage
+
+    calls, seconds = timers.stats['stage']
+    assert calls == 1 and seconds >= 0.01
+
+
+if __name__ == "__main__":
+    test_instrument_imported_functions()
+    test_async_stage()
+    print("\n✅ ステージ別プロファイルのテストが完了しました")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+進捗・残り時間の推定のテスト
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from progress import ProgressReporter
+
+
+def test_eta_weighted_by_class_and_parallelism():
+    """残り時間は長さクラス別の1文字あたりの時間と並行度から求める"""
+    texts = ['a' * 50] * 4 + ['b' * 600] * 2
+    progress = ProgressReporter(texts, interval=0, stream=io.StringIO())
+
+    # short 2行を1リクエストで 1秒、long 1行を 6秒
+    progress.record([0, 1], 1.0)
+    progress.record([4], 6.0)
+    progress.skip(2)
+
+    # short 50文字 × 0.01秒 + long 600文字 × 0.01秒 を並行度 3.5 で割る
+    eta = progress.estimate_remaining(elapsed=2.0)
+    print(f"推定残り時間: {eta:.3f}秒")
+    assert abs(eta - (50 * 0.01 + 600 * 0.01) / 3.5) < 1e-9
+
+
+def test_status_file():
+    """状態ファイルは他のツールから読めるJSONで書き出す"""
+    stream = io.StringIO()
+    with tempfile.TemporaryDirectory() as tmp:
+        status_file = os.path.join(tmp, 'status.json')
+        with ProgressReporter(['text'] * 3, status_file, interval=0,
+                              stream=stream) as progress:
+            progress.skip(0)
+            progress.record([1, 2], 0.5)
+        with open(status_file, 'r', encoding='utf-8') as f:
+            status = json.load(f)
+
+    print(stream.getvalue())
+    assert status['state'] == 'done'
+    assert (status['completed'], status['total'], status['skipped']) == (3, 3, 1)
+    assert status['eta_seconds'] == 0
+    assert '[進捗] 3/3行' in stream.getvalue()
+
+
+if __name__ == "__main__":
+    test_eta_weighted_by_class_and_parallelism()
+    test_status_file()
+    print("\n✅ 進捗のテストが完了しました")
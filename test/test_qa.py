@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+翻訳済みファイルのQAのテスト
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from qa import check_line, iter_text_rows, run_qa, write_fixed, QaReport
+
+
+def test_check_line():
+    """自動修正できる問題と、修正後も残る問題を区別する"""
+    fixed, findings = check_line("[c][ff0000]赤[/c]です.次")
+    print(f"修正後: {fixed} 問題点: {findings}")
+    assert fixed == "[c][ff0000]赤[-][/c]です. 次"
+    assert {check for check, _ in findings} == {'color_tag', 'punctuation'}
+
+    _, findings = check_line("訳\\n文", source="Line\\nbreak\\nhere")
+    assert [check for check, _ in findings] == ['newline']
+
+
+def test_parallel_report_and_fix():
+    """並列に検証しても元の行順で修正ファイルを書き出す"""
+    lines = ["これはテスト.次です", "This is still plain English text here",
+             "", "正常です。"] * 5
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, 'input.txt')
+        fixed_file = os.path.join(tmp, 'fixed.txt')
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        report = QaReport(input_file)
+        write_fixed(input_file, run_qa(iter_text_rows(input_file), report,
+                                       jobs=2, chunk_size=3), fixed_file)
+        with open(fixed_file, 'r', encoding='utf-8') as f:
+            fixed = f.read().splitlines()
+
+    print(f"問題行: {[finding['line'] for finding in report.findings]}")
+    assert report.lines == len(lines)
+    assert report.counts == {'punctuation': 5, 'english': 5}
+    assert report.unfixable_count == 5
+    assert fixed == ["これはテスト. 次です" if line == lines[0] else line
+                     for line in lines]
+
+
+if __name__ == "__main__":
+    test_check_line()
+    test_parallel_report_and_fix()
+    print("\n✅ QAのテストが完了しました")
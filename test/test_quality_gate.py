@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+品質チェックのテスト
+"""
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from quality_gate import is_mostly_english, check_final_translation
+
+
+def test_proper_nouns_in_japanese_text():
+    """英語の固有名詞を残した日本語訳は英語と判定しない"""
+    text = 'Talon Guardian から Orbital Laser Cannon を回収せよ'
+    print(f"判定対象: {text}")
+    assert not is_mostly_english(text)
+    assert check_final_translation(text) == []
+
+    assert not is_mostly_english('[c][ff0000]Zirax Commander[-][/c] のアジトで '
+                                 'Heavy Armor Booster を入手した')
+
+
+def test_untranslated_english():
+    """翻訳されずに残った英文は検出する"""
+    text = 'Retrieve the Orbital Laser Cannon from the Talon Guardian'
+    assert is_mostly_english(text)
+    assert check_final_translation(text) == ['英語のまま翻訳されていません']
+
+
+if __name__ == "__main__":
+    test_proper_nouns_in_japanese_text()
+    test_untranslated_english()
+    print("\n✅ 品質チェックのテストが完了しました")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+推論レベル指定の解析・推論テキストの分離のテスト
+"""
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ollama_client import parse_reasoning_levels, separate_thinking
+
+
+def test_parse_reasoning_levels():
+    """全クラス共通の指定と長さクラス別の指定を解析する"""
+    assert parse_reasoning_levels('') == {}
+    assert parse_reasoning_levels('low') == {
+        'short': 'low', 'medium': 'low', 'long': 'low'}
+    assert parse_reasoning_levels('off, long=high') == {
+        'short': 'off', 'medium': 'off', 'long': 'high'}
+    assert parse_reasoning_levels('short=off,long=medium') == {
+        'short': 'off', 'long': 'medium'}
+
+
+def test_invalid_reasoning_levels():
+    """不明なレベル・長さクラスは ValueError"""
+    for spec in ['extreme', 'short=max', 'huge=low', 'long=']:
+        try:
+            parse_reasoning_levels(spec)
+        except ValueError as e:
+            print(f"{spec!r}: {e}")
+        else:
+            raise AssertionError(f"{spec!r} が受け付けられました")
+
+
+def test_separate_thinking():
+    """本文に混入した推論テキストを除き、翻訳のみを残す"""
+    cases = [
+        ("ブリッジを探す", ("ブリッジを探す", "")),
+        ("<think>Translate it.</think>\nブリッジを探す",
+         ("ブリッジを探す", "<think>Translate it.</think>")),
+        ("<think>a</think>ブリッジ<think>b</think>を探す",
+         ("ブリッジを探す", "<think>a</think><think>b</think>")),
+        # 閉じタグのみ（開始タグは応答に含まれない）
+        ("The user wants Japanese.</think>ブリッジを探す",
+         ("ブリッジを探す", "The user wants Japanese.")),
+        # 閉じタグがない（推論の途中で終了）
+        ("ブリッジを探す<think>Let me check", ("ブリッジを探す", "Let me check")),
+        ("<think>Let me check the glossary", ("", "Let me check the glossary")),
+        ("analysis: bridge...assistantfinalブリッジを探す",
+         ("ブリッジを探す", "analysis: bridge...")),
+    ]
+    for content, expected in cases:
+        result = separate_thinking(content)
+        print(f"{content!r} → {result}")
+        assert result == expected
+
+
+if __name__ == "__main__":
+    test_parse_reasoning_levels()
+    test_invalid_reasoning_levels()
+    test_separate_thinking()
+    print("\n✅ 推論レベル・推論テキスト分離のテストが完了しました")
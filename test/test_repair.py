@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+品質チェックに失敗した行の再翻訳・カスケードモードのテスト（Ollamaの応答はスタブ）
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(REPO_DIR)
+
+import ollama_client
+import ollama_translate
+from ollama_client import (runtime_settings, model_limits, model_semaphores,
+                           async_model_semaphores)
+from ollama_translate import MODEL_NAME, ESCALATION_MODEL_NAME
+from tm_store import TmStore
+from cassette import Cassette
+
+LINES = ["Hull breach detected in the cargo bay", "Locate the bridge",
+         "Open the hangar door", "Welcome aboard"]
+
+TRANSLATIONS = {
+    "Hull breach detected in the cargo bay": "貨物室で船体の破損を検出",
+    "Locate the bridge": "ブリッジを探す",
+    "Open the hangar door": "格納庫の扉を開ける",
+    "Welcome aboard": "ようこそ",
+}
+
+
+def make_args(input_file: str, output_file: str, **options):
+    """ollama_translate.main() の引数（コマンドラインの既定値）"""
+    args = argparse.Namespace(
+        input=input_file, output=output_file, casual=False,
+        prev_source=None, prev_output=None, tm=None, examples=0,
+        log_level='INFO', qa_log=None, shard=None, dry_run=False,
+        profile=False, cprofile=None, tracemalloc=None,
+        progress_interval=0, status_file=None, concurrency=1,
+        queue_size=32, batch_size=1, max_repair_attempts=2,
+        no_tag_masking=False, split_long=False, cascade=False,
+        escalation_model=ESCALATION_MODEL_NAME,
+        draft_concurrency=1, escalation_concurrency=1, reasoning=None,
+        record=None, replay=None, replay_speed=1.0, keep_alive='30m',
+        no_warmup=True, no_connection_check=True)
+    for name, value in options.items():
+        setattr(args, name, value)
+    return args
+
+
+def parse_request(request: dict) -> tuple[str, bool]:
+    """リクエストから (翻訳対象の英語, 修正リトライか) を取り出す"""
+    prompt = request['messages'][0]['content']
+    text = re.search(r'^テキスト: (.*)$', prompt, re.MULTILINE).group(1)
+    return text, '前回の翻訳には次の問題がありました' in prompt
+
+
+def run_main(fake_exchange, lines: list[str] = LINES, **options):
+    """スタブの応答で ollama_translate.main() を実行する
+
+    (出力の行, 翻訳メモリに登録された {英語: 作成元}) を返す。
+    """
+    original_exchange = ollama_client._async_exchange
+    original_setup_logging = ollama_translate.setup_logging
+    original_settings = dict(runtime_settings)
+    original_cwd = os.getcwd()
+    ollama_client._async_exchange = fake_exchange
+    # pytest のログ出力を置き換えない
+    ollama_translate.setup_logging = lambda *args: None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            input_file = os.path.join(tmp, 'English.txt')
+            output_file = os.path.join(tmp, 'Japanese.txt')
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            args = make_args(input_file, output_file,
+                             tm=os.path.join(tmp, 'tm.sqlite'), **options)
+            # 用語集などはリポジトリ直下から読み込む
+            os.chdir(REPO_DIR)
+            ollama_translate.main(args)
+            with open(output_file, 'r', encoding='utf-8') as f:
+                output = f.read().splitlines()
+            with TmStore(args.tm) as store:
+                saved = {entry.source: entry.model
+                         for entry in store.entries()}
+            return output, saved
+    finally:
+        os.chdir(original_cwd)
+        ollama_client._async_exchange = original_exchange
+        ollama_translate.setup_logging = original_setup_logging
+        runtime_settings.clear()
+        runtime_settings.update(original_settings)
+        for settings in (model_limits, model_semaphores,
+                         async_model_semaphores):
+            settings.clear()
+
+
+def test_repair_runs_alongside_translation():
+    """失敗行は全行の翻訳を待たずに再翻訳し、後続の行の書き出しを止めない"""
+    calls = []
+
+    async def fake_exchange(request):
+        text, repair = parse_request(request)
+        calls.append((text, repair))
+        if text != LINES[0]:
+            await asyncio.sleep(0.05)
+        # 1行目の下訳は英語のまま（品質チェックに失敗）
+        content = (text if text == LINES[0] and not repair
+                   else TRANSLATIONS[text])
+        return {'message': {'content': content}}
+
+    output, _ = run_main(fake_exchange)
+    print(f"呼び出し順: {calls}")
+    assert output == [TRANSLATIONS[line] for line in LINES]
+    assert calls.index((LINES[0], True)) < calls.index((LINES[-1], False))
+
+
+def test_cascade_escalates_failed_lines():
+    """カスケードモードでは品質チェックに失敗した行だけを指摘付きで大きいモデルに送る"""
+    requests = []
+
+    async def fake_exchange(request):
+        text, repair = parse_request(request)
+        requests.append((request['model'], text, repair,
+                         request['messages'][0]['content']))
+        # 下訳モデルは1行目を英語のまま返す
+        if request['model'] == MODEL_NAME and text == LINES[0]:
+            return {'message': {'content': text}}
+        return {'message': {'content': TRANSLATIONS[text]}}
+
+    output, saved = run_main(fake_exchange, cascade=True)
+    assert output == [TRANSLATIONS[line] for line in LINES]
+
+    escalated = [(text, repair, prompt) for model, text, repair, prompt
+                 in requests if model == ESCALATION_MODEL_NAME]
+    assert len(escalated) == 1
+    text, repair, prompt = escalated[0]
+    print(f"エスカレーションのプロンプト:\n{prompt}")
+    assert text == LINES[0] and repair
+    assert f"前回の翻訳: {LINES[0]}" in prompt
+    assert all(model == MODEL_NAME for model, text, _, _ in requests
+               if text != LINES[0])
+
+    # 翻訳メモリには実際に翻訳したモデルを記録する
+    print(f"登録内容: {saved}")
+    assert saved == {LINES[0]: ESCALATION_MODEL_NAME,
+                     **{line: MODEL_NAME for line in LINES[1:]}}
+
+
+def test_cascade_concurrency_per_model():
+    """下訳モデルと大きいモデルの同時リクエスト数をそれぞれの上限までに抑える"""
+    lines = [f"Open the hangar door number {i}" for i in range(8)]
+    in_flight = {}
+    peak = {}
+
+    async def fake_exchange(request):
+        model = request['model']
+        in_flight[model] = in_flight.get(model, 0) + 1
+        peak[model] = max(peak.get(model, 0), in_flight[model])
+        # 大きいモデルの応答は遅い
+        await asyncio.sleep(0.01 if model == MODEL_NAME else 0.05)
+        in_flight[model] -= 1
+        text, _ = parse_request(request)
+        # 下訳は全て英語のまま（全行をエスカレーション）
+        if model == MODEL_NAME:
+            return {'message': {'content': text}}
+        return {'message': {'content': f"格納庫の扉{text.split()[-1]}を開ける"}}
+
+    output, saved = run_main(fake_exchange, lines, cascade=True, concurrency=4,
+                             draft_concurrency=2, escalation_concurrency=3)
+    print(f"最大同時リクエスト数: {peak}")
+    assert output == [f"格納庫の扉{i}を開ける" for i in range(8)]
+    assert peak == {MODEL_NAME: 2, ESCALATION_MODEL_NAME: 3}
+    assert set(saved.values()) == {ESCALATION_MODEL_NAME}
+
+
+def test_cassette_closed_on_failure():
+    """翻訳が途中で失敗しても、記録済みの応答をカセットに残す"""
+    class FailingClient:
+        async def chat(self, **request):
+            text, _ = parse_request(request)
+            if text == LINES[-1]:
+                raise ConnectionError("Ollamaに接続できません")
+            return {'message': {'role': 'assistant',
+                                'content': TRANSLATIONS[text]}}
+
+    original_client = ollama_client._async_client
+    ollama_client._async_client = FailingClient()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cassette.jsonl.gz')
+            try:
+                run_main(ollama_client._async_exchange, record=path)
+            except ConnectionError:
+                pass
+            else:
+                raise AssertionError("接続エラーが伝わっていません")
+            recorded = Cassette(path, 'replay').entries
+    finally:
+        ollama_client._async_client = original_client
+    assert len(recorded) == len(LINES) - 1
+
+
+if __name__ == "__main__":
+    test_repair_runs_alongside_translation()
+    test_cascade_escalates_failed_lines()
+    test_cascade_concurrency_per_model()
+    test_cassette_closed_on_failure()
+    print("\n✅ 修正リトライ・カスケードモードのテストが完了しました")
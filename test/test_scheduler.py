@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+長さクラス別スケジューリング・行順の書き出し・まとめ翻訳のテスト
+"""
+import asyncio
+import io
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ollama_client
+from scheduler import classify_length, iter_schedule, OrderedWriter, WorkUnit
+from ollama_translate import parse_batch_response, translate_unit
+
+
+def test_class_boundaries():
+    """100文字未満は short、500文字未満は medium、それ以上は long"""
+    assert classify_length('a' * 99) == 'short'
+    assert classify_length('a' * 100) == 'medium'
+    assert classify_length('  ' + 'a' * 99 + '  ') == 'short'
+    assert classify_length('a' * 499) == 'medium'
+    assert classify_length('a' * 500) == 'long'
+
+
+def test_iter_schedule():
+    """短い行は batch_size 行ずつまとめ、まとめられない行・長い行は単独で送る"""
+    jobs = [(1, 'One'), (2, 'a' * 200), (3, 'Two'), (4, '[IDA] Hi'),
+            (5, 'Three'), (6, 'Four')]
+    units = list(iter_schedule(jobs, 2, lambda text: '[IDA]' not in text))
+    summary = [(unit.class_name, [line_no for line_no, _ in unit.jobs])
+               for unit in units]
+    print(f"スケジュール: {summary}")
+    assert summary == [('medium', [2]), ('short', [1, 3]), ('short', [4]),
+                       ('short', [5, 6])]
+
+    units = list(iter_schedule(jobs[:3], 1))
+    assert [len(unit.jobs) for unit in units] == [1, 1, 1]
+
+
+def test_ordered_writer():
+    """完了順に関係なく元の行順で書き出し、重複行にも同じ結果を書く"""
+    output = io.StringIO()
+    writer = OrderedWriter(output, 15, 10)
+    writer.add_duplicate(11, 13)
+
+    writer.put(12, 'C')
+    writer.put(11, 'B')
+    assert output.getvalue() == ''
+    writer.put(10, 'A')
+    assert output.getvalue() == 'A\nB\nC\nB\n'
+    assert not writer.is_complete()
+    writer.put(14, 'E')
+    assert writer.is_complete()
+    assert output.getvalue() == 'A\nB\nC\nB\nE\n'
+
+
+def test_ordered_writer_late_duplicate():
+    """書き出し済みの行の重複が後から見つかっても同じ結果を書く"""
+    output = io.StringIO()
+    writer = OrderedWriter(output, 3)
+    writer.put(0, 'A')
+    writer.put(1, 'B')
+    writer.add_duplicate(0, 2)
+    assert writer.is_complete()
+    assert output.getvalue() == 'A\nB\nA\n'
+
+
+def test_parse_batch_response():
+    """番号が欠けた・多い応答は解析失敗（None）とする"""
+    assert parse_batch_response("1: 一\n2：二\n", 2) == ['一', '二']
+    assert parse_batch_response("2: 二\n1: 一", 2) == ['一', '二']
+    assert parse_batch_response("1: 一", 2) is None
+    assert parse_batch_response("1: 一\n2: 二\n3: 三", 2) is None
+    assert parse_batch_response("一\n二", 2) is None
+
+
+def test_short_batch_reply_falls_back_to_single_lines():
+    """まとめ翻訳の応答が行数不足なら1行ずつ翻訳し直す"""
+    prompts = []
+
+    async def fake_exchange(request):
+        prompt = request['messages'][0]['content']
+        prompts.append(prompt)
+        if '番号: 翻訳' in prompt:
+            return {'message': {'content': '1: 最初の行'}}
+        return {'message': {'content': f'単独の翻訳{len(prompts)}'}}
+
+    unit = WorkUnit('short', [(1, 'First line'), (2, 'Second line')])
+    original_exchange = ollama_client._async_exchange
+    ollama_client._async_exchange = fake_exchange
+    try:
+        translations = asyncio.run(translate_unit(unit, {}, False))
+    finally:
+        ollama_client._async_exchange = original_exchange
+
+    print(f"翻訳結果: {translations}")
+    assert translations == ['単独の翻訳2', '単独の翻訳3']
+    assert len(prompts) == 3
+    assert 'テキスト: First line' in prompts[1]
+    assert 'テキスト: Second line' in prompts[2]
+
+
+if __name__ == "__main__":
+    test_class_boundaries()
+    test_iter_schedule()
+    test_ordered_writer()
+    test_ordered_writer_late_duplicate()
+    test_parse_batch_response()
+    test_short_batch_reply_falls_back_to_single_lines()
+    print("\n✅ スケジューリングのテストが完了しました")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+長文分割のテスト
+"""
+import asyncio
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ollama_client
+from ollama_client import (set_model_concurrency, model_limits,
+                           model_semaphores, async_model_semaphores)
+from ollama_translate import translate_segmented, MODEL_NAME
+from segmenter import split_segments, join_segments
+
+
+def test_split_at_paragraphs():
+    """空行で分割し、連結すると元に戻る"""
+    text = "First.\\n\\nSecond.[NLINE][NLINE]Third."
+    segments = split_segments(text)
+    print(f"分割結果: {segments}")
+
+    assert [segment for segment, _ in segments] == ["First.", "Second.", "Third."]
+    assert join_segments([s for s, _ in segments], segments) == text
+
+
+def test_never_split_inside_spans():
+    """カラータグ・サイズタグの内側では分割しない"""
+    text = ("Intro. [c][ff0000]Red one. Red two.\\n\\nRed three.[-][/c] "
+            "<size=12>Small. Text.</size> End.")
+    segments = split_segments(text, max_chars=10)
+    print(f"分割結果: {segments}")
+
+    for segment, _ in segments:
+        assert segment.count('[c]') == segment.count('[/c]')
+        assert segment.count('<size=') == segment.count('</size>')
+    assert join_segments([s for s, _ in segments], segments) == text
+
+
+def test_segment_requests_respect_concurrency():
+    """分割したセグメントのリクエストは同時実行数の上限を超えない"""
+    in_flight = [0, 0]  # 実行中, 最大
+
+    async def fake_exchange(request):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[1], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return {'message': {'content': '段落の翻訳です。'}}
+
+    text = '\\n\\n'.join(f"Paragraph number {i}." for i in range(8))
+    original_exchange = ollama_client._async_exchange
+    ollama_client._async_exchange = fake_exchange
+    set_model_concurrency(MODEL_NAME, 2)
+    try:
+        translated = asyncio.run(translate_segmented(text, {}, False, False))
+    finally:
+        ollama_client._async_exchange = original_exchange
+        for settings in (model_limits, model_semaphores,
+                         async_model_semaphores):
+            settings.pop(MODEL_NAME, None)
+
+    print(f"最大同時リクエスト数: {in_flight[1]}")
+    assert in_flight[1] == 2
+    assert translated.split('\\n\\n') == ['段落の翻訳です。'] * 8
+
+
+if __name__ == "__main__":
+    test_split_at_paragraphs()
+    test_never_split_inside_spans()
+    test_segment_requests_respect_concurrency()
+    print("\n✅ 長文分割のテストが完了しました")
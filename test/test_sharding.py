@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+シャード分割・結合のテスト
+"""
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sharding import parse_shard_spec, shard_range, write_manifest, merge_shards
+
+
+def test_shard_range_covers_all_lines():
+    """全シャードの担当範囲が重複・欠落なく連続する"""
+    for total in [0, 1, 7, 100]:
+        ranges = [shard_range(total, i, 3) for i in range(1, 4)]
+        print(f"{total}行: {ranges}")
+        assert ranges[0][0] == 0 and ranges[-1][1] == total
+        assert all(ranges[i][1] == ranges[i + 1][0] for i in range(2))
+
+
+def test_parse_shard_spec():
+    """i/N 形式の解析と範囲外の指定"""
+    assert parse_shard_spec("2/4") == (2, 4)
+    for spec in ["0/4", "5/4", "1-4", "a/b"]:
+        try:
+            parse_shard_spec(spec)
+        except ValueError:
+            continue
+        raise AssertionError(f"不正な指定が受け付けられました: {spec}")
+
+
+def test_merge_shards(tmp_path):
+    """シャード出力を元の行順で結合し、欠落・入力の不一致を検出"""
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("a\nb\nc\n", encoding='utf-8')
+    shard_files = []
+    for index in [2, 1]:
+        start, end = shard_range(3, index, 2)
+        shard_file = tmp_path / f"shard{index}.txt"
+        shard_file.write_text(
+            ''.join(f"訳{c}\n" for c in "abc"[start:end]), encoding='utf-8')
+        write_manifest(str(shard_file), str(input_file), index, 2, start, end, 3)
+        shard_files.append(str(shard_file))
+
+    merged = merge_shards(str(input_file), shard_files,
+                          str(tmp_path / "output.txt"))
+    assert merged == ["訳a\n", "訳b\n", "訳c\n"]
+
+    try:
+        merge_shards(str(input_file), shard_files[:1],
+                     str(tmp_path / "output.txt"))
+        raise AssertionError("シャードの欠落が検出されませんでした")
+    except ValueError as e:
+        print(f"欠落: {e}")
+
+    input_file.write_text("a\nb\nchanged\n", encoding='utf-8')
+    try:
+        merge_shards(str(input_file), shard_files,
+                     str(tmp_path / "output.txt"))
+        raise AssertionError("入力の変更が検出されませんでした")
+    except ValueError as e:
+        print(f"入力不一致: {e}")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_shard_range_covers_all_lines()
+    test_parse_shard_spec()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_merge_shards(Path(tmp_dir))
+    print("\n✅ シャード分割・結合のテストが完了しました")
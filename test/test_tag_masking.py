@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+タグマスク（プレースホルダー置換・復元）のテスト
+"""
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tag_masking import mask_tags, mask_example, mask_examples
+
+
+def test_mask_and_restore():
+    """タグを置換し、翻訳後のテキストで元に戻せる"""
+    text = "[b]Warning:[/b] @p9 Check the <size=14>[c][ff0000]reactor[-][/c]</size>\\n\\nNow!"
+    tag_mask = mask_tags(text)
+    print(f"マスク後: {tag_mask.text}")
+
+    assert '[c]' not in tag_mask.text
+    assert tag_mask.text == "{1}Warning:{2} {3} Check the {4}reactor{5}Now!"
+
+    # 語順が変わってもタグは元の内容で復元される
+    translated = "{1}警告:{2} {3} {4}リアクター{5}を確認してください!"
+    restored = tag_mask.restore(translated)
+    print(f"復元: {restored}")
+    assert restored == ("[b]警告:[/b] @p9 <size=14>[c][ff0000]リアクター[-][/c]"
+                        "</size>\\n\\nを確認してください!")
+
+
+def test_restore_rejects_broken_placeholders():
+    """プレースホルダーの欠落・重複は復元しない"""
+    tag_mask = mask_tags("Locate [c][eeff00]bridge[-][/c]")
+
+    assert tag_mask.restore("{1}ブリッジ{2}を探す") is not None
+    assert tag_mask.restore("{1}ブリッジを探す") is None
+    assert tag_mask.restore("{1}ブリッジ{2}{2}を探す") is None
+    assert tag_mask.restore("{1}ブリッジ{3}を探す") is None
+
+
+def test_skip_text_with_braces():
+    """元テキストに波括弧の番号がある場合はマスクしない"""
+    assert mask_tags("Value {0} of {1}") is None
+    assert mask_tags("タグなし").tags == []
+
+
+def test_mask_example_pairs():
+    """翻訳例の日本語側のタグは英語側と同じ番号に置換し、対応しない例は除く"""
+    assert mask_example("[b]Bridge[/b] of [c][ff0000]ship[-][/c]",
+                        "[c][ff0000]船[-][/c]の[b]ブリッジ[/b]") == (
+        "{1}Bridge{2} of {3}ship{4}", "{3}船{4}の{1}ブリッジ{2}")
+    assert mask_example("Plain text", "タグなし") == ("Plain text", "タグなし")
+    assert mask_example("[b]Bold[/b]", "<size=12>太字</size>") is None
+    assert mask_examples([("[b]Bold[/b]", "[b]太字[/b]"),
+                          ("Value {1}", "値 {1}")]) == [("{1}Bold{2}", "{1}太字{2}")]
+
+
+if __name__ == "__main__":
+    test_mask_and_restore()
+    test_restore_rejects_broken_placeholders()
+    test_skip_text_with_braces()
+    test_mask_example_pairs()
+    print("\n✅ タグマスクのテストが完了しました")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+翻訳メモリの保存・TMX入出力・結合のテスト
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tm_store import (TmStore, TmEntry, write_tmx, read_entries,
+                      glossary_version, STYLE_CASUAL, STYLE_STANDARD)
+from incremental import line_hash
+from ollama_translate import (save_to_translation_memory, ORIGIN_LOCAL,
+                              ORIGIN_PREVIOUS)
+
+VERSION = glossary_version({'Bridge': 'ブリッジ'})
+
+
+def test_tmx_round_trip():
+    """TMX に書き出して読み込むと、訳文とモデル・用語集・文体が保たれる"""
+    entries = [
+        TmEntry("Locate [c][eeff00]bridge[-][/c]", "[c][eeff00]ブリッジ[-][/c]を探す",
+                'gpt-oss:20b', VERSION, STYLE_STANDARD, '2025-09-01T10:00:00Z'),
+        TmEntry("Hey <b>you</b> & me", "おい<b>お前</b>と俺",
+                'gpt-oss:120b', VERSION, STYLE_CASUAL, '2025-09-02T10:00:00Z'),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmx_file = os.path.join(tmp, 'tm.tmx')
+        assert write_tmx(entries, tmx_file) == 2
+        loaded = list(read_entries(tmx_file))
+        assert len(list(read_entries(tmx_file, 'gpt-oss:120b'))) == 1
+
+    for entry, original in zip(loaded, entries):
+        assert vars(entry) == vars(original)
+
+
+def test_merge_keeps_newest():
+    """同じ原文・文体・用語集の訳は、結合の順序に関係なく新しいものを残す"""
+    old = TmEntry("Locate bridge", "ブリッジを探せ", 'gpt-oss:20b', VERSION,
+                  created_at='2025-09-01T10:00:00Z')
+    new = TmEntry("Locate bridge", "ブリッジを探す", 'gpt-oss:120b', VERSION,
+                  created_at='2025-09-02T10:00:00Z')
+    other_glossary = TmEntry("Locate bridge", "艦橋を探す", 'gpt-oss:20b',
+                             glossary_version({'Bridge': '艦橋'}))
+    casual = TmEntry("Locate bridge", "ブリッジ探せよ", 'gpt-oss:20b', VERSION,
+                     STYLE_CASUAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for order in ([old, new], [new, old]):
+            filename = os.path.join(tmp, f'tm_{order[0].model}.sqlite')
+            with TmStore(filename) as store:
+                store.add(order)
+                store.add([other_glossary, casual])
+                assert len(store) == 3
+                assert store.lookup_table(VERSION, STYLE_STANDARD) == {
+                    line_hash("Locate bridge"): "ブリッジを探す"}
+                assert store.pairs(VERSION, STYLE_STANDARD)[0] == (
+                    "Locate bridge", "ブリッジを探す")
+
+
+def test_save_records_origin():
+    """行ごとの作成元を記録し、再利用した行・品質チェック失敗行・作成元不明の行は登録しない"""
+    sources = ["Locate bridge", "Equipped:", "Old line", "From memory",
+               "Broken line", "Unknown"]
+    targets = ["ブリッジを探す", "装備:", "古い行", "メモリの訳", "壊れた行", "不明"]
+    origins = ['gpt-oss:120b', ORIGIN_LOCAL, ORIGIN_PREVIOUS, 'gpt-oss:20b',
+               'gpt-oss:20b', None]
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'output.txt')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(targets) + '\n')
+        with TmStore(os.path.join(tmp, 'tm.sqlite')) as store:
+            save_to_translation_memory(
+                store, [source + '\n' for source in sources], output_file,
+                {line_hash("From memory"): "メモリの訳"}, {"Broken line"},
+                origins, VERSION, STYLE_STANDARD)
+            saved = {entry.source: entry.model for entry in store.entries()}
+
+    print(f"登録内容: {saved}")
+    assert saved == {"Locate bridge": 'gpt-oss:120b', "Equipped:": ORIGIN_LOCAL,
+                     "Old line": ORIGIN_PREVIOUS}
+
+
+if __name__ == "__main__":
+    test_tmx_round_trip()
+    test_merge_keeps_newest()
+    test_save_records_origin()
+    print("\n✅ 翻訳メモリの保存・TMX入出力のテストが完了しました")
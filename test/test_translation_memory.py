@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+翻訳メモリ（類似文の翻訳例の検索）のテスト
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import translation_memory
+from translation_memory import TranslationMemory
+from ollama_translate import plan_unit
+from scheduler import WorkUnit
+
+PAIRS = [
+    ("[IDA] Welcome aboard. Please proceed to the Medical Bay.",
+     "[IDA] ようこそ。医務室へお進みください。"),
+    ("[IDA] Please proceed to the Bridge.", "[IDA] ブリッジへお進みください。"),
+    ("Locate the bridge", "ブリッジを探す"),
+    ("Hull breach detected!", "船体の破損を検出！"),
+    ("Locate the bridge", "重複した英語は最初の訳を採用"),
+]
+
+
+def test_search_returns_similar_translations():
+    """類似度の高い順に返し、無関係な文・同一の英語は返さない"""
+    memory = TranslationMemory(PAIRS)
+    assert len(memory) == 4
+
+    examples = memory.search("[IDA] Please proceed to the Cargo Bay.", 2)
+    print(f"翻訳例: {examples}")
+    assert examples[0] == ("[IDA] Please proceed to the Bridge.",
+                           "[IDA] ブリッジへお進みください。")
+    assert len(examples) == 2
+
+    assert memory.search("Locate the reactor") == [
+        ("Locate the bridge", "ブリッジを探す")]
+    assert memory.search("Locate the bridge") == []
+    assert memory.search("Completely unrelated text") == []
+    assert memory.search("Locate the reactor", 0) == []
+
+
+def test_search_skips_frequent_ngrams():
+    """頻出n-gramは転置リストに入れないが、類似度の計算には含める"""
+    max_postings = translation_memory.MAX_POSTINGS_PER_QUERY
+    translation_memory.MAX_POSTINGS_PER_QUERY = 3
+    try:
+        memory = TranslationMemory(PAIRS + [(f"Proceed to the deck {i}", f"デッキ{i}へ")
+                                            for i in range(5)])
+    finally:
+        translation_memory.MAX_POSTINGS_PER_QUERY = max_postings
+    assert "the" not in memory.postings
+    assert memory.search("Locate the reactor") == [
+        ("Locate the bridge", "ブリッジを探す")]
+    assert memory.search("Hull breach in sector 7") == [
+        ("Hull breach detected!", "船体の破損を検出！")]
+
+
+def test_from_files():
+    """前回リリースの英語/日本語ファイル（行が対応）から作成"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source_file = os.path.join(tmp, 'English.txt')
+        target_file = os.path.join(tmp, 'Japanese.txt')
+        with open(source_file, 'w', encoding='utf-8') as f:
+            f.write("Locate the bridge\n\nHull breach detected!\n")
+        with open(target_file, 'w', encoding='utf-8') as f:
+            f.write("ブリッジを探す\n\n船体の破損を検出！\n")
+        memory = TranslationMemory.from_files(source_file, target_file)
+
+    # 空行は登録しない
+    assert len(memory) == 2
+    assert memory.search("Hull breach in sector 7") == [
+        ("Hull breach detected!", "船体の破損を検出！")]
+
+
+def test_search_many_for_batches():
+    """まとめ翻訳の各行の類似例を交互に採用し、重複を除いて最大k件返す"""
+    memory = TranslationMemory(PAIRS)
+    examples = memory.search_many(["Locate the reactor", "Hull breach in sector 7",
+                                   "Locate the bridge"], 3)
+    print(f"翻訳例: {examples}")
+    assert examples == [("Hull breach detected!", "船体の破損を検出！")]
+    assert memory.search_many(["Locate the reactor", "Hull breach in sector 7"],
+                              1) == [("Locate the bridge", "ブリッジを探す")]
+
+
+def test_batch_prompt_has_masked_examples():
+    """まとめ翻訳のプロンプトにも、タグをプレースホルダーに揃えた翻訳例を添える"""
+    memory = TranslationMemory([("Locate the [c][eeff00]bridge[-][/c]",
+                                 "[c][eeff00]ブリッジ[-][/c]を探す")])
+    unit = WorkUnit('short', [(1, "Locate the [c][eeff00]reactor[-][/c]"),
+                              (2, "Hull breach")])
+    (prompt, _), = plan_unit(unit, {}, False, memory=memory)
+    print(prompt)
+    assert "英語: Locate the {1}bridge{2}\n日本語: {1}ブリッジ{2}を探す" in prompt
+    assert "[eeff00]" not in prompt
+
+    (prompt, _), = plan_unit(unit, {}, False, mask=False, memory=memory)
+    assert "日本語: [c][eeff00]ブリッジ[-][/c]を探す" in prompt
+
+
+if __name__ == "__main__":
+    test_search_returns_similar_translations()
+    test_search_skips_frequent_ngrams()
+    test_from_files()
+    test_search_many_for_batches()
+    test_batch_prompt_has_masked_examples()
+    print("\n✅ 翻訳メモリのテストが完了しました")
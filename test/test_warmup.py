@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+モデルのウォームアップ・keep_alive・GPU割り当てのテスト
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ollama_client
+from ollama_client import (select_gpu_options, warm_up_model,
+                           get_available_vram_gb,
+                           async_warm_up_model, build_chat_request,
+                           runtime_settings)
+
+
+class FakeOllama:
+    """モデル情報・VRAM・ロード処理を差し替える"""
+
+    def __init__(self, model_size, vram, layers=40, load_seconds=0.0):
+        self.values = {'get_model_size_gb': lambda model: model_size,
+                       'get_available_vram_gb': lambda: vram,
+                       'get_model_layer_count': lambda model: layers,
+                       '_load_model': self.load}
+        self.load_seconds = load_seconds
+        self.loads = []
+
+    def load(self, model_name, keep_alive, options):
+        time.sleep(self.load_seconds)
+        self.loads.append((model_name, keep_alive, options))
+        self.loaded_at = time.perf_counter()
+
+    def __enter__(self):
+        self.originals = {name: getattr(ollama_client, name)
+                          for name in self.values}
+        self.settings = (runtime_settings['keep_alive'],
+                         dict(runtime_settings['model_options']))
+        for name, value in self.values.items():
+            setattr(ollama_client, name, value)
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, value in self.originals.items():
+            setattr(ollama_client, name, value)
+        runtime_settings['keep_alive'] = self.settings[0]
+        runtime_settings['model_options'] = self.settings[1]
+
+
+def test_select_gpu_options():
+    """VRAMが足りればフルGPU、足りなければレイヤー数を按分して部分オフロード"""
+    with FakeOllama(model_size=10, vram=24):
+        assert select_gpu_options('model') == {}
+    with FakeOllama(model_size=10, vram=6, layers=40):
+        # 必要VRAM 12GB に対して 6GB → 半分のレイヤー
+        assert select_gpu_options('model') == {'num_gpu': 20}
+    with FakeOllama(model_size=10, vram=0):
+        assert select_gpu_options('model') == {}
+    with FakeOllama(model_size=10, vram=6, layers=None):
+        assert select_gpu_options('model') == {}
+    # モデルサイズが取得できない場合も既定の割り当てで続ける
+    with FakeOllama(model_size=None, vram=6):
+        assert select_gpu_options('model') == {}
+
+
+def test_unexpected_nvidia_smi_output():
+    """nvidia-smi の出力が想定外でも終了せず 0.0 を返す"""
+    original_run = subprocess.run
+    for stdout in ['[N/A]\n', '', 'Failed to initialize NVML\n']:
+        ollama_client.subprocess.run = lambda *args, **kwargs: (
+            subprocess.CompletedProcess(args, 0, stdout=stdout, stderr=''))
+        try:
+            assert get_available_vram_gb() == 0.0
+        finally:
+            ollama_client.subprocess.run = original_run
+
+
+def test_warm_up_sets_keep_alive_and_options():
+    """ウォームアップで決めた keep_alive と num_gpu を以降のリクエストに付ける"""
+    with FakeOllama(model_size=10, vram=6, layers=40) as fake:
+        warm_up_model('model-a', '-1')
+        assert fake.loads == [('model-a', '-1', {'num_gpu': 20})]
+
+        request = build_chat_request('model-a', [], {'num_ctx': 4096})
+        assert request['keep_alive'] == '-1'
+        assert request['options'] == {'num_gpu': 20, 'num_ctx': 4096}
+        assert build_chat_request('model-b', [])['options'] is None
+
+
+def test_async_warm_up_does_not_block_loop():
+    """非同期版のウォームアップ中も他のコルーチンが進む"""
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks.append(time.perf_counter())
+
+    async def main():
+        await asyncio.gather(async_warm_up_model('model-a', '30m'), ticker())
+
+    with FakeOllama(model_size=10, vram=24, load_seconds=0.2) as fake:
+        asyncio.run(main())
+        assert fake.loads == [('model-a', '30m', {})]
+    # ロード（0.2秒）の完了前に全ての待ちが終わっている
+    assert len(ticks) == 5 and ticks[-1] < fake.loaded_at
+
+
+if __name__ == "__main__":
+    test_select_gpu_options()
+    test_unexpected_nvidia_smi_output()
+    test_warm_up_sets_keep_alive_and_options()
+    test_async_warm_up_does_not_block_loop()
+    print("\n✅ ウォームアップのテストが完了しました")
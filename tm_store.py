@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from incremental import line_hash
+
+logger = logging.getLogger(__name__)
+
+# TMX の言語コードと作成ツール名
+SOURCE_LANG = 'en'
+TARGET_LANG = 'ja'
+CREATION_TOOL = 'empyrion-ollama-translate'
+TMX_DATE_FORMAT = '%Y%m%dT%H%M%SZ'
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# 文体フラグ（IDAの丁寧語は原文の [IDA] で決まるため区別しない）
+STYLE_STANDARD = 'standard'
+STYLE_CASUAL = 'casual'
+
+# 他のプロセス（並行するシャード）が書き込み中の場合の待ち時間（秒）
+SQLITE_TIMEOUT = 30.0
+
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS entries (
+    source_hash TEXT NOT NULL,
+    style TEXT NOT NULL,
+    glossary_version TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    model TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (source_hash, style, glossary_version)
+)"""
+
+# 原文・文体・用語集バージョンが同じ訳は新しいものを残す
+UPSERT = """INSERT INTO entries (source_hash, style, glossary_version, source,
+                                 target, model, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (source_hash, style, glossary_version) DO UPDATE SET
+    source = excluded.source, target = excluded.target,
+    model = excluded.model, created_at = excluded.created_at
+WHERE excluded.created_at > entries.created_at"""
+
+
+def glossary_version(glossary: dict) -> str:
+    """用語集の内容から求めるバージョン（内容が同じなら同じ値）"""
+    data = json.dumps(glossary, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:12]
+
+
+def style_flag(casual_mode: bool) -> str:
+    return STYLE_CASUAL if casual_mode else STYLE_STANDARD
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).strftime(DATE_FORMAT)
+
+
+class TmEntry:
+    """翻訳メモリの1件（原文・訳文と、翻訳時のモデル・用語集バージョン・文体）"""
+
+    def __init__(self, source: str, target: str, model: str,
+                 glossary_version: str, style: str = STYLE_STANDARD,
+                 created_at: str = None):
+        self.source = source
+        self.target = target
+        self.model = model
+        self.glossary_version = glossary_version
+        self.style = style
+        self.created_at = created_at or utc_now()
+
+
+class TmStore:
+    """SQLite に保存する翻訳メモリ
+
+    キーは (原文のハッシュ, 文体, 用語集バージョン) で、同じキーの訳は
+    作成日時の新しいものを残すため、どの順序で結合しても同じ結果になる。
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, timeout=SQLITE_TIMEOUT)
+        self.connection.execute(CREATE_TABLE)
+
+    def add(self, entries) -> int:
+        """登録し、追加・更新された件数を返す"""
+        before = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany(UPSERT, (
+                (line_hash(entry.source), entry.style, entry.glossary_version,
+                 entry.source, entry.target, entry.model, entry.created_at)
+                for entry in entries))
+        return self.connection.total_changes - before
+
+    def entries(self, model: str = None):
+        query = ("SELECT source, target, model, glossary_version, style, "
+                 "created_at FROM entries")
+        params = ()
+        if model:
+            query += " WHERE model = ?"
+            params = (model,)
+        for row in self.connection.execute(query + " ORDER BY rowid", params):
+            yield TmEntry(row[0], row[1], row[2], row[3], row[4], row[5])
+
+    def lookup_table(self, glossary_version: str, style: str) -> dict:
+        """同じ用語集・文体で翻訳した 原文のハッシュ→訳文 の対応表"""
+        return dict(self.connection.execute(
+            "SELECT source_hash, target FROM entries "
+            "WHERE glossary_version = ? AND style = ?",
+            (glossary_version, style)))
+
+    def pairs(self, glossary_version: str, style: str) -> list[tuple[str, str]]:
+        """同じ文体の (原文, 訳文)。同じ用語集で翻訳したものを先に並べる"""
+        return self.connection.execute(
+            "SELECT source, target FROM entries WHERE style = ? "
+            "ORDER BY glossary_version != ?, created_at DESC",
+            (style, glossary_version)).fetchall()
+
+    def summary(self) -> list[tuple]:
+        return self.connection.execute(
+            "SELECT model, glossary_version, style, COUNT(*), MAX(created_at) "
+            "FROM entries GROUP BY model, glossary_version, style "
+            "ORDER BY MAX(created_at)").fetchall()
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_tmx(entries, filename: str) -> int:
+    """TMX 1.4 として書き出し、件数を返す（1件ずつ書くため大きな翻訳メモリも可）"""
+    count = 0
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<tmx version="1.4">\n')
+        f.write(ET.tostring(ET.Element('header', {
+            'creationtool': CREATION_TOOL, 'creationtoolversion': '1',
+            'datatype': 'plaintext', 'segtype': 'sentence',
+            'adminlang': SOURCE_LANG, 'srclang': SOURCE_LANG,
+            'o-tmf': 'sqlite'}), encoding='unicode'))
+        f.write('\n<body>\n')
+        for entry in entries:
+            created_at = datetime.strptime(entry.created_at, DATE_FORMAT)
+            tu = ET.Element('tu', {'creationdate':
+                                   created_at.strftime(TMX_DATE_FORMAT)})
+            for prop_type, value in (('x-model', entry.model),
+                                     ('x-glossary-version', entry.glossary_version),
+                                     ('x-style', entry.style)):
+                ET.SubElement(tu, 'prop', {'type': prop_type}).text = value
+            for lang, text in ((SOURCE_LANG, entry.source),
+                               (TARGET_LANG, entry.target)):
+                tuv = ET.SubElement(tu, 'tuv', {XML_LANG: lang})
+                ET.SubElement(tuv, 'seg').text = text
+            f.write(ET.tostring(tu, encoding='unicode') + '\n')
+            count += 1
+        f.write('</body>\n</tmx>\n')
+    return count
+
+
+def read_tmx(filename: str):
+    """TMX を1件ずつ読み込む（英語・日本語の両方がある <tu> のみ）"""
+    for _, element in ET.iterparse(filename, events=('end',)):
+        if element.tag != 'tu':
+            continue
+        props = {prop.get('type'): prop.text or ''
+                 for prop in element.iter('prop')}
+        segments = {}
+        for tuv in element.iter('tuv'):
+            lang = (tuv.get(XML_LANG) or tuv.get('lang') or '').lower()
+            seg = tuv.find('seg')
+            if seg is not None:
+                segments[lang.split('-')[0]] = ''.join(seg.itertext())
+        created_at = element.get('creationdate')
+        element.clear()
+        if SOURCE_LANG not in segments or TARGET_LANG not in segments:
+            continue
+        if created_at:
+            created_at = datetime.strptime(
+                created_at, TMX_DATE_FORMAT).strftime(DATE_FORMAT)
+        yield TmEntry(segments[SOURCE_LANG], segments[TARGET_LANG],
+                      props.get('x-model', ''), props.get('x-glossary-version', ''),
+                      props.get('x-style', STYLE_STANDARD), created_at)
+
+
+def read_entries(filename: str, model: str = None):
+    """TMX または SQLite の翻訳メモリを読み込む"""
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"翻訳メモリが見つかりません: {filename}")
+    if filename.lower().endswith('.tmx'):
+        for entry in read_tmx(filename):
+            if not model or entry.model == model:
+                yield entry
+        return
+    with TmStore(filename) as store:
+        yield from store.entries(model)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="翻訳メモリ（SQLite）の書き出し・取り込み・結合")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='TMX として書き出す')
+    export_parser.add_argument('-t', '--tm', required=True, help='翻訳メモリ（SQLite）')
+    export_parser.add_argument('-o', '--output', required=True, help='出力する TMX ファイル')
+    export_parser.add_argument('--model', help='このモデルで翻訳したもののみ')
+
+    import_parser = subparsers.add_parser(
+        'import', help='TMX・SQLite を取り込んで結合（同じ原文・文体・用語集は新しい訳を残す）')
+    import_parser.add_argument('-t', '--tm', required=True, help='取り込み先の翻訳メモリ（SQLite）')
+    import_parser.add_argument('--model', help='このモデルで翻訳したもののみ')
+    import_parser.add_argument('files', nargs='+', help='取り込む TMX・SQLite ファイル')
+
+    stats_parser = subparsers.add_parser('stats', help='モデル・用語集・文体ごとの件数')
+    stats_parser.add_argument('-t', '--tm', required=True, help='翻訳メモリ（SQLite）')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'export':
+            with TmStore(args.tm) as store:
+                count = write_tmx(store.entries(args.model), args.output)
+            logger.info("TMX を書き出しました: %s (%s件)", args.output, count)
+        elif args.command == 'import':
+            with TmStore(args.tm) as store:
+                for filename in args.files:
+                    changed = store.add(read_entries(filename, args.model))
+                    logger.info("取り込みました: %s (追加・更新 %s件)", filename, changed)
+                logger.info("翻訳メモリ: %s (%s件)", args.tm, len(store))
+        else:
+            with TmStore(args.tm) as store:
+                logger.info("翻訳メモリ: %s (%s件)", args.tm, len(store))
+                for model, version, style, count, updated_at in store.summary():
+                    logger.info("  %s / 用語集 %s / %s: %s件 (最終更新 %s)",
+                                model, version, style, count, updated_at)
+    except (OSError, sqlite3.Error, ET.ParseError, ValueError) as e:
+        logger.error("翻訳メモリの処理に失敗しました: %s", e)
+        exit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s]: %(message)s')
+    main()
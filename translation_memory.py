@@ -0,0 +1,190 @@
+import heapq
+import logging
+import math
+from array import array
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# 文字n-gramの長さ
+NGRAM_SIZE = 3
+
+# プロンプトに添える翻訳例の既定の件数
+DEFAULT_EXAMPLE_COUNT = 3
+
+# 翻訳例として採用する最低の類似度（コサイン類似度）
+MIN_SIMILARITY = 0.3
+
+# 1回の検索で走査する転置リストの要素数の上限
+# （出現頻度の低いn-gramから順に走査し、上限に達したら頻出n-gramは省略）
+# これより多くの文に現れるn-gramは識別力が低いため転置リストに入れない
+MAX_POSTINGS_PER_QUERY = 1500
+
+# 共有するn-gramの多い順に、コサイン類似度を計算する候補の数
+RERANK_CANDIDATES = 10
+
+
+def char_ngrams(text: str) -> list[str]:
+    """小文字化した文字n-gram（前後に空白を補い、短い語も拾う）"""
+    text = f" {text.lower()} "
+    return [text[i:i + NGRAM_SIZE]
+            for i in range(len(text) - NGRAM_SIZE + 1)]
+
+
+def read_line_pairs(source_file: str, target_file: str) -> list[tuple[str, str]]:
+    """行が対応する英語/日本語ファイルを (英語, 日本語) のリストとして読み込む"""
+    with open(source_file, 'r', encoding='utf-8') as f:
+        sources = f.readlines()
+    with open(target_file, 'r', encoding='utf-8') as f:
+        targets = f.readlines()
+    if len(sources) != len(targets):
+        logger.warning("翻訳メモリの行数が一致しません - 英語:%s, 日本語:%s",
+                       len(sources), len(targets))
+    return list(zip(sources, targets))
+
+
+class TranslationMemory:
+    """過去の翻訳（英語→日本語）から類似した英語の翻訳例を検索する索引
+
+    文字n-gramを含む英語の転置リストを作り、検索時は出現頻度の低いn-gramを
+    多く共有する英語を候補に絞り込んで、文字n-gramのTF-IDFベクトルの
+    コサイン類似度の上位を返す。
+    同じ英語が複数ある場合は最初の訳を採用する。
+    """
+
+    def __init__(self, pairs):
+        translations = {}
+        for source, target in pairs:
+            source = source.rstrip('\r\n')
+            target = target.rstrip('\r\n')
+            if source.strip() and target.strip():
+                translations.setdefault(source, target)
+        self.sources = list(translations)
+        self.targets = list(translations.values())
+
+        # 1回目: 文書頻度（n-gramごとに保持するとメモリを使うため2回に分ける）
+        document_frequency = Counter()
+        for source in self.sources:
+            document_frequency.update(set(char_ngrams(source)))
+        count = len(self.sources)
+        self.idf = {gram: math.log((count + 1) / (frequency + 1)) + 1
+                    for gram, frequency in document_frequency.items()}
+        self.unknown_idf = math.log(count + 1) + 1
+
+        # 2回目: TF-IDFベクトルの大きさと、n-gramを含む文書番号の転置リスト
+        # （頻出n-gramは転置リストに入れないが、文書ベクトルの大きさには含める）
+        self.norms = array('f')
+        self.postings = {gram: array('i')
+                         for gram, frequency in document_frequency.items()
+                         if frequency <= MAX_POSTINGS_PER_QUERY}
+        get_doc_ids = self.postings.get
+        for doc_id, source in enumerate(self.sources):
+            weights = self._weights(source)
+            self.norms.append(math.hypot(*weights.values()))
+            for gram in weights:
+                doc_ids = get_doc_ids(gram)
+                if doc_ids is not None:
+                    doc_ids.append(doc_id)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def _weights(self, text: str) -> dict[str, float]:
+        """文字n-gramのTF-IDFの重み（正規化前）"""
+        idf = self.idf
+        return {gram: (1 + math.log(tf)) * idf.get(gram, self.unknown_idf)
+                for gram, tf in Counter(char_ngrams(text)).items()}
+
+    @classmethod
+    def from_files(cls, source_file: str, target_file: str):
+        """行が対応する英語/日本語ファイル（前回リリース）から作成"""
+        memory = cls(read_line_pairs(source_file, target_file))
+        logger.info("翻訳メモリを読み込みました: %s件", len(memory))
+        return memory
+
+    def search(self, text: str, k: int = DEFAULT_EXAMPLE_COUNT,
+               min_similarity: float = MIN_SIMILARITY) -> list[tuple[str, str]]:
+        """類似度の高い順に最大k件の (英語, 日本語) を返す（同一の英語は除く）"""
+        if k <= 0 or not self.sources or not text.strip():
+            return []
+
+        query = self._weights(text)
+        norm = math.hypot(*query.values())
+
+        # 出現頻度の低い（識別力の高い）n-gramから走査し、共有するn-gramの多い文を候補にする
+        postings = [self.postings[gram] for gram in query
+                    if gram in self.postings]
+        postings.sort(key=len)
+        shared = Counter()
+        budget = MAX_POSTINGS_PER_QUERY
+        for doc_ids in postings:
+            budget -= len(doc_ids)
+            if budget < 0:
+                break
+            shared.update(doc_ids)
+
+        # 候補のコサイン類似度を英語から計算（頻出n-gramも含める）
+        ranked = []
+        for doc_id, _ in shared.most_common(RERANK_CANDIDATES):
+            source = self.sources[doc_id]
+            if source == text:
+                continue
+            counts = Counter(char_ngrams(source))
+            dot = sum(weight * (1 + math.log(counts[gram])) * self.idf[gram]
+                      for gram, weight in query.items() if gram in counts)
+            similarity = dot / (norm * self.norms[doc_id])
+            if similarity >= min_similarity:
+                ranked.append((similarity, doc_id))
+        return [(self.sources[doc_id], self.targets[doc_id])
+                for _, doc_id in heapq.nlargest(k, ranked)]
+
+    def search_many(self, texts: list[str], k: int = DEFAULT_EXAMPLE_COUNT,
+                    min_similarity: float = MIN_SIMILARITY) -> list[tuple[str, str]]:
+        """複数の文（まとめ翻訳）に共通で添える翻訳例を最大k件返す
+
+        各文の類似度の高い例から順に1件ずつ交互に採用し、重複は除く。
+        """
+        if k <= 0:
+            return []
+        results = [self.search(text, k, min_similarity) for text in texts]
+        examples = []
+        for rank in range(k):
+            for result in results:
+                if (rank < len(result) and result[rank] not in examples and
+                        result[rank][0] not in texts):
+                    examples.append(result[rank])
+                    if len(examples) >= k:
+                        return examples
+        return examples
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    # 類似文の検索と、10万件での検索時間の確認
+    memory = TranslationMemory([
+        ("[IDA] Welcome aboard. Please proceed to the Medical Bay.",
+         "[IDA] ようこそ。医務室へお進みください。"),
+        ("[IDA] Please proceed to the Bridge.", "[IDA] ブリッジへお進みください。"),
+        ("Locate the bridge", "ブリッジを探す"),
+        ("Hull breach detected!", "船体の破損を検出！"),
+    ])
+    for query in ["[IDA] Please proceed to the Cargo Bay.", "Locate the reactor",
+                  "Completely unrelated text"]:
+        print(f"{query} → {memory.search(query)}")
+
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz')
+                     for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    lines = [' '.join(rng.choice(words) for _ in range(rng.randint(2, 20)))
+             for _ in range(100000)]
+    start = time.perf_counter()
+    memory = TranslationMemory((line, line) for line in lines)
+    print(f"索引の作成: {len(memory)}件, {time.perf_counter() - start:.1f}秒")
+    queries = [' '.join(rng.choice(words) for _ in range(rng.randint(2, 20)))
+               for _ in range(1000)]
+    start = time.perf_counter()
+    for query in queries:
+        memory.search(query)
+    print(f"検索: {(time.perf_counter() - start) / len(queries) * 1000:.3f}ms/行")